@@ -1,69 +1,37 @@
 #######################################################################################
 # -= PACOTES UTILIZADOS =-
 
-# Manipulação e operações com matrizes de dados
-import numpy as np
-import pandas as pd
+# Medição do tempo de inicialização (importado primeiro, marca a origem)
+from gas_prices.startup import startup
+
+import json
+import math
+import uuid
+from importlib.resources import files
 
 # Construção de gráficos
-import plotly.express as px
 import plotly.graph_objects as go
 
 # Ferramentas para a construção do Dashboard
-import dash
 import dash_bootstrap_components as dbc
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, callback_context, no_update
 from dash_bootstrap_templates import ThemeSwitchAIO
 
+# Catálogo de produtos e registro dos datasets mantidos no servidor. pandas e numpy
+# são importados apenas na carga dos dados, em segundo plano (ver INICIALIZAÇÃO)
+from gas_prices import config
+from gas_prices.registry import registry
 
-#######################################################################################
-# -= CARGA E PRÉ-PROCESSAMENTO DOS DADOS =-
-
-def load_data():
-
-    """
-        Carga e pré-processamento dos dados. 
-            - Função não paramética.
-    """
-
-    # Carregando os dados em um DataFrame do Pandas
-    url   = "https://raw.githubusercontent.com/asimov-academy/Dashboards/main/gas-prices-dash/data_gas.csv"
-    dados = pd.read_csv(url)
-
-    # Erro no nome da coluna
-    dados.rename(columns={' DATA INICIAL': 'DATA INICIAL'}, inplace=True)
-
-    # Estabelecendo datas, simplificando-as estabelecendo a ordem do DF por elas
-    dados['DATA INICIAL'] = pd.to_datetime(dados['DATA INICIAL'])
-    dados['DATA FINAL']   = pd.to_datetime(dados['DATA FINAL'])
-    dados['DATA MEDIA']   = ((dados['DATA FINAL'] - dados['DATA INICIAL'])/2) + dados['DATA INICIAL']
-    dados                 = dados.sort_values(by='DATA MEDIA',ascending=True)
-    dados.rename(columns = {'DATA MEDIA':'DATA'}, inplace = True)
-    dados.rename(columns = {'PREÇO MÉDIO REVENDA': 'VALOR REVENDA (R$/L)'}, inplace=True)
-
-    # Criando uma coluna de Ano
-    dados["ANO"] = dados["DATA"].apply(lambda x: str(x.year))
-
-    # Resetando o index por uma questão organizacional
-    dados = dados.reset_index()
-
-    # Filtrando pois só falaremos da gasolina comum
-    dados = dados[dados.PRODUTO == 'GASOLINA COMUM'] # ou podemos deixar todos os produtos e depois utilizar como um filtro geral !!!!
-
-    # Excluindo colunas que não usaremos
-    dados.drop(['UNIDADE DE MEDIDA', 'COEF DE VARIAÇÃO REVENDA', 'COEF DE VARIAÇÃO DISTRIBUIÇÃO', 
-        'NÚMERO DE POSTOS PESQUISADOS', 'DATA INICIAL', 'DATA FINAL', 'PREÇO MÁXIMO DISTRIBUIÇÃO', 'PREÇO MÍNIMO DISTRIBUIÇÃO', 
-        'DESVIO PADRÃO DISTRIBUIÇÃO', 'MARGEM MÉDIA REVENDA', 'PREÇO MÍNIMO REVENDA', 'PREÇO MÁXIMO REVENDA', 'DESVIO PADRÃO REVENDA', 
-        'PRODUTO', 'PREÇO MÉDIO DISTRIBUIÇÃO'], inplace=True, axis=1)
+# Redução de pontos das séries temporais enviadas ao navegador
+from gas_prices.downsample import budget, snap_relayout, snap_viewport, visible_range
 
-    # Retornando os dados já organizados
-    return dados
-
-# Chamando a função load_data()
-dados = load_data()
-
-# Transformando o DataFrame em um dicionário
-df_store = dados.to_dict()
+# Cache LRU das figuras geradas pelos callbacks e métricas de cada callback
+from gas_prices.cache import figure_cache
+from gas_prices.jobs import progress, runner
+from gas_prices.context import context, cheaper_share, difference, endpoints, state_series, weekly_row, years
+from gas_prices.metrics import metrics
+from gas_prices.api import api, catalogue
+from gas_prices.serialize import compressor, configure
 
 
 #######################################################################################
@@ -92,211 +60,332 @@ template_theme2 = "vapor"
 theme1 = dbc.themes.FLATLY
 theme2 = dbc.themes.VAPOR
 
+# Templates dos temas, lidos diretamente dos arquivos do dash_bootstrap_templates. As
+# figuras são geradas sem template no servidor e o template do tema ativo é aplicado no
+# navegador (assets/theme.js), de modo que alternar o tema não dispara nenhum callback
+# no servidor
+def read_templates():
+    pasta = files("dash_bootstrap_templates") / "templates"
+    return {
+        "1": json.loads((pasta / f"{template_theme1}.json").read_text(encoding="utf-8")),
+        "0": json.loads((pasta / f"{template_theme2}.json").read_text(encoding="utf-8"))
+    }
+
+# Gráficos do painel: cada um recebe os dados por um dcc.Store "<id>_data"
+graph_ids = [
+    "static_maxmin", "regiaobar_graph", "estadobar_graph", "animation_graph",
+    "direct_comparison_graph", "card1_indicators", "card2_indicators",
+    "weekly_graph", "ranking_graph"
+]
+
+# Indicadores semanais por estado e região (ver gas_prices.analytics)
+weekly_metrics = {
+    "mean4":      "Média móvel de 4 semanas",
+    "mean12":     "Média móvel de 12 semanas",
+    "mean52":     "Média móvel de 52 semanas",
+    "yoy":        "Variação anual",
+    "volatility": "Volatilidade anualizada",
+    "drawdown":   "Queda desde o pico",
+}
+
+# Indicadores expressos em porcentagem (os demais em R$/L)
+percent_metrics = {"yoy", "volatility", "drawdown"}
+
 # Importando Estilo css para os objetos do dash_bootstrap_components
 dbc_css = ("https://cdn.jsdelivr.net/gh/AnnMarieW/dash-bootstrap-templates@V1.0.2/dbc.min.css")
 
-# Instanciando o Dash
-app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY, dbc_css])
+# Instanciando o Dash. O layout é servido por uma função (ver INICIALIZAÇÃO), então os
+# componentes dos callbacks não existem enquanto os dados carregam
+app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY, dbc_css], suppress_callback_exceptions=True)
 server = app.server
 
 # Constração do layout
-app.layout = dbc.Container(children=[
-
-    # Armazenando os Datasets do projeto
-    dcc.Store(id="dataset", data=df_store),
-    dcc.Store(id="dataset_fixed", data=df_store),
-
-    # -= LINHA 1 =-
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dbc.Row([
-                        dbc.Col([
-                            html.Legend(children="Análise de Preços de Gás")
-                        ], sm=8),
-                        dbc.Col([
-                            html.I(className="fa fa-gas-pump", style={"font-size": "300%"})
-                        ], sm=4, align="center")
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            ThemeSwitchAIO(aio_id="theme", themes=[theme1, theme2]),
-                            html.Legend(children="Asimov Academy")
-                        ])
-                    ], style={"magin-top": "10px"}),
-                    dbc.Row([
-                        dbc.Button(children="Visite o Site", href="https://asimov.academy/", target="_blank")
-                    ], style={"margin-top": "10px"}),
-                    html.P(children="© Murilo Rocha", style={"text-align": "center"})
-                ])
-            ], style=tab_card)
-        ], sm=4, lg=2),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dbc.Row([
-                        dbc.Col([
-                            html.H3(children="Máximos e Mínimos"),
-                            dcc.Graph(id="static_maxmin", config={"displayModeBar": False, "showTips": False})
-                        ])
+def build_layout(chave_inicial, produtos, figure_templates):
+
+    """
+        Layout completo do painel.
+            - chave_inicial: chave do dcc.Store com a versão corrente do produto padrão.
+            - produtos: catálogo de produtos do seletor.
+            - figure_templates: templates dos temas, aplicados no navegador.
+    """
+
+    dados = registry.frame(chave_inicial)
+    anos  = [int(x) for x in years(chave_inicial)]
+
+    return dbc.Container(children=[
+
+        # Armazenando os Datasets do projeto
+        dcc.Store(id="dataset", data=chave_inicial),
+        dcc.Store(id="dataset_fixed", data=chave_inicial),
+
+        # Templates dos temas e figuras sem template, geradas pelos callbacks do servidor
+        dcc.Store(id="figure_templates", data=figure_templates),
+        *[dcc.Store(id=f"{graph_id}_data") for graph_id in graph_ids],
+
+        # Largura da janela do navegador, usada para limitar os pontos das séries
+        dcc.Store(id="viewport"),
+
+        # -= LINHA 1 =-
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                html.Legend(children="Análise de Preços de Gás")
+                            ], sm=8),
+                            dbc.Col([
+                                html.I(className="fa fa-gas-pump", style={"font-size": "300%"})
+                            ], sm=4, align="center")
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                ThemeSwitchAIO(aio_id="theme", themes=[theme1, theme2]),
+                                html.Legend(children="Asimov Academy")
+                            ])
+                        ], style={"magin-top": "10px"}),
+                        dbc.Row([
+                            dbc.Col([
+                                html.H6(children="Produto:"),
+                                dcc.Dropdown(
+                                    id="select_produto",
+                                    value=config.PRODUCT,
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": x, "value": x} for x in produtos
+                                    ]
+                                )
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Button(children="Visite o Site", href="https://asimov.academy/", target="_blank")
+                        ], style={"margin-top": "10px"}),
+                        html.P(children="© Murilo Rocha", style={"text-align": "center"})
                     ])
-                ])
-            ], style=tab_card)
-        ], sm=8, lg=3),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dbc.Row([
-                        dbc.Col([
-                            html.H6(children="Ano de análise:"),
-                            dcc.Dropdown(
-                                id="select_ano",
-                                value=dados.at[dados.index[3], 'ANO'],
-                                clearable=False,
-                                className="dbc",
-                                options=[
-                                    {"label": x, "value": x} for x in dados['ANO'].unique()
-                                ]
-                            )
-                        ], sm=6),
-                        dbc.Col([
-                            html.H6(children="Região de análise"),
-                            dcc.Dropdown(
-                                id="select_regiao",
-                                value=dados.at[dados.index[1], 'REGIÃO'],
-                                clearable=False,
-                                className="dbc",
-                                options=[
-                                    {"label": x, "value": x} for x in dados["REGIÃO"].unique()
-                                ]
-                            )
-                        ], sm=6)
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dcc.Graph(id="regiaobar_graph", config={"displayModeBar": False, "showTips": False})
-                        ], sm=12, md=6),
-                        dbc.Col([
-                            dcc.Graph(id="estadobar_graph", config={"displayModeBar": False, "showTips": False})
-                        ], sm=12, md=6)
-                    ], style={"column-gap": "0px"})
-                ])
-            ], style=tab_card)
-        ], sm=12, lg=7)
-    ], class_name="g-2 my-auto"),
-
-    # -= LINHA 2 =- #
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H3(children="Preço x Estado"),
-                    html.H6(children="Comparação temporal entre estados"),
-                    dbc.Row([
-                        dbc.Col([
-                            dcc.Dropdown(
-                                id="select_estado0",
-                                value=[dados.at[dados.index[3], 'ESTADO'], dados.at[dados.index[13], 'ESTADO'], dados.at[dados.index[6], 'ESTADO']],
-                                clearable=False,
-                                className="dbc",
-                                multi=True,
-                                options=[
-                                    {"label": x, "value": x} for x in dados['ESTADO'].unique()
-                                ]
-                            )
-                        ], sm=10)
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dcc.Graph(id="animation_graph", config={"displayModeBar": False, "showTips": False})
+                ], style=tab_card)
+            ], sm=4, lg=2),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                html.H3(children="Máximos e Mínimos"),
+                                dcc.Graph(id="static_maxmin", config={"displayModeBar": False, "showTips": False})
+                            ])
                         ])
                     ])
-                ])
-            ], style=tab_card)
-        ], sm=12, md=6, lg=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H3(children="Comparação Direta"),
-                    html.H6(children="Qual preço é o menor em um dado período de tempo?"),
-                    dbc.Row([
-                        dbc.Col([
-                            dcc.Dropdown(
-                                id="select_estado1",
-                                value=dados.at[dados.index[3], "ESTADO"],
-                                clearable=False,
-                                className="dbc",
-                                options=[
-                                    {"label": x, "value": x} for x in dados["ESTADO"].unique()
-                                ]
-                            )
-                        ], sm=10, md=5),
-                        dbc.Col([
-                            dcc.Dropdown(
-                                id="select_estado2",
-                                value=dados.at[dados.index[1], "ESTADO"],
-                                clearable=False,
-                                className="dbc",
-                                options=[
-                                    {"label": x, "value": x} for x in dados["ESTADO"].unique()
-                                ]
-                            )
-                        ], sm=10, md=6)
-                    ], style={"margin-top": "20px"}, justify="center"),
-                    dcc.Graph(id="direct_comparison_graph", config={"displayModeBar": False, "showTips": False}),
-                    html.P(id="desc_comparison", style={"color": "gray", "font-size": "80%"})
-                ])
-            ], style=tab_card)
-        ], sm=12, md=6, lg=5),
-        dbc.Col([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            dcc.Graph(id="card1_indicators", config={"displayModeBar": False, "showTips": False}, style={"margin-top": "30px"})
+                ], style=tab_card)
+            ], sm=8, lg=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                html.H6(children="Ano de análise:"),
+                                dcc.Dropdown(
+                                    id="select_ano",
+                                    value=int(dados.at[dados.index[3], 'ANO']),
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": str(x), "value": int(x)} for x in dados['ANO'].unique()
+                                    ]
+                                )
+                            ], sm=6),
+                            dbc.Col([
+                                html.H6(children="Região de análise"),
+                                dcc.Dropdown(
+                                    id="select_regiao",
+                                    value=dados.at[dados.index[1], 'REGIÃO'],
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": x, "value": x} for x in dados["REGIÃO"].unique()
+                                    ]
+                                )
+                            ], sm=6)
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Graph(id="regiaobar_graph", config={"displayModeBar": False, "showTips": False})
+                            ], sm=12, md=6),
+                            dbc.Col([
+                                dcc.Graph(id="estadobar_graph", config={"displayModeBar": False, "showTips": False})
+                            ], sm=12, md=6)
+                        ], style={"column-gap": "0px"})
+                    ])
+                ], style=tab_card)
+            ], sm=12, lg=7)
+        ], class_name="g-2 my-auto"),
+
+        # -= LINHA 2 =- #
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H3(children="Preço x Estado"),
+                        html.H6(children="Comparação temporal entre estados"),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id="select_estado0",
+                                    value=[dados.at[dados.index[3], 'ESTADO'], dados.at[dados.index[13], 'ESTADO'], dados.at[dados.index[6], 'ESTADO']],
+                                    clearable=False,
+                                    className="dbc",
+                                    multi=True,
+                                    options=[
+                                        {"label": x, "value": x} for x in dados['ESTADO'].unique()
+                                    ]
+                                )
+                            ], sm=10)
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Graph(id="animation_graph", config={"displayModeBar": False, "showTips": False})
+                            ])
                         ])
-                    ], style=tab_card)
-                ])
-            ], justify="center", style={"padding-bottom": "7px", "height": "50%"}),
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            dcc.Graph(id="card2_indicators", config={"displayModeBar": False, "showTips": False}, style={"margin-top": "30px"})
+                    ])
+                ], style=tab_card)
+            ], sm=12, md=6, lg=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H3(children="Comparação Direta"),
+                        html.H6(children="Qual preço é o menor em um dado período de tempo?"),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id="select_estado1",
+                                    value=dados.at[dados.index[3], "ESTADO"],
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": x, "value": x} for x in dados["ESTADO"].unique()
+                                    ]
+                                )
+                            ], sm=10, md=5),
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id="select_estado2",
+                                    value=dados.at[dados.index[1], "ESTADO"],
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": x, "value": x} for x in dados["ESTADO"].unique()
+                                    ]
+                                )
+                            ], sm=10, md=6)
+                        ], style={"margin-top": "20px"}, justify="center"),
+                        dcc.Store(id="comparison_job"),
+                        dcc.Interval(id="comparison_poll", interval=config.JOBS_POLL_MS, disabled=True),
+                        dbc.Progress(id="comparison_progress", value=0, striped=True, animated=True, style={"display": "none"}),
+                        dcc.Graph(id="direct_comparison_graph", config={"displayModeBar": False, "showTips": False}),
+                        html.P(id="desc_comparison", style={"color": "gray", "font-size": "80%"})
+                    ])
+                ], style=tab_card)
+            ], sm=12, md=6, lg=5),
+            dbc.Col([
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardBody([
+                                dcc.Graph(id="card1_indicators", config={"displayModeBar": False, "showTips": False}, style={"margin-top": "30px"})
+                            ])
+                        ], style=tab_card)
+                    ])
+                ], justify="center", style={"padding-bottom": "7px", "height": "50%"}),
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardBody([
+                                dcc.Graph(id="card2_indicators", config={"displayModeBar": False, "showTips": False}, style={"margin-top": "30px"})
+                            ])
+                        ], style=tab_card)
+                    ])
+                ], justify="center", style={"height": "50%"})
+            ], sm=12, lg=3, style={"height": "100%"})
+        ], class_name="g-2 my-auto"),
+
+        # -= LINHA 3 =- #
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.RangeSlider(
+                                    id="rangeslider",
+                                    marks={x: f'{x}' for x in anos},
+                                    step=3,
+                                    min=anos[0],
+                                    max=anos[-1],
+                                    className="dbc",
+                                    value=[anos[0], anos[-1]],
+                                    dots=True,
+                                    pushable=3,
+                                    tooltip={"always_visible": False, "placement": "bottom"}
+                                )
+                            ], sm=12, md=10, style={"margin-top": "15px"}),
+                        ], style={"height": "20%", "justify-content": "center"})
+                    ])
+                ], style=tab_card)
+            ])
+        ], class_name="g-2 my-auto"),
+
+        # -= LINHA 4 =- #
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H3(children="Indicadores Semanais"),
+                        html.H6(children="Médias móveis, variação anual, volatilidade e queda desde o pico"),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id="select_indicador",
+                                    value="mean12",
+                                    clearable=False,
+                                    className="dbc",
+                                    options=[
+                                        {"label": y, "value": x} for x, y in weekly_metrics.items()
+                                    ]
+                                )
+                            ], sm=12, md=4),
+                            dbc.Col([
+                                dcc.Dropdown(
+                                    id="select_analise",
+                                    value=[dados.at[dados.index[3], "ESTADO"], dados.at[dados.index[3], "REGIÃO"]],
+                                    clearable=False,
+                                    className="dbc",
+                                    multi=True,
+                                    options=[
+                                        {"label": x, "value": x} for x in dados["ESTADO"].unique()
+                                    ] + [
+                                        {"label": f"{x} (região)", "value": x} for x in dados["REGIÃO"].unique()
+                                    ]
+                                )
+                            ], sm=12, md=8)
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dcc.Graph(id="weekly_graph", config={"displayModeBar": False, "showTips": False})
+                            ])
                         ])
-                    ], style=tab_card)
-                ])
-            ], justify="center", style={"height": "50%"})
-        ], sm=12, lg=3, style={"height": "100%"})
-    ], class_name="g-2 my-auto"),
-
-    # -= LINHA 3 =- #
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    dbc.Row([
-                        dbc.Col([
-                            dcc.RangeSlider(
-                                id="rangeslider",
-                                marks={int(x): f'{x}' for x in dados["ANO"].unique()},
-                                step=3,
-                                min=2004,
-                                max=2021,
-                                className="dbc",
-                                value=[2004, 2021],
-                                dots=True,
-                                pushable=3,
-                                tooltip={"always_visible": False, "placement": "bottom"}
-                            )
-                        ], sm=12, md=10, style={"margin-top": "15px"}),
-                    ], style={"height": "20%", "justify-content": "center"})
-                ])
-            ], style=tab_card)
-        ])
-    ], class_name="g-2 my-auto")
-], fluid=True, style={"height": "100%"})
+                    ])
+                ], style=tab_card)
+            ], sm=12, lg=8),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H3(children="Ranking dos Estados"),
+                        html.H6(children="Último valor do indicador no intervalo"),
+                        dcc.Graph(id="ranking_graph", config={"displayModeBar": False, "showTips": False})
+                    ])
+                ], style=tab_card)
+            ], sm=12, lg=4)
+        ], class_name="g-2 my-auto")
+    ], fluid=True, style={"height": "100%"})
 
 
 #######################################################################################
@@ -304,31 +393,25 @@ app.layout = dbc.Container(children=[
 
 # Callback para o gráfico de Máximos e Mínimos
 @app.callback(
-    Output("static_maxmin", "figure"),
+    Output("static_maxmin_data", "data"),
     [
-        Input("dataset", "data"),
-        Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        Input("dataset", "data")
     ]
 )
-def func(data, toggle):
+@figure_cache.memoize("func")
+def func(data):
 
-    # Instanciando o template selecionado pelo usuário
-    template = template_theme1 if toggle else template_theme2
-    
-    # Transformando o dicionário de dados em um DataFrame 
-    df = pd.DataFrame(data)
-
-    # Máximos e Mínimos por ano
-    max = df.groupby(["ANO"])["VALOR REVENDA (R$/L)"].max()
-    min = df.groupby(["ANO"])["VALOR REVENDA (R$/L)"].min()
-
-    # Concatenando os dados de máximos e mínimos criados acima
-    final_df = pd.concat([max, min], axis=1)
-    final_df.columns = ["Máximo", "Mínimo"]
+    # Máximos e Mínimos por ano, consultados no cubo de agregados
+    final_df = registry.cube(data).maxmin(*registry.years(data))
+    metrics.lap("pandas")
 
     # Criando Gráfico de Linha
-    fig = px.line(data_frame=final_df, x=final_df.index, y=final_df.columns, template=template)
-    fig.update_layout(main_config, height=150, xaxis_title=None, yaxis_title=None)
+    fig = go.Figure([
+        go.Scatter(name=coluna, x=final_df.index, y=final_df[coluna], mode="lines")
+        for coluna in final_df.columns
+    ])
+    fig.update_layout(main_config, height=150, xaxis_title=None, yaxis_title=None, template="none")
+    metrics.lap("figure")
 
     # Retornando o gráfico de linha
     return fig
@@ -336,31 +419,22 @@ def func(data, toggle):
 # Callback para o gráfico de barras horizontais
 @app.callback(
     [
-        Output("regiaobar_graph", "figure"),
-        Output("estadobar_graph", "figure")
+        Output("regiaobar_graph_data", "data"),
+        Output("estadobar_graph_data", "data")
     ],
     [
         Input("dataset_fixed", "data"),
         Input("select_ano", "value"),
-        Input("select_regiao", "value"),
-        Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        Input("select_regiao", "value")
     ]
 )
-def graph1(data, ano, regiao, toggle):
-
-    # Instanciando o template selecionado pelo usuário
-    template = template_theme1 if toggle else template_theme2
-
-    # Transformando o dicionário de dados em um DataFrame do Pandas
-    df = pd.DataFrame(data)
-
-    # Selecionando os dados segundo o Ano selecionado no DropDawn pelo usuário
-    df_filtred = df[df["ANO"].isin([ano])]
+@figure_cache.memoize("graph1")
+def graph1(data, ano, regiao):
 
-    # Selecionando e agrupando os dados por região e estado
-    df_regiao = df_filtred.groupby(["ANO", "REGIÃO"])["VALOR REVENDA (R$/L)"].mean().reset_index()
-    df_estado = df_filtred.groupby(["ANO", "ESTADO", "REGIÃO"])["VALOR REVENDA (R$/L)"].mean().reset_index()
-    df_estado = df_estado[df_estado["REGIÃO"].isin([regiao])]
+    # Médias por região e por estado no ano selecionado, consultadas no cubo de agregados
+    cube      = registry.cube(data)
+    df_regiao = cube.regions(ano)
+    df_estado = cube.states(ano, regiao)
 
     # Reordenando os dados
     df_regiao = df_regiao.sort_values(by=["VALOR REVENDA (R$/L)"], ascending=True)
@@ -373,6 +447,7 @@ def graph1(data, ano, regiao, toggle):
     # Textos para a figura
     fig1_text = [f"{x} - R${y}" for x, y in zip(df_regiao["REGIÃO"].unique(), df_regiao["VALOR REVENDA (R$/L)"].unique())]
     fig2_text = [f"R${y} - {x}" for x, y in zip(df_estado["ESTADO"].unique(), df_estado["VALOR REVENDA (R$/L)"].unique())]
+    metrics.lap("pandas")
 
     # Criando os gráficos de barras horizontais
     
@@ -397,75 +472,98 @@ def graph1(data, ano, regiao, toggle):
         insidetextfont=dict(family="Times", size=12)
     ))
 
-    fig1.update_layout(main_config, yaxis={"showticklabels": False}, height=140, template=template)
-    fig2.update_layout(main_config, yaxis={"showticklabels": False}, height=140, template=template)
+    fig1.update_layout(main_config, yaxis={"showticklabels": False}, height=140, template="none")
+    fig2.update_layout(main_config, yaxis={"showticklabels": False}, height=140, template="none")
     fig1.update_layout(xaxis_range=[df_regiao["VALOR REVENDA (R$/L)"].max(), df_regiao["VALOR REVENDA (R$/L)"].min() - 0.15])
     fig2.update_layout(xaxis_range=[df_estado["VALOR REVENDA (R$/L)"].min() - 0.15, df_estado["VALOR REVENDA (R$/L)"].max()])
+    metrics.lap("figure")
 
     # Retornando os gráficos para exposição
     return [fig1, fig2]
 
 # Preço x Estado
 @app.callback(
-    Output("animation_graph", "figure"),
+    Output("animation_graph_data", "data"),
     [
         Input("dataset", "data"),
         Input("select_estado0", "value"),
-        Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        Input("animation_graph", "relayoutData"),
+        Input("viewport", "data")
     ]
 )
-def animation(data, estados, toggle):
-
-    # Instanciando o layout selecionado pelo usuário
-    template = template_theme1 if toggle else template_theme2
-
-    # Transformando o dicionário de dados em um Dataframe do Pandas
-    df = pd.DataFrame(data)
-
-    # Selecionando as observações com os estados de interesse
-    mask = df["ESTADO"].isin(estados)
-
-    # Construção do Gráfico
-    fig = px.line(df[mask], x="DATA", y="VALOR REVENDA (R$/L)", color="ESTADO", template=template)
-    fig.update_layout(main_config, height=425, xaxis_title=None)
+# Entradas que definem a figura do Preço x Estado: a faixa visível e a largura da
+# janela são arredondadas antes de compor a chave do cache, então pequenos
+# deslocamentos do zoom e redimensionamentos reaproveitam a mesma figura
+def animation_view(data, estados, relayout, viewport):
+    return data, estados, snap_relayout(relayout), snap_viewport(viewport)
+
+@figure_cache.memoize("animation", canonical=animation_view)
+def animation(data, estados, relayout, viewport):
+
+    # Resolvendo a chave do dcc.Store para o DataFrame do servidor, restrito à faixa
+    # visível quando o usuário aplica zoom no gráfico
+    inicio, fim = visible_range(relayout)
+
+    # Pontos por estado: no máximo um por pixel e um total limitado para a figura toda,
+    # de modo que a resposta não cresce com o histórico nem com a quantidade de estados
+    largura = (viewport or {}).get("width") or 1000
+    pontos  = budget(len(estados), largura, config.MAX_POINTS)
+
+    # Série de cada estado selecionado, reaproveitada entre chamadas: incluir um estado
+    # na seleção calcula apenas a série do novo estado
+    series = [(estado, state_series(data, inicio, fim, estado, pontos)) for estado in estados]
+    series = [(estado, linhas) for estado, linhas in series if len(linhas)]
+    metrics.lap("pandas")
+
+    # Construção do Gráfico: uma linha por estado. O uirevision mantém o zoom do usuário
+    # quando a figura é substituída pela versão com mais detalhes da faixa visível
+    fig = go.Figure([
+        go.Scatter(name=estado, x=linhas["DATA"], y=linhas["VALOR REVENDA (R$/L)"], mode="lines")
+        for estado, linhas in series
+    ])
+    fig.update_layout(main_config, height=425, xaxis_title=None, template="none",
+                      uirevision=f"{data['product']}-{data['range']}")
+    metrics.lap("figure")
 
     # Retornando o gráfico
     return fig
 
-# grafico de comparação direta
-@app.callback(
-    [Output('direct_comparison_graph', 'figure'),
-    Output('desc_comparison', 'children')],
-    [Input('dataset', 'data'),
+# grafico de comparação direta: executado no próprio worker ou, com GAS_PRICES_JOBS,
+# em um processo do pool (ver os callbacks de submissão e consulta abaixo)
+comparison_outputs = [
+    Output('direct_comparison_graph_data', 'data'),
+    Output('desc_comparison', 'children')
+]
+comparison_inputs = [
+    Input('dataset', 'data'),
     Input('select_estado1', 'value'),
-    Input('select_estado2', 'value'),
-    Input(ThemeSwitchAIO.ids.switch("theme"), "value")]
-)
-def func(data, est1, est2, toggle):
-    template = template_theme1 if toggle else template_theme2
-
-    dff = pd.DataFrame(data)
-    df1 = dff[dff.ESTADO.isin([est1])]
-    df2 = dff[dff.ESTADO.isin([est2])]
-    df_final = pd.DataFrame()
-    
-    df_estado1 = df1.groupby(pd.PeriodIndex(df1['DATA'], freq="M"))['VALOR REVENDA (R$/L)'].mean().reset_index()
-    df_estado2 = df2.groupby(pd.PeriodIndex(df2['DATA'], freq="M"))['VALOR REVENDA (R$/L)'].mean().reset_index()
-
-    df_estado1['DATA'] = pd.PeriodIndex(df_estado1['DATA'], freq="M")
-    df_estado2['DATA'] = pd.PeriodIndex(df_estado2['DATA'], freq="M")
-
-    df_final['DATA'] = df_estado1['DATA'].astype('datetime64[ns]')
-    df_final['VALOR REVENDA (R$/L)'] = df_estado1['VALOR REVENDA (R$/L)']-df_estado2['VALOR REVENDA (R$/L)']
+    Input('select_estado2', 'value')
+]
+
+@runner.task("direct_comparison")
+@figure_cache.memoize("direct_comparison")
+def direct_comparison(data, est1, est2):
+    # Diferença mensal entre os dois estados, alinhada pelo calendário na matriz de preços
+    # (as linhas de cada estado são compartilhadas com as demais comparações)
+    meses, diferencas = difference(data, est1, est2)
+
+    # Fração dos meses (com dado nos dois estados) em que o primeiro foi mais barato
+    fracao = cheaper_share(data, est1, est2)
+
+    # Trecho acima de zero (os demais meses ficam sem valor)
+    acima = diferencas.copy()
+    acima[~(diferencas > 0)] = float("nan")
+    metrics.lap("pandas")
+    progress(0.5, "Montando o gráfico")
     
     fig = go.Figure()
     # Toda linha
-    fig.add_scattergl(name=est1, x=df_final['DATA'], y=df_final['VALOR REVENDA (R$/L)'])
+    fig.add_scattergl(name=est1, x=meses, y=diferencas)
     # Abaixo de zero
-    fig.add_scattergl(name=est2, x=df_final['DATA'], y=df_final['VALOR REVENDA (R$/L)'].where(df_final['VALOR REVENDA (R$/L)'] > 0.00000))
+    fig.add_scattergl(name=est2, x=meses, y=acima)
 
     # Updates
-    fig.update_layout(main_config, height=350, template=template)
+    fig.update_layout(main_config, height=350, template="none")
     fig.update_yaxes(range = [-0.7,0.7])
 
     # Annotations pra mostrar quem é o mais barato
@@ -488,83 +586,195 @@ def func(data, est1, est2, toggle):
             ),
         align="center", bgcolor="rgba(0,0,0,0.5)", opacity=0.8,
         x=0.1, y=0.25, showarrow=False) 
+    metrics.lap("figure")
 
     # Definindo o texto
     text = f"Comparando {est1} e {est2}. Se a linha estiver acima do eixo X, {est2} tinha menor preço, do contrário, {est1} tinha um valor inferior"
+    if not math.isnan(fracao):
+        text += f". {est1} foi mais barato em {fracao:.0%} dos meses"
     return [fig, text]
 
+if runner.enabled:
+
+    # Submissão e consulta do job em um único callback. Quando as entradas mudam, o job
+    # das novas entradas é submetido e o anterior, cujas entradas deixaram de valer, é
+    # cancelado; os jobs são da sessão, então o cancelamento não afeta outras sessões
+    # que comparam os mesmos estados. A cada intervalo, enquanto o job não termina, a
+    # barra de progresso é atualizada; ao terminar, o resultado é publicado e o
+    # intervalo desligado. Um job cancelado enquanto as entradas atuais ainda o pedem
+    # (ex.: A -> B -> A) é submetido de novo
+    @app.callback(
+        [Output("comparison_job", "data")] + comparison_outputs + [
+            Output("comparison_progress", "value"),
+            Output("comparison_progress", "style"),
+            Output("comparison_poll", "disabled")
+        ],
+        comparison_inputs + [
+            Input("comparison_poll", "n_intervals")
+        ],
+        [
+            State("comparison_job", "data"),
+            State("session", "data")
+        ]
+    )
+    def comparison(data, est1, est2, n_intervals, anterior, sessao):
+        oculto = {"display": "none"}
+
+        # Figura já no cache: gerada no próprio worker, sem o pool e sem esperar o
+        # intervalo da consulta
+        if figure_cache.contains("direct_comparison", data, est1, est2):
+            runner.cancel(anterior)
+            figura, texto = direct_comparison(data, est1, est2)
+            return None, figura, texto, 100, oculto, True
+
+        job = anterior
+        if callback_context.triggered_id != "comparison_poll" or not job:
+            job = runner.submit("direct_comparison", data, est1, est2, scope=sessao)
+            if anterior != job:
+                runner.cancel(anterior)
+
+        status = runner.status(job)
+        if status["state"] == "cancelled":
+            job    = runner.submit("direct_comparison", data, est1, est2, scope=sessao)
+            status = runner.status(job)
+
+        if status["state"] == "done":
+            figura, texto = runner.result(job)
+            return job, figura, texto, 100, oculto, True
+        if status["state"] in ("failed", "unknown"):
+            return job, no_update, "Não foi possível calcular a comparação.", 0, oculto, True
+        return job, no_update, no_update, int(status["progress"] * 100), {"height": "4px"}, False
+else:
+    app.callback(comparison_outputs, comparison_inputs)(direct_comparison)
+
 # Indicator 1
 @app.callback(
-    Output("card1_indicators", "figure"),
+    Output("card1_indicators_data", "data"),
     [
         Input("dataset", "data"),
-        Input("select_estado1", "value"),
-        Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        Input("select_estado1", "value")
     ]
 )
-def card1(data, estado, toggle):
-
-    # Definindo template selecionado pelo usuário
-    template = template_theme1 if toggle else template_theme2
-
-    # Transformando o dicionário de dados em um DataFrame do Pandas
-    df = pd.DataFrame(data)
+@figure_cache.memoize("card1")
+def card1(data, estado):
 
-    # Selecionando apenas as observações referente ao estado selecionado
-    df_final = df[df["ESTADO"].isin([estado])]
+    # Primeiro e último preço do estado no intervalo, consultados no cubo de agregados
+    # (os anos do intervalo são compartilhados entre os dois cards)
+    primeiro, ultimo = endpoints(data, estado)
 
-    data1 = str(int(df["ANO"].min()) - 1)
-    data2 = df["ANO"].max()
+    anos  = years(data)
+    data1 = str(int(anos.min()) - 1)
+    data2 = anos.max()
+    metrics.lap("pandas")
 
     # Instanciando figura
     fig = go.Figure()
     fig.add_trace(go.Indicator(
         mode="number+delta",
         title={"text": f"<span style= 'size: 60%'>{estado}</span><br><span style= 'font-size: 0.7em'>{data1} - {data2}</span>"},
-        value=df_final.at[df_final.index[-1], 'VALOR REVENDA (R$/L)'],
+        value=ultimo,
         number={'prefix': 'R$', 'valueformat': '.2f'},
-        delta={'relative': True, 'valueformat': '.1%', 'reference': df_final.at[df_final.index[0], 'VALOR REVENDA (R$/L)']}
+        delta={'relative': True, 'valueformat': '.1%', 'reference': primeiro}
     ))
-    fig.update_layout(main_config, height=250, template=template)
+    fig.update_layout(main_config, height=250, template="none")
+    metrics.lap("figure")
 
     # Retornando o card indicator
     return fig
 
 # Card Indicator 2
 @app.callback(
-    Output("card2_indicators", "figure"),
+    Output("card2_indicators_data", "data"),
     [
         Input("dataset", "data"),
-        Input("select_estado2", "value"),
-        Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        Input("select_estado2", "value")
     ]
 )
-def card2(data, estado, toggle):
+@figure_cache.memoize("card2")
+def card2(data, estado):
 
-    # Instanciando o layout selecionado pelo usuário
-    template = template_theme1 if toggle else template_theme2
+    # Primeiro e último preço do estado no intervalo, consultados no cubo de agregados
+    # (os anos do intervalo são compartilhados entre os dois cards)
+    primeiro, ultimo = endpoints(data, estado)
 
-    # Transformando o dicionário de dados em um DataFrame do Pandas
-    df = pd.DataFrame(data)
-    df_final = df[df["ESTADO"].isin([estado])]
-
-    data1 = str(int(df['ANO'].min()) - 1)
-    data2 = df["ANO"].max()
+    anos  = years(data)
+    data1 = str(int(anos.min()) - 1)
+    data2 = anos.max()
+    metrics.lap("pandas")
 
     # Construindo o CardIndicators
     fig = go.Figure()
     fig.add_trace(go.Indicator(
         mode="number+delta",
         title={"text": f"<span style= 'size: 60%'>{estado}</span><br><span style= 'font-size: 0.7em'>{data1} - {data2}</span>"},
-        value=df_final.at[df_final.index[-1], 'VALOR REVENDA (R$/L)'],
+        value=ultimo,
         number={"prefix": "R$", "valueformat": ".2f"},
-        delta={'relative': True, "valueformat": ".1%", "reference": df_final.at[df_final.index[0], "VALOR REVENDA (R$/L)"]}
+        delta={'relative': True, "valueformat": ".1%", "reference": primeiro}
     ))
-    fig.update_layout(main_config, height=250, template=template)
+    fig.update_layout(main_config, height=250, template="none")
+    metrics.lap("figure")
 
     # Retornando o card
     return fig
 
+# Indicadores semanais por estado e região
+@app.callback(
+    Output("weekly_graph_data", "data"),
+    [
+        Input("dataset", "data"),
+        Input("select_indicador", "value"),
+        Input("select_analise", "value")
+    ]
+)
+@figure_cache.memoize("weekly")
+def weekly(data, indicador, selecionados):
+
+    # Linha de cada estado ou região na matriz semanal do cubo, reaproveitada entre
+    # chamadas: incluir um estado na seleção consulta apenas a linha do novo estado
+    series = [(nome, *weekly_row(data, indicador, nome)) for nome in selecionados]
+    metrics.lap("pandas")
+
+    fig = go.Figure([
+        go.Scatter(name=nome, x=semanas, y=valores, mode="lines", connectgaps=False)
+        for nome, semanas, valores in series
+    ])
+    fig.update_layout(main_config, height=350, xaxis_title=None, template="none",
+                      yaxis={"ticksuffix": "%" if indicador in percent_metrics else ""})
+    metrics.lap("figure")
+
+    return fig
+
+# Ranking dos estados pelo indicador selecionado
+@app.callback(
+    Output("ranking_graph_data", "data"),
+    [
+        Input("dataset", "data"),
+        Input("select_indicador", "value")
+    ]
+)
+@figure_cache.memoize("ranking")
+def ranking(data, indicador):
+
+    # Último valor de cada estado no intervalo, consultado no cubo de agregados
+    valores = registry.cube(data).ranking(indicador, *registry.years(data)).dropna().sort_values()
+    metrics.lap("pandas")
+
+    sufixo  = "%" if indicador in percent_metrics else ""
+    prefixo = "" if sufixo else "R$"
+    fig = go.Figure(go.Bar(
+        x=valores.to_numpy(),
+        y=valores.index,
+        orientation="h",
+        text=[f"{prefixo}{y:.2f}{sufixo} - {x}" for x, y in valores.items()],
+        textposition="auto",
+        insidetextanchor="end",
+        insidetextfont=dict(family="Times", size=12)
+    ))
+    fig.update_layout(main_config, yaxis={"showticklabels": False}, height=430, template="none")
+    metrics.lap("figure")
+
+    return fig
+
 # Callback - RangerSlider
 @app.callback(
     Output("dataset", "data"),
@@ -576,15 +786,225 @@ def card2(data, estado, toggle):
 , prevent_initial_call=True)
 def range_slider(range, data):
 
-    # Transformando o dicionário de dados em um DataFrame do Pandas
-    df = pd.DataFrame(data)
-    df = df[(df['ANO'] > f'{range[0]}-01-01') & (df['ANO'] <= f'{range[1]}-31-12')]
-    data = df.to_dict()
+    # Retornando apenas a chave com o intervalo do RangeSlider selecionado pelo usuário,
+    # sempre na versão corrente do produto (recarregada a quente após uma ingestão)
+    return registry.key(None, range[0], range[1], product=data["product"])
+
+# Callback - Seleção do produto (a partição é carregada no primeiro uso)
+@app.callback(
+    Output("dataset_fixed", "data"),
+    [
+        Input("select_produto", "value")
+    ]
+, prevent_initial_call=True)
+def select_product(produto):
+
+    # Retornando a chave da versão corrente do produto, sem intervalo de anos
+    return registry.key(product=produto)
+
+# Callback - Opções dos dropdowns e limites do RangeSlider do produto selecionado: os
+# anos, as regiões e os estados pesquisados variam entre os produtos. As seleções que
+# continuam válidas são mantidas; as demais passam para a primeira opção, e o
+# intervalo do RangeSlider é limitado aos anos do produto
+@app.callback(
+    [
+        Output("rangeslider", "min"), Output("rangeslider", "max"),
+        Output("rangeslider", "marks"), Output("rangeslider", "value"),
+        Output("select_ano", "options"), Output("select_ano", "value"),
+        Output("select_regiao", "options"), Output("select_regiao", "value"),
+        Output("select_estado0", "options"), Output("select_estado0", "value"),
+        Output("select_estado1", "options"), Output("select_estado1", "value"),
+        Output("select_estado2", "options"), Output("select_estado2", "value"),
+        Output("select_analise", "options"), Output("select_analise", "value")
+    ],
+    [
+        Input("dataset_fixed", "data")
+    ],
+    [
+        State("rangeslider", "value"),
+        State("select_ano", "value"), State("select_regiao", "value"),
+        State("select_estado0", "value"), State("select_estado1", "value"),
+        State("select_estado2", "value"), State("select_analise", "value")
+    ]
+, prevent_initial_call=True)
+def product_options(data, intervalo, ano, regiao, estados0, estado1, estado2, analise):
+
+    # Anos, regiões e estados do produto, consultados no cubo de agregados
+    cube    = registry.cube(data)
+    anos    = [int(x) for x in years(data)]
+    regioes = [str(x) for x in cube.analytics.regions]
+    estados = [str(x) for x in cube.analytics.states]
+
+    def manter(valor, validos):
+        return valor if valor in validos else validos[0]
+
+    def manter_varios(valores, validos):
+        return [valor for valor in valores or [] if valor in validos] or validos[:1]
+
+    # Intervalo atual recortado aos anos do produto; sem interseção, todos os anos
+    intervalo   = intervalo or [anos[0], anos[-1]]
+    inicio, fim = max(intervalo[0], anos[0]), min(intervalo[1], anos[-1])
+    if inicio > fim:
+        inicio, fim = anos[0], anos[-1]
+
+    return [
+        anos[0], anos[-1], {x: str(x) for x in anos}, [inicio, fim],
+        [{"label": str(x), "value": x} for x in anos], manter(ano, anos),
+        [{"label": x, "value": x} for x in regioes], manter(regiao, regioes),
+        [{"label": x, "value": x} for x in estados], manter_varios(estados0, estados),
+        [{"label": x, "value": x} for x in estados], manter(estado1, estados),
+        [{"label": x, "value": x} for x in estados], manter(estado2, estados),
+        [{"label": x, "value": x} for x in estados] + [{"label": f"{x} (região)", "value": x} for x in regioes],
+        manter_varios(analise, estados + regioes)
+    ]
+
+# Aplicação do tema: roda no navegador, combinando a figura vinda do servidor com o
+# template do tema selecionado, sem reenviar dados
+for graph_id in graph_ids:
+    app.clientside_callback(
+        ClientsideFunction(namespace="theme", function_name="apply_template"),
+        Output(graph_id, "figure"),
+        [
+            Input(f"{graph_id}_data", "data"),
+            Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+        ],
+        State("figure_templates", "data")
+    )
+
+# Largura da janela, lida no navegador ao carregar o painel
+app.clientside_callback(
+    ClientsideFunction(namespace="viewport", function_name="measure"),
+    Output("viewport", "data"),
+    Input("dataset_fixed", "data")
+)
+
+# Serialização das respostas com o orjson (quando instalado) e compressão gzip/brotli.
+# O plotly, com o orjson, consulta o pandas em cada valor serializado, e o pandas pode
+# estar sendo importado em segundo plano: até a carga terminar (ver INICIALIZAÇÃO) a
+# tela de carga é serializada com o json da biblioteca padrão. A compressão é
+# registrada antes das métricas para que o tamanho medido das respostas seja o do
+# JSON; o total após a compressão fica nas métricas do próprio compressor
+configure("json")
+if config.COMPRESS:
+    compressor.install(server)
+
+# Medição de todos os callbacks do servidor (tempo por fase, tamanhos e erros),
+# exportada no formato do Prometheus em /metrics
+metrics.instrument(app)
+metrics.gauge("gas_prices_figure_cache_entries", "Entradas no cache de figuras.", lambda: figure_cache.stats()["entries"])
+metrics.gauge("gas_prices_figure_cache_bytes", "Bytes ocupados pelo cache de figuras.", lambda: figure_cache.stats()["bytes"])
+metrics.gauge("gas_prices_figure_cache_hits", "Acertos do cache de figuras.", lambda: figure_cache.stats()["hits"])
+metrics.gauge("gas_prices_figure_cache_misses", "Falhas do cache de figuras.", lambda: figure_cache.stats()["misses"])
+metrics.gauge("gas_prices_compression_input_bytes", "Bytes das respostas antes da compressão.", lambda: compressor.stats()["input_bytes"])
+metrics.gauge("gas_prices_compression_output_bytes", "Bytes das respostas após a compressão.", lambda: compressor.stats()["output_bytes"])
+metrics.gauge("gas_prices_intermediate_bytes", "Bytes ocupados pelos resultados intermediários.", lambda: context.stats()["bytes"])
+metrics.collect(context.lines)
+
+@server.route(app.get_relative_path("/metrics"))
+def prometheus_metrics():
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# API somente leitura dos agregados, para outros serviços (ver gas_prices.api)
+server.register_blueprint(api, url_prefix=app.get_relative_path("/api/v1"))
+
+#######################################################################################
+# -= INICIALIZAÇÃO =-
+
+# Etapas executadas em segundo plano, na ordem em que são registradas. Enquanto não
+# terminam, o servidor já responde ao /healthz e o painel exibe uma tela de carga
+@startup.step("templates")
+def load_templates():
+    return read_templates()
+
+@startup.step("dataset")
+def load_dataset():
+
+    # Produto padrão: leitura do snapshot (ou do CSV) e cálculo do cubo de agregados
+    return registry.key()
+
+@startup.step("catalogue")
+def load_catalogue():
+    return catalogue()
+
+# Layout servido e a versão do produto padrão e o catálogo com que foi montado. A chave
+# dos dcc.Store é a da versão corrente a cada abertura do painel: depois de uma recarga
+# a quente, o layout é remontado e as sessões novas já começam na versão nova
+served_layout = {}
+
+def current_layout():
+    chave    = registry.key()
+    produtos = catalogue()
+
+    atual = served_layout.get("current")
+    if atual is None or atual[0] != (chave["version"], produtos):
+        atual = ((chave["version"], produtos), build_layout(chave, produtos, startup.results["templates"]))
+        served_layout["current"] = atual
+    return atual[1]
+
+@startup.step("layout")
+def load_layout():
+    return current_layout()
+
+@startup.step("figures")
+def warm_figures():
+
+    # Primeira figura do processo: carrega os validadores do plotly e deixa a figura
+    # inicial de Máximos e Mínimos no cache
+    return func(startup.results["dataset"]) is not None
+
+@startup.step("serializer")
+def configure_serializer():
+
+    # Motor JSON configurado (orjson), já com o pandas importado por completo
+    return configure()
+
+# Tela exibida até a inicialização terminar; recarrega a página quando /readyz responde
+def loading_layout():
+    return dbc.Container(children=[
+        html.H3(children="Carregando os dados...", style={"margin-top": "40px"}),
+        dcc.Store(id="startup_url", data=app.get_relative_path("/readyz")),
+        dcc.Interval(id="startup_interval", interval=1000),
+        html.Div(id="startup_reload")
+    ], fluid=True)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="startup", function_name="reload_when_ready"),
+    Output("startup_reload", "children"),
+    Input("startup_interval", "n_intervals"),
+    State("startup_url", "data")
+)
+
+def serve_layout():
+    if not startup.ready():
+        return loading_layout()
+
+    # Identificador de cada abertura do painel, que separa os jobs das sessões
+    return html.Div([dcc.Store(id="session", data=uuid.uuid4().hex), current_layout()], style={"height": "100%"})
+
+app.layout = serve_layout
+
+# Liveness: o processo está no ar e atendendo requisições
+@server.route(app.get_relative_path("/healthz"))
+def healthz():
+    return {"status": "ok"}
+
+# Readiness: dados carregados, agregados calculados e layout pronto (503 até lá)
+@server.route(app.get_relative_path("/readyz"))
+def readyz():
+    status = startup.status()
+    return status, 200 if status["ready"] else 503
+
+# Inicia a carga no processo que atende a primeira requisição (ex.: workers do gunicorn
+# criados sem o hook de gunicorn.conf.py); nos demais casos a chamada não faz nada. A
+# recarga a quente também começa aqui, apenas nos processos que atendem requisições
+server.before_request(startup.start)
+server.before_request(registry.watch)
 
-    # Retornando apenas as observações dentro do intervalo do RangeSlider selecionado pelo usuário
-    return data
+startup.mark("import")
 
 #########################################################################
 # -= END =- #
 if __name__ == '__main__':
+    runner.start()
+    startup.start()
     app.run_server(debug=False)
\ No newline at end of file
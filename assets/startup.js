@@ -0,0 +1,13 @@
+// Tela de carga: consulta o /readyz e recarrega a página quando os dados estão prontos
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    startup: {
+        reload_when_ready: function(n_intervals, url) {
+            fetch(url).then(function(response) {
+                if (response.ok) {
+                    window.location.reload();
+                }
+            });
+            return window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,15 @@
+// Aplicação do template do tema ativo às figuras geradas pelo servidor.
+// O servidor devolve as figuras sem template; ao alternar o tema apenas esta função
+// roda, no navegador, sem nenhuma requisição ao servidor.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    theme: {
+        apply_template: function(figure, toggle, templates) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            const template = templates[toggle ? "1" : "0"];
+            const layout = Object.assign({}, figure.layout, {template: template});
+            return Object.assign({}, figure, {layout: layout});
+        }
+    }
+});
@@ -0,0 +1,8 @@
+// Largura da janela do navegador, enviada ao servidor para limitar os pontos das séries
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    viewport: {
+        measure: function(dataset) {
+            return {width: window.innerWidth};
+        }
+    }
+});
@@ -0,0 +1,3 @@
+"""
+    Benchmarks do painel de Análise de Preços de Gás.
+"""
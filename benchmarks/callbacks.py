@@ -0,0 +1,276 @@
+#######################################################################################
+# -= BENCHMARK DOS CALLBACKS =-
+#
+# Chama diretamente cada callback do painel (sem o cache de figuras e sem o servidor)
+# sobre datasets sintéticos em escalas de 1x, 10x e 100x as linhas de um produto real,
+# e mede a distribuição da latência, o pico de memória alocada (tracemalloc) e o
+# tamanho da resposta serializada como o Dash a envia ao navegador: convertida em
+# dicionário com as séries arredondadas (gas_prices.cache.plain) e codificada com o
+# motor JSON configurado (GAS_PRICES_JSON_ENGINE). O resultado é
+# gravado em JSON e pode ser comparado com uma execução anterior para encontrar
+# regressões.
+#
+#     python -m benchmarks.callbacks --scales 1 10 100 --output atual.json
+#     python -m benchmarks.callbacks --compare base.json --output atual.json
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# O benchmark não usa a recarga a quente nem os caches (figuras e resultados
+# intermediários); configurado antes de importar o app
+os.environ.setdefault("GAS_PRICES_RELOAD_SECONDS", "0")
+os.environ.setdefault("GAS_PRICES_CACHE_MB", "0")
+os.environ.setdefault("GAS_PRICES_CONTEXT_MB", "0")
+
+from plotly.io.json import to_json_plotly
+
+import app
+from benchmarks.synthetic import REGIONS, generate
+from gas_prices.cache import plain
+from gas_prices.registry import registry
+from gas_prices.serialize import configure
+
+# Motor JSON do servidor após a carga dos dados (o app começa com o json da biblioteca
+# padrão enquanto o pandas é importado; ver app.py)
+configure()
+
+# Percentis reportados para a latência
+PERCENTILES = [50, 90, 99]
+
+
+def cases(key):
+
+    """
+        Entradas de cada callback, variadas para não medir um único caminho.
+            - key: chave do dcc.Store do dataset sintético (sem intervalo de anos).
+    """
+
+    produto = key["product"]
+    faixas  = [None, (2007, 2013), (2015, 2021)]
+    chaves  = [key if faixa is None else registry.key(key["version"], *faixa, product=produto) for faixa in faixas]
+    regioes = list(REGIONS)
+    pares   = [("SAO PAULO", "BAHIA"), ("PARANA", "SANTA CATARINA"), ("ACRE", "RORAIMA")]
+    grupos  = [["SAO PAULO", "BAHIA", "GOIAS"], ["ACRE", "PARA"], list(REGIONS["SUL"])]
+    medidas = ["mean12", "yoy", "volatility"]
+    zooms   = [None, {"xaxis.range[0]": "2009-01-01", "xaxis.range[1]": "2010-06-30"}, {"xaxis.autorange": True}]
+
+    return {
+        "func":              [(chave,) for chave in chaves],
+        "graph1":            [(key, ano, regiao) for ano, regiao in zip([2005, 2012, 2020], regioes)],
+        "animation":         [(chave, grupo, zoom, {"width": 1280}) for chave, grupo, zoom in zip(chaves, grupos, zooms)],
+        "direct_comparison": [(chave, *par) for chave, par in zip(chaves, pares)],
+        "card1":             [(chave, par[0]) for chave, par in zip(chaves, pares)],
+        "card2":             [(chave, par[1]) for chave, par in zip(chaves, pares)],
+        "weekly":            [(chave, metrica, grupo + regioes[:1]) for chave, metrica, grupo in zip(chaves, medidas, grupos)],
+        "ranking":           [(chave, metrica) for chave, metrica in zip(chaves, medidas)],
+        "range_slider":      [(list(faixa), key) for faixa in faixas[1:]] + [([2004, 2021], key)],
+    }
+
+
+def callback(name):
+
+    """
+        Callback como o servidor o executa com o cache de figuras desativado: a função
+        original seguida da conversão da resposta (ver gas_prices.prewarm.render).
+    """
+
+    func = getattr(app, name)
+    func = getattr(func, "__wrapped__", func)
+    return lambda *args: plain(func(*args))
+
+
+def measure(func, entradas, repeat, warmup):
+
+    """
+        Mede um callback.
+            - func: função do callback.
+            - entradas: lista de tuplas de argumentos, usadas de forma alternada.
+            - repeat: quantidade de chamadas cronometradas.
+            - warmup: chamadas iniciais descartadas.
+    """
+
+    ciclo = itertools.cycle(entradas)
+    for _ in range(warmup):
+        func(*next(ciclo))
+
+    tempos = []
+    for _ in range(repeat):
+        args   = next(ciclo)
+        inicio = time.perf_counter()
+        func(*args)
+        tempos.append(time.perf_counter() - inicio)
+
+    # Pico de memória e tamanho da resposta, uma chamada por conjunto de entradas
+    picos, tamanhos = [], []
+    for args in entradas:
+        tracemalloc.start()
+        resposta = func(*args)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        tamanhos.append(len(to_json_plotly(resposta).encode("utf-8")))
+
+    tempos = np.array(tempos) * 1000
+    resultado = {f"p{p}_ms": round(float(np.percentile(tempos, p)), 3) for p in PERCENTILES}
+    resultado.update({
+        "mean_ms":        round(float(tempos.mean()), 3),
+        "min_ms":         round(float(tempos.min()), 3),
+        "max_ms":         round(float(tempos.max()), 3),
+        "peak_bytes":     int(max(picos)),
+        "payload_bytes":  int(max(tamanhos)),
+        "calls":          repeat,
+    })
+    return resultado
+
+
+def run(scales, repeat, warmup, names=None, seed=0):
+
+    """
+        Executa o benchmark em cada escala e devolve o dicionário de resultados.
+    """
+
+    resultados = {}
+    for scale in scales:
+        inicio = time.perf_counter()
+        frame  = generate(scale, seed=seed)
+        gerado = time.perf_counter() - inicio
+
+        # Publicando o dataset como um produto próprio (inclui o cálculo do cubo)
+        produto = f"SINTETICO {scale}X"
+        inicio  = time.perf_counter()
+        registry.publish(frame, produto)
+        publicado = time.perf_counter() - inicio
+
+        key     = registry.key(product=produto)
+        medidas = {}
+        for name, entradas in cases(key).items():
+            if names and name not in names:
+                continue
+            medidas[name] = measure(callback(name), entradas, repeat, warmup)
+            print(f"  {scale:>4}x  {name:<18} p50 {medidas[name]['p50_ms']:>9.3f} ms  "
+                  f"p99 {medidas[name]['p99_ms']:>9.3f} ms  pico {medidas[name]['peak_bytes'] / 1024:>9.1f} KB  "
+                  f"resposta {medidas[name]['payload_bytes'] / 1024:>8.1f} KB")
+
+        resultados[str(scale)] = {
+            "rows":        len(frame),
+            "generate_s":  round(gerado, 3),
+            "publish_s":   round(publicado, 3),
+            "callbacks":   medidas,
+        }
+
+    return resultados
+
+
+def environment():
+
+    """
+        Versões e máquina da execução, gravadas junto dos resultados.
+    """
+
+    import pandas
+    import plotly
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "created":  time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit":   commit,
+        "python":   platform.python_version(),
+        "pandas":   pandas.__version__,
+        "numpy":    np.__version__,
+        "plotly":   plotly.__version__,
+        "machine":  platform.machine(),
+        "cpus":     os.cpu_count(),
+    }
+
+
+def compare(atual, base, threshold):
+
+    """
+        Compara duas execuções e imprime a variação de cada métrica.
+            - threshold: variação relativa (ex.: 0.1 = 10%) a partir da qual uma piora
+              é considerada regressão.
+        Retorna a lista de regressões encontradas. O p99 é apenas exibido: com poucas
+        chamadas ele oscila demais entre execuções para servir de critério.
+    """
+
+    metricas   = ["p50_ms", "p99_ms", "peak_bytes", "payload_bytes"]
+    criterios  = {"p50_ms", "peak_bytes", "payload_bytes"}
+    regressoes = []
+
+    print(f"\n{'ESCALA':<8}{'CALLBACK':<20}" + "".join(f"{metrica:>16}" for metrica in metricas))
+    for scale, dados in atual["results"].items():
+        anteriores = base["results"].get(scale, {}).get("callbacks", {})
+        for name, medidas in dados["callbacks"].items():
+            if name not in anteriores:
+                continue
+
+            colunas = []
+            for metrica in metricas:
+                antes, depois = anteriores[name][metrica], medidas[metrica]
+                variacao = (depois - antes) / antes if antes else 0.0
+                piorou   = metrica in criterios and variacao > threshold
+                marca    = " !" if piorou else "  "
+                if piorou:
+                    regressoes.append((scale, name, metrica, antes, depois))
+                colunas.append(f"{variacao:>+13.1%}{marca}")
+            print(f"{scale + 'x':<8}{name:<20}" + "".join(colunas))
+
+    return regressoes
+
+
+def main(argv=None):
+
+    """
+        Linha de comando do benchmark dos callbacks.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark dos callbacks do painel com dados sintéticos.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="escalas do dataset sintético")
+    parser.add_argument("--repeat", type=int, default=30, help="chamadas cronometradas por callback")
+    parser.add_argument("--warmup", type=int, default=3, help="chamadas de aquecimento descartadas")
+    parser.add_argument("--callbacks", nargs="+", help="apenas os callbacks informados")
+    parser.add_argument("--seed", type=int, default=0, help="semente do gerador sintético")
+    parser.add_argument("--output", help="arquivo JSON onde gravar os resultados")
+    parser.add_argument("--compare", help="resultados anteriores (JSON) para comparação")
+    parser.add_argument("--threshold", type=float, default=0.1, help="piora relativa considerada regressão")
+    args = parser.parse_args(argv)
+
+    # Cada escala é publicada como um produto; todas ficam em memória durante a execução
+    registry.max_products = max(registry.max_products or 0, len(args.scales) + 1)
+
+    atual = {
+        "environment": environment(),
+        "settings":    {"repeat": args.repeat, "warmup": args.warmup, "seed": args.seed},
+        "results":     run(args.scales, args.repeat, args.warmup, args.callbacks, args.seed),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(atual, file, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            base = json.load(file)
+        regressoes = compare(atual, base, args.threshold)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressões acima de {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,644 @@
+#######################################################################################
+# -= TESTE DE CARGA COM SESSÕES CONCORRENTES =-
+#
+# Sobe o app no gunicorn local (gunicorn.conf.py) e simula várias sessões de usuários
+# ao mesmo tempo. Cada sessão abre o painel e percorre uma jornada de ações sorteadas:
+# mover o RangeSlider, trocar o ano, a região, os estados, o indicador semanal e o tema,
+# e aplicar zoom no gráfico Preço x Estado.
+#
+# As requisições são as mesmas que o navegador faria. O layout e a lista de callbacks
+# são lidos de /_dash-layout e /_dash-dependencies, e cada ação dispara em ondas os
+# callbacks do servidor que dependem da propriedade alterada. A resposta de cada onda
+# alimenta a seguinte, como no renderer do Dash: o RangeSlider atualiza o Store
+# "dataset", que dispara todos os gráficos. Os Intervals habilitados por uma resposta
+# (ex.: a consulta dos jobs da comparação) são incrementados no seu intervalo até
+# serem desabilitados.
+#
+# Os callbacks do navegador (clientside) não geram requisições. Trocar o tema, por
+# exemplo, só reaplica os templates no navegador, e a jornada registra a ação sem
+# nenhuma chamada ao servidor.
+#
+# Mede a latência de cada callback e de cada ação completa (todas as ondas), a vazão
+# e os erros. A memória dos workers (RSS, PSS e privada) é amostrada ao longo da
+# execução. Configurações diferentes do servidor (workers, threads, variáveis
+# GAS_PRICES_*) são executadas em sequência com as mesmas jornadas e comparadas lado
+# a lado:
+#
+#     python -m benchmarks.loadtest --sessions 20 --duration 60
+#     python -m benchmarks.loadtest --config 2w:workers=2 --config 4w:workers=4 \
+#         --config 2w4t-sem-cache:workers=2,threads=4,GAS_PRICES_CACHE_MB=0 --output carga.json
+
+import argparse
+import concurrent.futures
+import gzip
+import json
+import os
+import random
+import runpy
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+from gas_prices import config
+
+# Percentis reportados para a latência
+PERCENTILES = [50, 95, 99]
+
+# Ações das jornadas e o peso de cada uma no sorteio
+ACTIONS = {
+    "rangeslider": 3,
+    "ano":         2,
+    "regiao":      2,
+    "estados":     2,
+    "comparacao":  2,
+    "indicadores": 2,
+    "tema":        1,
+    "zoom":        1,
+}
+
+# Tamanho da janela do navegador simulado (Store "viewport", preenchido no navegador)
+VIEWPORT = {"width": 1280, "height": 800}
+
+# Opções da configuração que viram argumentos do gunicorn; as demais são variáveis de
+# ambiente do servidor
+GUNICORN_OPTIONS = {"workers": "--workers", "threads": "--threads", "worker_class": "--worker-class"}
+
+# Função de memória por processo definida na configuração do gunicorn
+memory = runpy.run_path(os.path.join(config.BASE_DIR, "gunicorn.conf.py"))["memory"]
+
+
+def component_key(component_id):
+
+    """
+        Id do componente como texto; ids em dicionário são serializados como JSON com
+        as chaves ordenadas, como faz o Dash.
+    """
+
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(",", ":"))
+    return component_id
+
+
+def prop_id(component_id, prop):
+    return f"{component_key(component_id)}.{prop}"
+
+
+def split_prop(texto):
+    component_id, prop = texto.rsplit(".", 1)
+    return {"id": json.loads(component_id) if component_id.startswith("{") else component_id, "property": prop}
+
+
+class Callback:
+
+    """
+        Callback do servidor lido de /_dash-dependencies.
+    """
+
+    def __init__(self, dependency):
+        self.output  = dependency["output"]
+        self.multi   = self.output.startswith("..")
+        saidas       = self.output[2:-2].split("...") if self.multi else [self.output]
+        self.outputs = [split_prop(saida) for saida in saidas]
+        self.inputs  = dependency["inputs"]
+        self.state   = dependency.get("state", [])
+        self.initial = not dependency.get("prevent_initial_call")
+
+        # Nome no relatório: o primeiro componente de saída e a quantidade dos demais
+        componentes = list(dict.fromkeys(str(saida["id"]) for saida in self.outputs))
+        self.name   = componentes[0] + (f" (+{len(componentes) - 1})" if len(componentes) > 1 else "")
+
+    @property
+    def input_ids(self):
+        return {prop_id(item["id"], item["property"]) for item in self.inputs}
+
+    @property
+    def output_ids(self):
+        return {prop_id(item["id"], item["property"]) for item in self.outputs}
+
+    def payload(self, values, changed):
+
+        """
+            Corpo da requisição ao /_dash-update-component, como o enviado pelo
+            renderer do Dash.
+        """
+
+        def com_valor(itens):
+            return [{**item, "value": values.get(prop_id(item["id"], item["property"]))} for item in itens]
+
+        return {
+            "output":         self.output,
+            "outputs":        self.outputs if self.multi else self.outputs[0],
+            "inputs":         com_valor(self.inputs),
+            "state":          com_valor(self.state),
+            "changedPropIds": sorted(changed & self.input_ids),
+        }
+
+
+def server_callbacks(dependencies):
+
+    """
+        Callbacks executados no servidor. Os do navegador (clientside) não geram
+        requisições, e os de ids com curingas (MATCH/ALL) pertencem a componentes que o
+        layout não usa.
+    """
+
+    return [
+        Callback(dependency) for dependency in dependencies
+        if dependency.get("clientside_function") is None and "[" not in dependency["output"]
+    ]
+
+
+def walk(layout, values, components):
+
+    """
+        Valores iniciais das propriedades dos componentes do layout, no formato
+        {"id.propriedade": valor}.
+    """
+
+    if isinstance(layout, list):
+        for item in layout:
+            walk(item, values, components)
+        return
+    if not isinstance(layout, dict) or "props" not in layout:
+        return
+
+    props = layout["props"]
+    if "id" in props:
+        components[component_key(props["id"])] = layout
+        for prop, valor in props.items():
+            if prop not in ("id", "children"):
+                values[prop_id(props["id"], prop)] = valor
+    walk(props.get("children"), values, components)
+
+
+class Recorder:
+
+    """
+        Latências e erros de todas as sessões de uma execução.
+    """
+
+    def __init__(self):
+        self.callbacks = defaultdict(list)
+        self.actions   = defaultdict(list)
+        self.errors    = defaultdict(int)
+        self.requests  = defaultdict(int)
+        self.bytes     = 0
+        self._lock     = threading.Lock()
+
+    def request(self, name, seconds, nbytes, error=False):
+        with self._lock:
+            self.callbacks[name].append(seconds)
+            self.bytes += nbytes
+            if error:
+                self.errors[name] += 1
+
+    def action(self, name, seconds, requests):
+        with self._lock:
+            self.actions[name].append(seconds)
+            self.requests[name] += requests
+
+
+class Session:
+
+    """
+        Sessão de um usuário: abre o painel e executa ações, disparando os callbacks
+        do servidor em ondas como o renderer do Dash.
+    """
+
+    def __init__(self, base_url, recorder, rng, think_ms):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng      = rng
+        self.think_ms = think_ms
+
+    def request(self, name, path, body=None):
+
+        """
+            Requisição ao servidor; devolve (status, JSON da resposta ou None).
+        """
+
+        dados   = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        pedido  = urllib.request.Request(self.base_url + path, data=dados, headers=headers)
+
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(pedido, timeout=120) as resposta:
+                status, conteudo = resposta.status, resposta.read()
+                codificacao      = resposta.headers.get("Content-Encoding")
+        except urllib.error.HTTPError as erro:
+            status, conteudo, codificacao = erro.code, erro.read(), None
+        except OSError:
+            self.recorder.request(name, time.perf_counter() - inicio, 0, error=True)
+            return None, None
+        tempo = time.perf_counter() - inicio
+
+        self.recorder.request(name, tempo, len(conteudo), error=status >= 400)
+        if status != 200 or not conteudo:
+            return status, None
+        if codificacao == "gzip":
+            conteudo = gzip.decompress(conteudo)
+        return status, json.loads(conteudo) if path.startswith("/_dash") else None
+
+    def open(self):
+
+        """
+            Abertura do painel: página, layout, dependências e callbacks iniciais.
+        """
+
+        inicio = time.perf_counter()
+        self.request("GET /", "/")
+        _, layout       = self.request("GET /_dash-layout", "/_dash-layout")
+        _, dependencies = self.request("GET /_dash-dependencies", "/_dash-dependencies")
+        if layout is None or dependencies is None:
+            raise RuntimeError("layout ou dependências indisponíveis")
+
+        self.values, self.components = {}, {}
+        walk(layout, self.values, self.components)
+        self.values["viewport.data"] = VIEWPORT
+        self.callbacks = server_callbacks(dependencies)
+
+        iniciais    = [callback for callback in self.callbacks if callback.initial]
+        requisicoes = self.fire(iniciais, set()) + self.tick_intervals()
+        self.recorder.action("abertura", time.perf_counter() - inicio, requisicoes + 3)
+
+    def fire(self, pendentes, changed):
+
+        """
+            Executa os callbacks em ondas: a cada onda, os pendentes cujas entradas não
+            dependem de outro pendente, em paralelo; as saídas alteradas disparam os
+            callbacks dependentes na onda seguinte. Devolve a quantidade de requisições.
+            Os Intervals habilitados pelas respostas são tratados em tick_intervals.
+        """
+
+        requisicoes = 0
+        while pendentes:
+            saidas_pendentes = set().union(*(callback.output_ids for callback in pendentes))
+            onda = [
+                callback for callback in pendentes
+                if not (callback.input_ids & (saidas_pendentes - callback.output_ids))
+            ] or pendentes
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(onda)) as pool:
+                respostas = list(pool.map(
+                    lambda callback: self.request(callback.name, "/_dash-update-component", callback.payload(self.values, changed)),
+                    onda,
+                ))
+            requisicoes += len(onda)
+
+            alteradas = set()
+            for _, resposta in respostas:
+                for component_id, props in ((resposta or {}).get("response") or {}).items():
+                    for prop, valor in props.items():
+                        chave = f"{component_id}.{prop}"
+                        self.values[chave] = valor
+                        alteradas.add(chave)
+
+            changed   = alteradas
+            restantes = [callback for callback in pendentes if callback not in onda]
+            novos     = [callback for callback in self.callbacks if callback.input_ids & alteradas and callback not in restantes]
+            pendentes = restantes + novos
+        return requisicoes
+
+    def tick_intervals(self, limit=240):
+
+        """
+            Incrementa os Intervals habilitados (ex.: consulta do job da comparação),
+            no intervalo de cada um, até serem desabilitados.
+        """
+
+        requisicoes = 0
+        for _ in range(limit):
+            ativos = [
+                component_id for component_id, componente in self.components.items()
+                if componente.get("type") == "Interval" and self.values.get(f"{component_id}.disabled") is False
+            ]
+            if not ativos:
+                break
+            for component_id in ativos:
+                time.sleep(self.values.get(f"{component_id}.interval", 1000) / 1000)
+                self.values[f"{component_id}.n_intervals"] = (self.values.get(f"{component_id}.n_intervals") or 0) + 1
+                chave = f"{component_id}.n_intervals"
+                requisicoes += self.fire([callback for callback in self.callbacks if chave in callback.input_ids], {chave})
+        return requisicoes
+
+    def options(self, component_id):
+        opcoes = self.values.get(f"{component_id}.options") or []
+        return [opcao["value"] if isinstance(opcao, dict) else opcao for opcao in opcoes]
+
+    def change(self):
+
+        """
+            Sorteia uma ação e as propriedades que ela altera.
+        """
+
+        acao = self.rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if acao == "rangeslider":
+            minimo, maximo = self.values.get("rangeslider.min"), self.values.get("rangeslider.max")
+            inicio = self.rng.randint(minimo, maximo)
+            return acao, {"rangeslider.value": [inicio, self.rng.randint(inicio, maximo)]}
+        if acao == "ano":
+            return acao, {"select_ano.value": self.rng.choice(self.options("select_ano"))}
+        if acao == "regiao":
+            return acao, {"select_regiao.value": self.rng.choice(self.options("select_regiao"))}
+        if acao == "estados":
+            return acao, {"select_estado0.value": self.rng.sample(self.options("select_estado0"), self.rng.randint(1, 4))}
+        if acao == "comparacao":
+            campo = self.rng.choice(["select_estado1", "select_estado2"])
+            return acao, {f"{campo}.value": self.rng.choice(self.options(campo))}
+        if acao == "indicadores":
+            if self.rng.random() < 0.5:
+                return acao, {"select_indicador.value": self.rng.choice(self.options("select_indicador"))}
+            return acao, {"select_analise.value": self.rng.sample(self.options("select_analise"), self.rng.randint(1, 4))}
+        if acao == "tema":
+            chave = prop_id({"aio_id": "theme", "component": "ThemeSwitchAIO", "subcomponent": "switch"}, "value")
+            return acao, {chave: not self.values.get(chave, True)}
+
+        inicio = self.rng.randint(self.values.get("rangeslider.min"), self.values.get("rangeslider.max"))
+        zoom   = {"xaxis.range[0]": f"{inicio}-01-01", "xaxis.range[1]": f"{inicio}-12-31"}
+        return acao, {"animation_graph.relayoutData": self.rng.choice([zoom, {"xaxis.autorange": True}])}
+
+    def act(self):
+        acao, alteracoes = self.change()
+        self.values.update(alteracoes)
+
+        inicio      = time.perf_counter()
+        changed     = set(alteracoes)
+        requisicoes = self.fire([callback for callback in self.callbacks if callback.input_ids & changed], changed) + self.tick_intervals()
+        self.recorder.action(acao, time.perf_counter() - inicio, requisicoes)
+
+    def run(self, deadline, actions):
+
+        """
+            Jornadas até o fim do tempo: abertura do painel seguida de `actions` ações,
+            com uma pausa aleatória (tempo de leitura do usuário) entre elas.
+        """
+
+        while time.perf_counter() < deadline:
+            try:
+                self.open()
+                for _ in range(actions):
+                    if time.perf_counter() >= deadline:
+                        break
+                    time.sleep(self.rng.expovariate(1000 / self.think_ms) if self.think_ms else 0)
+                    self.act()
+            except RuntimeError:
+                time.sleep(1)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_config(texto):
+
+    """
+        Configuração "nome:chave=valor,chave=valor" (ex.: "4w:workers=4,threads=2").
+    """
+
+    nome, _, opcoes = texto.partition(":")
+    valores = dict(opcao.split("=", 1) for opcao in opcoes.split(",") if opcao)
+    return nome or texto, valores
+
+
+def worker_pids(master):
+
+    """
+        Processos filhos do mestre do gunicorn (os workers).
+    """
+
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as file:
+                campos = file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == master:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+class Server:
+
+    """
+        Gunicorn local com o app, em uma porta livre.
+            - options: opções da configuração (ver GUNICORN_OPTIONS).
+    """
+
+    def __init__(self, options, startup_timeout=180):
+        self.options         = options
+        self.startup_timeout = startup_timeout
+        self.port            = free_port()
+        self.base_url        = f"http://127.0.0.1:{self.port}"
+        self.process         = None
+
+    def __enter__(self):
+        argumentos = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{self.port}"]
+        ambiente   = dict(os.environ)
+        for chave, valor in self.options.items():
+            if chave in GUNICORN_OPTIONS:
+                argumentos += [GUNICORN_OPTIONS[chave], valor]
+            else:
+                ambiente[chave] = valor
+        argumentos.append("app:server")
+
+        self.process = subprocess.Popen(argumentos, cwd=config.BASE_DIR, env=ambiente,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.wait_ready()
+        return self
+
+    def __exit__(self, *exc):
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def wait_ready(self):
+
+        """
+            Aguarda o /readyz de todos os workers: como cada worker carrega os dados
+            por conta própria, exige uma sequência de respostas 200.
+        """
+
+        workers  = int(self.options.get("workers", os.environ.get("WEB_CONCURRENCY", "2")))
+        limite   = time.perf_counter() + self.startup_timeout
+        seguidas = 0
+        while seguidas < 4 * workers:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"o gunicorn terminou com o código {self.process.returncode}")
+            if time.perf_counter() > limite:
+                raise RuntimeError(f"o servidor não ficou pronto em {self.startup_timeout}s")
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/readyz", timeout=5) as resposta:
+                    seguidas = seguidas + 1 if resposta.status == 200 else 0
+            except (urllib.error.URLError, OSError):
+                seguidas = 0
+                time.sleep(0.25)
+
+    def memory(self):
+        return {pid: memory(pid) for pid in worker_pids(self.process.pid)}
+
+
+def sample_memory(server, stop, interval, inicio):
+
+    """
+        Amostras da memória dos workers até `stop` ser sinalizado.
+    """
+
+    amostras = []
+    while True:
+        workers = {str(pid): medida for pid, medida in server.memory().items() if medida}
+        amostras.append({"t": round(time.perf_counter() - inicio, 2), "workers": workers})
+        if stop.wait(interval):
+            return amostras
+
+
+def summary(tempos):
+    tempos = np.array(tempos) * 1000
+    resultado = {f"p{p}_ms": round(float(np.percentile(tempos, p)), 3) for p in PERCENTILES}
+    resultado.update({"count": int(len(tempos)), "mean_ms": round(float(tempos.mean()), 3)})
+    return resultado
+
+
+def run(options, sessions, duration, actions, think_ms, sample_ms, seed):
+
+    """
+        Executa a carga contra um servidor com a configuração e devolve o resultado.
+    """
+
+    with Server(options) as server:
+        recorder = Recorder()
+        stop     = threading.Event()
+        inicio   = time.perf_counter()
+        deadline = inicio + duration
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sessions + 1) as pool:
+            memoria  = pool.submit(sample_memory, server, stop, sample_ms / 1000, inicio)
+            usuarios = [
+                pool.submit(Session(server.base_url, recorder, random.Random(seed + numero), think_ms).run, deadline, actions)
+                for numero in range(sessions)
+            ]
+            for usuario in usuarios:
+                usuario.result()
+            tempo = time.perf_counter() - inicio
+            stop.set()
+            amostras = memoria.result()
+
+    total = sum(len(tempos) for tempos in recorder.callbacks.values())
+    picos = defaultdict(int)
+    for amostra in amostras:
+        for pid, medida in amostra["workers"].items():
+            picos[pid] = max(picos[pid], medida["rss"])
+
+    return {
+        "options":         options,
+        "seconds":         round(tempo, 2),
+        "requests":        total,
+        "errors":          sum(recorder.errors.values()),
+        "throughput_rps":  round(total / tempo, 2),
+        "actions_per_s":   round(sum(len(tempos) for tempos in recorder.actions.values()) / tempo, 2),
+        "received_bytes":  recorder.bytes,
+        "callbacks":       {name: {**summary(tempos), "errors": recorder.errors[name]} for name, tempos in sorted(recorder.callbacks.items())},
+        "actions":         {
+            name: {**summary(tempos), "requests_per_action": round(recorder.requests[name] / len(tempos), 2)}
+            for name, tempos in sorted(recorder.actions.items())
+        },
+        "memory": {
+            "peak_worker_rss_kb": max(picos.values(), default=0),
+            "peak_total_pss_kb":  max((sum(medida["pss"] for medida in amostra["workers"].values()) for amostra in amostras), default=0),
+            "samples":            amostras,
+        },
+    }
+
+
+def report(resultados):
+
+    """
+        Tabelas lado a lado das configurações executadas.
+    """
+
+    nomes   = list(resultados)
+    largura = max(14, *(len(nome) + 2 for nome in nomes))
+    rotulos = max(32, *(len(chave) + 2 for nome in nomes for chave in resultados[nome]["callbacks"]))
+
+    def linha(rotulo, valores):
+        print(f"{rotulo:<{rotulos}}" + "".join(f"{valor:>{largura}}" for valor in valores))
+
+    print()
+    linha("", nomes)
+    linha("requisições/s", [f"{resultados[nome]['throughput_rps']:.1f}" for nome in nomes])
+    linha("ações/s", [f"{resultados[nome]['actions_per_s']:.2f}" for nome in nomes])
+    linha("erros", [resultados[nome]["errors"] for nome in nomes])
+    linha("pico RSS por worker (MB)", [f"{resultados[nome]['memory']['peak_worker_rss_kb'] / 1024:.0f}" for nome in nomes])
+    linha("pico PSS total (MB)", [f"{resultados[nome]['memory']['peak_total_pss_kb'] / 1024:.0f}" for nome in nomes])
+
+    for secao in ("callbacks", "actions"):
+        chaves = sorted({chave for nome in nomes for chave in resultados[nome][secao]})
+        for percentil in PERCENTILES:
+            print()
+            linha(f"{'CALLBACK' if secao == 'callbacks' else 'AÇÃO'} p{percentil} (ms)", nomes)
+            for chave in chaves:
+                valores = [resultados[nome][secao].get(chave, {}).get(f"p{percentil}_ms", "-") for nome in nomes]
+                linha(chave, [f"{valor:.1f}" if isinstance(valor, float) else valor for valor in valores])
+
+
+def main(argv=None):
+
+    """
+        Linha de comando do teste de carga.
+    """
+
+    parser = argparse.ArgumentParser(description="Teste de carga do painel com sessões concorrentes no gunicorn.")
+    parser.add_argument("--config", action="append", type=parse_config, metavar="NOME:CHAVE=VALOR,...",
+                        help="configuração do servidor (workers, threads, worker_class ou variáveis GAS_PRICES_*); pode ser repetida")
+    parser.add_argument("--sessions", type=int, default=10, help="sessões (usuários) simultâneas")
+    parser.add_argument("--duration", type=float, default=30, help="duração de cada execução, em segundos")
+    parser.add_argument("--actions", type=int, default=10, help="ações por jornada após a abertura do painel")
+    parser.add_argument("--think-ms", type=float, default=500, help="pausa média entre as ações de uma sessão")
+    parser.add_argument("--sample-ms", type=float, default=1000, help="intervalo das amostras de memória dos workers")
+    parser.add_argument("--seed", type=int, default=0, help="semente das jornadas (as mesmas em todas as configurações)")
+    parser.add_argument("--output", help="arquivo JSON onde gravar os resultados")
+    args = parser.parse_args(argv)
+
+    configuracoes = dict(args.config or [("padrao", {})])
+    resultados    = {}
+    for nome, opcoes in configuracoes.items():
+        print(f"{nome}: {opcoes or 'configuração padrão'}; {args.sessions} sessões por {args.duration:.0f}s")
+        resultados[nome] = run(opcoes, args.sessions, args.duration, args.actions, args.think_ms, args.sample_ms, args.seed)
+        print(f"  {resultados[nome]['requests']} requisições, {resultados[nome]['throughput_rps']:.1f}/s, "
+              f"{resultados[nome]['errors']} erros")
+
+    report(resultados)
+
+    if args.output:
+        # Importado só ao final: benchmarks.callbacks importa o app e ajusta as
+        # variáveis GAS_PRICES_* deste processo, que os servidores herdariam
+        from benchmarks.callbacks import environment
+
+        atual = {
+            "environment": environment(),
+            "settings":    {"sessions": args.sessions, "duration": args.duration, "actions": args.actions,
+                            "think_ms": args.think_ms, "seed": args.seed},
+            "results":     resultados,
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(atual, file, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
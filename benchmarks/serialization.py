@@ -0,0 +1,137 @@
+#######################################################################################
+# -= BENCHMARK DA SERIALIZAÇÃO DAS RESPOSTAS =-
+#
+# Compara, para a resposta de cada callback sobre os datasets sintéticos, o tamanho
+# em bytes e o tempo de serialização antes (figura original, json da biblioteca
+# padrão) e depois (séries arredondadas, motor JSON configurado) das otimizações de
+# gas_prices.serialize, além do tamanho e do tempo da compressão gzip e brotli do
+# JSON resultante, isto é, os bytes que de fato trafegam até o navegador.
+#
+#     python -m benchmarks.serialization --scales 1 10 --output serializacao.json
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from plotly.io.json import to_json_plotly
+
+from benchmarks.callbacks import callback, cases, environment
+from benchmarks.synthetic import generate
+from gas_prices import config
+from gas_prices.cache import plain
+from gas_prices.registry import registry
+from gas_prices.serialize import GZIP_LEVEL, brotli, encode
+
+
+def timed(func, repeat):
+
+    """
+        Mediana do tempo (ms) de `repeat` chamadas e o resultado da última.
+    """
+
+    tempos = []
+    for _ in range(repeat):
+        inicio    = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos) * 1000, 3), resultado
+
+
+def measure(resposta, repeat):
+
+    """
+        Tamanhos e tempos de uma resposta antes e depois das otimizações.
+            - resposta: valor devolvido pelo callback (figuras Plotly originais).
+            - repeat: repetições de cada medição de tempo.
+    """
+
+    engine = config.JSON_ENGINE
+
+    antes_ms, antes = timed(lambda: to_json_plotly(resposta, engine="json").encode("utf-8"), repeat)
+    trim_ms, enxuta = timed(lambda: plain(resposta), repeat)
+    depois_ms, depois = timed(lambda: to_json_plotly(enxuta, engine=engine).encode("utf-8"), repeat)
+
+    resultado = {
+        "before_bytes": len(antes),
+        "before_ms":    antes_ms,
+        "after_bytes":  len(depois),
+        "after_ms":     round(trim_ms + depois_ms, 3),
+    }
+
+    gzip_ms, comprimido = timed(lambda: gzip.compress(depois, compresslevel=GZIP_LEVEL, mtime=0), repeat)
+    resultado.update({"gzip_bytes": len(comprimido), "gzip_ms": gzip_ms})
+    if brotli is not None:
+        br_ms, comprimido = timed(lambda: encode(depois, "br"), repeat)
+        resultado.update({"br_bytes": len(comprimido), "br_ms": br_ms})
+
+    return resultado
+
+
+def run(scales, repeat, names=None, seed=0):
+
+    """
+        Executa o benchmark em cada escala e devolve o dicionário de resultados.
+    """
+
+    resultados = {}
+    for scale in scales:
+        produto = f"SINTETICO {scale}X"
+        registry.publish(generate(scale, seed=seed), produto)
+        key = registry.key(product=produto)
+
+        medidas = {}
+        for name, entradas in cases(key).items():
+            if names and name not in names:
+                continue
+
+            # Maior resposta entre as entradas do callback
+            respostas = [callback(name)(*args) for args in entradas]
+            resposta  = max(respostas, key=lambda valor: len(to_json_plotly(valor, engine="json")))
+            medidas[name] = medida = measure(resposta, repeat)
+
+            comprimido = medida.get("br_bytes", medida["gzip_bytes"])
+            print(f"  {scale:>4}x  {name:<18} antes {medida['before_bytes'] / 1024:>9.1f} KB {medida['before_ms']:>8.2f} ms  "
+                  f"depois {medida['after_bytes'] / 1024:>8.1f} KB {medida['after_ms']:>8.2f} ms  "
+                  f"comprimido {comprimido / 1024:>7.1f} KB")
+
+        resultados[str(scale)] = {"callbacks": medidas}
+
+    return resultados
+
+
+def main(argv=None):
+
+    """
+        Linha de comando do benchmark da serialização.
+    """
+
+    parser = argparse.ArgumentParser(description="Tamanho e tempo de serialização das respostas dos callbacks.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="escalas do dataset sintético")
+    parser.add_argument("--repeat", type=int, default=10, help="repetições de cada medição de tempo")
+    parser.add_argument("--callbacks", nargs="+", help="apenas os callbacks informados")
+    parser.add_argument("--seed", type=int, default=0, help="semente do gerador sintético")
+    parser.add_argument("--output", help="arquivo JSON onde gravar os resultados")
+    args = parser.parse_args(argv)
+
+    registry.max_products = max(registry.max_products or 0, len(args.scales) + 1)
+
+    print(f"Motor JSON: {config.JSON_ENGINE}; precisão: {config.PRECISION} casas; "
+          f"brotli: {'sim' if brotli is not None else 'não instalado'}")
+
+    atual = {
+        "environment": environment(),
+        "settings":    {"repeat": args.repeat, "seed": args.seed, "engine": config.JSON_ENGINE,
+                        "precision": config.PRECISION, "brotli": brotli is not None},
+        "results":     run(args.scales, args.repeat, args.callbacks, args.seed),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(atual, file, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
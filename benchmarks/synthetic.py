@@ -0,0 +1,66 @@
+#######################################################################################
+# -= GERADOR SINTÉTICO DE PREÇOS =-
+#
+# Gera DataFrames no mesmo formato do pré-processamento (DATA, ANO, REGIÃO, ESTADO e
+# VALOR REVENDA), com os 27 estados e as semanas do período real da pesquisa da ANP.
+# A escala 1 reproduz a quantidade de linhas de um produto real (uma observação por
+# estado e semana); a escala N gera N observações por estado e semana, como se a
+# pesquisa fosse feita por município, mantendo o mesmo calendário.
+
+import numpy as np
+import pandas as pd
+
+from gas_prices.data import compact_frame
+
+# Estados por região, como aparecem no CSV da ANP
+REGIONS = {
+    "CENTRO OESTE": ["DISTRITO FEDERAL", "GOIAS", "MATO GROSSO", "MATO GROSSO DO SUL"],
+    "NORDESTE":     ["ALAGOAS", "BAHIA", "CEARA", "MARANHAO", "PARAIBA", "PERNAMBUCO", "PIAUI", "RIO GRANDE DO NORTE", "SERGIPE"],
+    "NORTE":        ["ACRE", "AMAPA", "AMAZONAS", "PARA", "RONDONIA", "RORAIMA", "TOCANTINS"],
+    "SUDESTE":      ["ESPIRITO SANTO", "MINAS GERAIS", "RIO DE JANEIRO", "SAO PAULO"],
+    "SUL":          ["PARANA", "RIO GRANDE DO SUL", "SANTA CATARINA"],
+}
+
+# Período da série histórica (datas iniciais das semanas de pesquisa)
+FIRST_WEEK = "2004-05-09"
+LAST_WEEK  = "2021-04-25"
+
+
+def generate(scale=1, seed=0, compact=True):
+
+    """
+        DataFrame sintético ordenado por DATA.
+            - scale: observações por estado e semana (1 = tamanho de um produto real).
+            - seed: semente do gerador, para execuções reprodutíveis.
+            - compact: aplica a representação compacta (ver gas_prices.data).
+    """
+
+    rng = np.random.default_rng(seed)
+
+    estados = [estado for membros in REGIONS.values() for estado in membros]
+    regioes = [regiao for regiao, membros in REGIONS.items() for _ in membros]
+
+    # Data média de cada semana (início + 3 dias), como no pré-processamento
+    semanas = pd.date_range(FIRST_WEEK, LAST_WEEK, freq="7D") + pd.Timedelta(days=3)
+
+    # Preço por estado e semana: tendência comum, nível do estado e passeio aleatório
+    tendencia = np.linspace(2.0, 5.5, len(semanas))
+    nivel     = rng.normal(0.0, 0.15, len(estados))
+    passeio   = rng.normal(0.0, 0.01, (len(estados), len(semanas))).cumsum(axis=1)
+    precos    = tendencia[None, :] + nivel[:, None] + passeio
+
+    # Linhas agrupadas por semana: cada semana tem scale observações de cada estado
+    por_semana = len(estados) * scale
+    semana     = np.repeat(np.arange(len(semanas)), por_semana)
+    estado     = np.tile(np.repeat(np.arange(len(estados)), scale), len(semanas))
+    ruido      = rng.normal(0.0, 0.05, len(semana)) if scale > 1 else 0.0
+
+    frame = pd.DataFrame({
+        "DATA":                 semanas[semana],
+        "REGIÃO":               np.asarray(regioes, dtype=object)[estado],
+        "ESTADO":               np.asarray(estados, dtype=object)[estado],
+        "VALOR REVENDA (R$/L)": np.round(precos[estado, semana] + ruido, 3),
+    })
+    frame.insert(1, "ANO", frame["DATA"].dt.year.astype("int64"))
+
+    return compact_frame(frame) if compact else frame
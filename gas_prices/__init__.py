@@ -0,0 +1,3 @@
+"""
+    Camada de dados do painel de Análise de Preços de Gás.
+"""
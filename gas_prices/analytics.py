@@ -0,0 +1,276 @@
+#######################################################################################
+# -= INDICADORES SEMANAIS POR ESTADO E REGIÃO =-
+#
+# Matriz densa com o preço médio de cada estado e de cada região em cada semana de
+# pesquisa, do primeiro ao último domingo do dataset, e os indicadores derivados dela
+# para todas as linhas de uma vez:
+#
+#   - médias móveis de 4, 12 e 52 semanas;
+#   - variação anual (semana contra a mesma semana 52 semanas antes);
+#   - volatilidade anualizada dos retornos semanais em uma janela de 12 semanas;
+#   - queda em relação ao maior preço desde o início da série (drawdown).
+#
+# As janelas móveis são diferenças de somas acumuladas (cumsum) ao longo das semanas,
+# então cada indicador custa uma operação vetorizada sobre a matriz inteira, sem um
+# groupby por estado. As somas acumuladas e o pico corrente são guardados: quando a
+# ingestão traz semanas novas, apenas as colunas a partir da primeira semana afetada
+# são recalculadas, continuando das colunas anteriores.
+#
+# Indicadores (chaves de PriceAnalytics.metrics): price, mean4, mean12, mean52, yoy,
+# volatility e drawdown; os três últimos em porcentagem.
+
+import numpy as np
+import pandas as pd
+
+PRICE = "VALOR REVENDA (R$/L)"
+
+# Janelas das médias móveis, em semanas
+WINDOWS = (4, 12, 52)
+
+# Semanas da janela da volatilidade e do intervalo da variação anual
+VOLATILITY_WEEKS = 12
+YEAR_WEEKS       = 52
+
+def week_number(datas):
+
+    """
+        Número absoluto da semana de pesquisa (domingo a sábado) de cada data, contado
+        a partir da semana de 01/01/1970 (uma quinta-feira).
+    """
+
+    dias = datas.to_numpy().astype("datetime64[D]").astype("int64")
+    return (dias + 4) // 7
+
+
+def rolling(soma, contagem, inicio, janela, minimo):
+
+    """
+        Média das colunas [inicio, fim) em uma janela móvel, a partir das somas e
+        contagens acumuladas (com uma coluna zero à esquerda); NaN quando a janela tem
+        menos de `minimo` observações.
+    """
+
+    colunas = np.arange(inicio, soma.shape[1] - 1)
+    anterior = np.maximum(colunas + 1 - janela, 0)
+    total    = soma[:, colunas + 1] - soma[:, anterior]
+    n        = contagem[:, colunas + 1] - contagem[:, anterior]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n >= minimo, total / n, np.nan)
+
+
+def accumulate(destino, valores, inicio):
+
+    """
+        Preenche as somas acumuladas de `valores` a partir da coluna `inicio`,
+        continuando do acumulado já presente em destino[:, inicio].
+    """
+
+    destino[:, inicio + 1:] = destino[:, inicio:inicio + 1] + np.cumsum(valores[:, inicio:], axis=1)
+
+
+class PriceAnalytics:
+
+    """
+        Preço médio semanal e indicadores de cada estado e região.
+            - frame: DataFrame pré-processado (ver gas_prices.data.COLUMNS).
+    """
+
+    def __init__(self, frame):
+        estados = pd.Categorical(frame["ESTADO"])
+        regioes = pd.Categorical(frame["REGIÃO"])
+        semanas = week_number(frame["DATA"])
+
+        self.first_week = int(semanas.min())
+        largura = int(semanas.max()) - self.first_week + 1
+        coluna  = semanas - self.first_week
+
+        # Linhas: os estados seguidos das regiões
+        self.states  = pd.Index(estados.categories)
+        self.regions = pd.Index(regioes.categories)
+        self.labels  = self.states.append(self.regions)
+
+        # Médias por (linha, semana) com um único bincount: cada observação conta para
+        # a célula do seu estado e para a da sua região
+        linhas  = np.concatenate([estados.codes, regioes.codes + len(self.states)]).astype("int64")
+        celula  = linhas * largura + np.concatenate([coluna, coluna])
+        precos  = np.tile(frame[PRICE].to_numpy(dtype="float64"), 2)
+        tamanho = len(self.labels) * largura
+
+        soma     = np.bincount(celula, weights=precos, minlength=tamanho)
+        contagem = np.bincount(celula, minlength=tamanho)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = np.where(contagem > 0, soma / contagem, np.nan)
+
+        self.values = medias.reshape(len(self.labels), largura)
+        self._derive(None, 0)
+
+    def extend(self, newer):
+
+        """
+            Nova instância com as semanas de `newer` substituindo as desta. Usada na
+            ingestão incremental: `newer` contém todas as semanas dos anos afetados, e
+            apenas os indicadores a partir da primeira delas são recalculados.
+        """
+
+        primeira = min(self.first_week, newer.first_week)
+        ultima   = max(self.first_week + self.values.shape[1], newer.first_week + newer.values.shape[1])
+        estados  = self.states.union(newer.states)
+        regioes  = self.regions.union(newer.regions)
+
+        resultado = PriceAnalytics.__new__(PriceAnalytics)
+        resultado.first_week = primeira
+        resultado.states     = estados
+        resultado.regions    = regioes
+        resultado.labels     = estados.append(regioes)
+        resultado.values     = np.full((len(resultado.labels), ultima - primeira), np.nan)
+
+        # Semanas anteriores, exceto as cobertas por `newer`, que são substituídas
+        linhas = resultado.labels.get_indexer(self.labels)
+        inicio = self.first_week - primeira
+        resultado.values[linhas, inicio:inicio + self.values.shape[1]] = self.values
+
+        linhas = resultado.labels.get_indexer(newer.labels)
+        inicio = newer.first_week - primeira
+        resultado.values[:, inicio:inicio + newer.values.shape[1]] = np.nan
+        resultado.values[linhas, inicio:inicio + newer.values.shape[1]] = newer.values
+
+        # Continuando os acumulados desta instância quando as linhas e o início da série
+        # são os mesmos; caso contrário (ex.: um estado novo), tudo é recalculado. Se
+        # `newer` começa depois da última semana desta instância (semanas sem pesquisa
+        # entre as duas), as semanas do intervalo também são recalculadas
+        if primeira == self.first_week and resultado.labels.equals(self.labels):
+            resultado._derive(self, min(inicio, self.values.shape[1]))
+        else:
+            resultado._derive(None, 0)
+        return resultado
+
+    def _derive(self, previous, inicio):
+
+        """
+            Calcula os acumulados e os indicadores das colunas a partir de `inicio`,
+            copiando as colunas anteriores de `previous`.
+        """
+
+        linhas, largura = self.values.shape
+        valores = self.values
+        validos = ~np.isnan(valores)
+
+        # Quarta-feira (dia central, como a coluna DATA) de cada semana
+        dias = (np.arange(self.first_week, self.first_week + largura) * 7 - 1).astype("datetime64[D]")
+        self.weeks = pd.DatetimeIndex(dias.astype("datetime64[ns]"), name="DATA")
+        self._rows = {label: linha for linha, label in enumerate(self.labels)}
+
+        # Retornos semanais (log) entre semanas consecutivas com preço
+        retornos = np.full_like(valores, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            retornos[:, 1:] = np.log(valores[:, 1:] / valores[:, :-1])
+        com_retorno = ~np.isnan(retornos)
+
+        acumulados = {
+            "sum":        np.where(validos, valores, 0.0),
+            "count":      validos.astype("float64"),
+            "return":     np.where(com_retorno, retornos, 0.0),
+            "return_sq":  np.where(com_retorno, retornos ** 2, 0.0),
+            "return_n":   com_retorno.astype("float64"),
+        }
+
+        self._prefix = {}
+        for nome, parcelas in acumulados.items():
+            destino = np.zeros((linhas, largura + 1))
+            if previous is not None:
+                destino[:, :inicio + 1] = previous._prefix[nome][:, :inicio + 1]
+            accumulate(destino, parcelas, inicio)
+            self._prefix[nome] = destino
+
+        # Pico corrente, continuando do pico da coluna anterior
+        self._peak = np.full_like(valores, np.nan)
+        if previous is not None and inicio:
+            self._peak[:, :inicio] = previous._peak[:, :inicio]
+            semente = self._peak[:, inicio - 1:inicio]
+        else:
+            semente = np.full((linhas, 1), np.nan)
+        self._peak[:, inicio:] = np.fmax.accumulate(np.concatenate([semente, valores[:, inicio:]], axis=1), axis=1)[:, 1:]
+
+        # Indicadores das colunas recalculadas
+        novos = {"price": valores[:, inicio:]}
+        for janela in WINDOWS:
+            novos[f"mean{janela}"] = rolling(self._prefix["sum"], self._prefix["count"], inicio, janela, max(1, janela // 2))
+
+        anteriores = np.arange(inicio, largura) - YEAR_WEEKS
+        base       = np.where(anteriores >= 0, valores[:, np.maximum(anteriores, 0)], np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            novos["yoy"] = (valores[:, inicio:] / base - 1) * 100
+
+        media     = rolling(self._prefix["return"], self._prefix["return_n"], inicio, VOLATILITY_WEEKS, VOLATILITY_WEEKS // 2)
+        quadrados = rolling(self._prefix["return_sq"], self._prefix["return_n"], inicio, VOLATILITY_WEEKS, VOLATILITY_WEEKS // 2)
+        colunas   = np.arange(inicio, largura)
+        n         = self._prefix["return_n"][:, colunas + 1] - self._prefix["return_n"][:, np.maximum(colunas + 1 - VOLATILITY_WEEKS, 0)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variancia = np.maximum(quadrados - media ** 2, 0.0) * n / (n - 1)
+            novos["volatility"] = np.sqrt(variancia * YEAR_WEEKS) * 100
+            novos["drawdown"]   = (valores[:, inicio:] / self._peak[:, inicio:] - 1) * 100
+
+        self.metrics = {}
+        for nome, colunas_novas in novos.items():
+            matriz = np.empty((linhas, largura))
+            if previous is not None and inicio:
+                matriz[:, :inicio] = previous.metrics[nome][:, :inicio]
+            matriz[:, inicio:] = colunas_novas
+            self.metrics[nome] = matriz
+
+    def week_bounds(self, start=None, end=None):
+
+        """
+            Limites [inicial, final) das colunas dos anos start..end, inclusivos.
+        """
+
+        semanas  = self.weeks
+        primeiro = 0 if start is None else semanas.searchsorted(pd.Timestamp(year=int(start), month=1, day=1))
+        ultimo   = len(semanas) if end is None else semanas.searchsorted(pd.Timestamp(year=int(end) + 1, month=1, day=1))
+        return primeiro, max(primeiro, ultimo)
+
+    def row(self, metric, label, primeiro=0, ultimo=None):
+
+        """
+            Indicador do estado ou região entre as colunas [primeiro, ultimo); linhas
+            sem pesquisa no produto resultam em uma linha inteira de NaN.
+        """
+
+        if label not in self._rows:
+            return np.full(len(self.weeks[primeiro:ultimo]), np.nan)
+        return self.metrics[metric][self._rows[label], primeiro:ultimo]
+
+    def series(self, metric, labels, start=None, end=None):
+
+        """
+            Indicador das linhas (estados ou regiões) como DataFrame semanas x linhas,
+            restrito ao intervalo de anos; linhas desconhecidas são ignoradas.
+        """
+
+        primeiro, ultimo = self.week_bounds(start, end)
+        labels = [label for label in labels if label in self.labels]
+        linhas = self.labels.get_indexer(labels)
+        return pd.DataFrame(
+            self.metrics[metric][linhas, primeiro:ultimo].T,
+            index=self.weeks[primeiro:ultimo],
+            columns=labels
+        )
+
+    def latest(self, metric, start=None, end=None, regions=False):
+
+        """
+            Último valor disponível do indicador de cada estado (ou região) dentro do
+            intervalo de anos; NaN para as linhas sem nenhum valor.
+        """
+
+        primeiro, ultimo = self.week_bounds(start, end)
+        linhas  = slice(len(self.states), None) if regions else slice(0, len(self.states))
+        valores = self.metrics[metric][linhas, primeiro:ultimo]
+
+        validos = ~np.isnan(valores)
+        if valores.shape[1] == 0:
+            return pd.Series(np.nan, index=self.labels[linhas])
+
+        ultima = valores.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+        ultimo_valor = np.where(validos.any(axis=1), valores[np.arange(len(valores)), ultima], np.nan)
+        return pd.Series(ultimo_valor, index=self.labels[linhas])
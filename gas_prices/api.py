@@ -0,0 +1,319 @@
+#######################################################################################
+# -= API DE CONSULTA DOS AGREGADOS =-
+#
+# Os agregados exibidos pelo painel (médias anuais por região e por estado, máximos e
+# mínimos anuais e a série mensal de cada estado) ficam disponíveis para outros
+# serviços em uma API somente leitura, sem passar pelo /_dash-update-component:
+#
+#     GET /api/v1/products
+#     GET /api/v1/region-means?product=GASOLINA COMUM&start=2010&end=2015
+#     GET /api/v1/state-means?region=SUL
+#     GET /api/v1/maxmin
+#     GET /api/v1/state-monthly?states=SAO PAULO,BAHIA&format=npz
+#     GET /api/v1/pair-summary?states=SAO PAULO
+#     GET /api/v1/cheapest-neighbours?start=2018
+#
+# As respostas são colunares: em JSON, um objeto com uma lista por coluna; em npz
+# (format=npz ou Accept: application/x-npz), um arquivo do numpy com um array por
+# coluna, lido com numpy.load sem pickle. A versão do dataset entra no ETag, então uma
+# consulta repetida com If-None-Match recebe 304 sem nenhum cálculo enquanto a versão
+# não muda; consultas que fixam a versão (version=...) podem ficar em cache por tempo
+# indeterminado.
+
+import hashlib
+import io
+import os
+import threading
+
+from flask import Blueprint, Response, jsonify, request
+
+from gas_prices import config
+from gas_prices.registry import registry
+
+# Tipos de conteúdo de cada formato
+FORMATS = {"json": "application/json", "npz": "application/x-npz"}
+
+api = Blueprint("api", __name__)
+
+# Catálogo de produtos da última leitura e a identificação do arquivo lido
+_catalogue      = {}
+_catalogue_lock = threading.Lock()
+
+
+class QueryError(Exception):
+
+    """
+        Parâmetros inválidos (400) ou dados inexistentes (404) em uma consulta.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@api.errorhandler(QueryError)
+def query_error(error):
+    return jsonify({"error": str(error)}), error.status
+
+
+def catalogue():
+
+    """
+        Produtos disponíveis, relidos apenas quando a ingestão publica um novo catálogo
+        no snapshot. Sem catálogo, a coluna PRODUTO do CSV é lida uma única vez.
+    """
+
+    from gas_prices import snapshot
+    from gas_prices.data import list_products
+
+    try:
+        estado = os.stat(os.path.join(config.SNAPSHOT_DIR, snapshot.CATALOGUE_FILE))
+        versao = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+    except OSError:
+        versao = None
+
+    with _catalogue_lock:
+        if _catalogue.get("version", False) != versao:
+            _catalogue["products"] = list_products()
+            _catalogue["version"]  = versao
+        return _catalogue["products"]
+
+
+def parse_year(name):
+    valor = request.args.get(name)
+    if valor in (None, ""):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise QueryError(f"{name} deve ser um ano: {valor!r}")
+
+
+def parse_list(name):
+
+    """
+        Lista de valores de um parâmetro, repetido (?state=A&state=B) ou separado por
+        vírgulas (?states=A,B).
+    """
+
+    valores = request.args.getlist(name) + [
+        item for valor in request.args.getlist(f"{name}s") for item in valor.split(",")
+    ]
+    return [valor.strip() for valor in valores if valor.strip()]
+
+
+def response_format():
+    formato = request.args.get("format")
+    if formato is None:
+        formato = "npz" if request.accept_mimetypes.best_match(list(FORMATS.values())) == FORMATS["npz"] else "json"
+    if formato not in FORMATS:
+        raise QueryError(f"formato desconhecido: {formato!r} (use {', '.join(FORMATS)})")
+    return formato
+
+
+def columns(frame):
+
+    """
+        Colunas do DataFrame como arrays do numpy serializáveis sem pickle: textos e
+        categorias como unicode, datas com resolução de dia e preços arredondados à
+        precisão configurada.
+    """
+
+    import numpy as np
+
+    colunas = {}
+    for nome in frame.columns:
+        valores = frame[nome]
+        if valores.dtype.kind == "M":
+            colunas[str(nome)] = valores.to_numpy().astype("datetime64[D]")
+        elif valores.dtype.kind == "f":
+            colunas[str(nome)] = np.round(valores.to_numpy(dtype="float64"), config.PRECISION)
+        elif valores.dtype.kind in "iub":
+            colunas[str(nome)] = valores.to_numpy()
+        else:
+            colunas[str(nome)] = valores.astype(str).to_numpy(dtype=str)
+    return colunas
+
+
+def encode(frame, formato, meta):
+
+    """
+        Corpo da resposta no formato pedido.
+            - meta: produto, versão e intervalo, incluídos no JSON (no npz vão nos
+              cabeçalhos da resposta).
+    """
+
+    if formato == "npz":
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **columns(frame))
+        return buffer.getvalue()
+
+    from plotly.io.json import to_json_plotly
+
+    return to_json_plotly({**meta, "rows": len(frame), "columns": columns(frame)})
+
+
+def query(rule):
+
+    """
+        Decorador que publica uma consulta sobre o cubo de agregados. A função recebe
+        (cube, start, end) e devolve um DataFrame; a resolução do produto e da versão,
+        o ETag, a resposta condicional e a serialização ficam a cargo do decorador.
+    """
+
+    def decorator(func):
+
+        def view():
+            produto = request.args.get("product") or config.PRODUCT
+            versao  = request.args.get("version") or None
+            inicio  = parse_year("start")
+            fim     = parse_year("end")
+            formato = response_format()
+
+            # Produtos em memória dispensam a consulta ao catálogo
+            if produto not in registry.loaded() and produto not in catalogue():
+                raise QueryError(f"produto desconhecido: {produto!r}", 404)
+
+            dataset = registry.dataset(registry.key(versao, product=produto))
+            if versao and dataset.version != versao:
+                raise QueryError(f"versão {versao!r} indisponível; a corrente é {dataset.version!r}", 404)
+            if dataset.product != produto:
+                raise QueryError(f"a versão {versao!r} é do produto {dataset.product!r}, não de {produto!r}", 409)
+
+            # ETag: consulta, parâmetros, formato e versão do dataset
+            parametros = sorted(request.args.items(multi=True))
+            etag = hashlib.sha1(repr((rule, parametros, formato, dataset.version)).encode("utf-8")).hexdigest()[:24]
+
+            if request.if_none_match.contains(etag):
+                resposta = Response(status=304)
+            else:
+                meta     = {"product": produto, "version": dataset.version, "range": [inicio, fim]}
+                resposta = Response(encode(func(dataset.cube, inicio, fim), formato, meta), mimetype=FORMATS[formato])
+
+            resposta.set_etag(etag)
+            resposta.headers["X-Dataset-Version"] = dataset.version
+            resposta.vary.add("Accept")
+            if versao:
+                resposta.cache_control.public    = True
+                resposta.cache_control.max_age   = 31536000
+                resposta.cache_control.immutable = True
+            else:
+                resposta.cache_control.public  = True
+                resposta.cache_control.max_age = config.API_MAX_AGE
+            return resposta
+
+        api.add_url_rule(rule, func.__name__, view)
+        return func
+
+    return decorator
+
+
+def between(frame, start, end):
+
+    """
+        Linhas dos anos start..end (inclusivos); None indica sem limite.
+    """
+
+    if start is not None:
+        frame = frame[frame["ANO"] >= start]
+    if end is not None:
+        frame = frame[frame["ANO"] <= end]
+    return frame
+
+
+@api.route("/products")
+def products():
+    return jsonify({"products": catalogue(), "default": config.PRODUCT, "loaded": registry.loaded()})
+
+
+@query("/region-means")
+def region_means(cube, start, end):
+
+    """
+        Média anual de cada região; filtro opcional por região (?region=SUL).
+    """
+
+    df = between(cube.region_year, start, end)
+    if parse_list("region"):
+        df = df[df["REGIÃO"].isin(parse_list("region"))]
+    return df
+
+
+@query("/state-means")
+def state_means(cube, start, end):
+
+    """
+        Média anual de cada estado; filtros opcionais por região e por estado.
+    """
+
+    df = between(cube.state_year, start, end)
+    if parse_list("region"):
+        df = df[df["REGIÃO"].isin(parse_list("region"))]
+    if parse_list("state"):
+        df = df[df["ESTADO"].isin(parse_list("state"))]
+    return df
+
+
+@query("/maxmin")
+def maxmin(cube, start, end):
+
+    """
+        Máximo e mínimo de cada ano.
+    """
+
+    return cube.maxmin(start, end).reset_index()
+
+
+@query("/state-monthly")
+def state_monthly(cube, start, end):
+
+    """
+        Preço médio mensal de cada estado, uma coluna por estado; filtro opcional por
+        estado (?states=SAO PAULO,BAHIA).
+    """
+
+    df = cube.monthly(start, end)
+    estados = parse_list("state")
+    if estados:
+        desconhecidos = [estado for estado in estados if estado not in df.columns]
+        if desconhecidos:
+            raise QueryError(f"estados desconhecidos: {', '.join(desconhecidos)}", 404)
+        df = df[estados]
+    return df.reset_index()
+
+
+@query("/pair-summary")
+def pair_summary(cube, start, end):
+
+    """
+        Comparação de todos os pares de estados, uma linha por par: fração dos meses em
+        que ESTADO foi mais barato que OUTRO, diferença média ESTADO - OUTRO e meses
+        comparáveis; filtro opcional por estado (?states=SAO PAULO).
+    """
+
+    import pandas as pd
+
+    resumo = cube.prices.pair_summary(start, end)
+    df = pd.DataFrame({nome: tabela.stack(dropna=False) for nome, tabela in resumo.items()})
+    df.index.names = ["ESTADO", "OUTRO"]
+    df = df.reset_index()
+    df = df[df["ESTADO"] != df["OUTRO"]]
+    if parse_list("state"):
+        df = df[df["ESTADO"].isin(parse_list("state"))]
+    return df
+
+
+@query("/cheapest-neighbours")
+def cheapest_neighbours(cube, start, end):
+
+    """
+        Vizinho (fronteira terrestre) mais barato de cada estado; filtro opcional por
+        estado.
+    """
+
+    df = cube.prices.cheapest_neighbours(start, end)
+    if parse_list("state"):
+        df = df[df["ESTADO"].isin(parse_list("state"))]
+    return df
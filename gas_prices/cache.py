@@ -0,0 +1,284 @@
+#######################################################################################
+# -= CACHE DE FIGURAS =-
+#
+# O espaço de entradas do painel é pequeno e finito (anos x regiões, pares de
+# estados, temas), então as respostas dos callbacks são guardadas em um cache LRU
+# limitado em bytes. A chave combina o nome do callback com as entradas
+# normalizadas; a chave do dcc.Store já carrega a versão do dataset e o intervalo de
+# anos, e o toggle do tema define o template. Opcionalmente, um diretório
+# compartilhado permite que os workers do gunicorn reaproveitem as entradas uns dos
+# outros.
+
+import functools
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from plotly.basedatatypes import BaseFigure
+
+from gas_prices import config
+from gas_prices.registry import registry
+from gas_prices.serialize import trim
+
+
+def plain(value):
+
+    """
+        Converte figuras Plotly em dicionários, que o Dash serializa da mesma forma e
+        que são bem mais baratos de copiar entre processos do que os objetos validados.
+        As séries são arredondadas à precisão configurada (ver gas_prices.serialize).
+    """
+
+    if isinstance(value, BaseFigure):
+        return trim(value.to_dict())
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return value
+
+
+def normalize(value):
+
+    """
+        Converte as entradas de um callback em uma estrutura imutável e determinística.
+    """
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    return value
+
+
+def versioned(args):
+
+    """
+        Substitui as chaves de dcc.Store entre as entradas pela forma com a versão que
+        as resolve (ver DatasetRegistry.canonical), antes de montar a chave do cache.
+    """
+
+    return tuple(registry.canonical(arg) if isinstance(arg, dict) and "version" in arg else arg for arg in args)
+
+
+class DiskBackend:
+
+    """
+        Backend compartilhado entre processos: um arquivo por entrada em um diretório.
+            - directory: diretório comum a todos os workers.
+            - max_bytes: limite aproximado de ocupação em disco.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes   = 0
+        self._lock     = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def set(self, key, payload):
+
+        # Escrita atômica: outros workers nunca leem um arquivo pela metade
+        path = self._path(key)
+        tmp  = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(payload)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._writes += 1
+            varrer = self._writes % 64 == 0
+        if varrer:
+            self.sweep()
+
+    def sweep(self):
+
+        """
+            Remove as entradas mais antigas até respeitar o limite em disco.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class FigureCache:
+
+    """
+        Cache LRU de respostas de callbacks, limitado em bytes e seguro entre threads.
+            - max_bytes: limite de memória do processo (0 desativa o cache).
+            - backend: backend compartilhado opcional (ex.: DiskBackend).
+    """
+
+    def __init__(self, max_bytes, backend=None):
+        self.max_bytes = max_bytes
+        self.backend   = backend
+        self._lock     = threading.Lock()
+        self._entries  = OrderedDict()
+        self._bytes    = 0
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+
+        """
+            Retorna a resposta guardada para a chave, ou None.
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        # Procurando no backend compartilhado antes de contar o miss
+        payload = self.backend.get(key) if self.backend else None
+        if payload is not None:
+            value = pickle.loads(payload)
+            self._store(key, value, len(payload))
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+
+        """
+            Guarda a resposta, descartando as menos usadas recentemente.
+        """
+
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, value, len(payload))
+        if self.backend:
+            self.backend.set(key, payload)
+
+    def _store(self, key, value, size):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes    -= evicted
+                self.evictions += 1
+
+    def contains(self, name, *args):
+
+        """
+            Indica se a resposta do callback para as entradas já está guardada, em
+            memória ou no backend, sem contar um acerto ou uma falha.
+        """
+
+        key = (name, normalize(versioned(args)))
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.backend) and self.backend.contains(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+
+        """
+            Contadores do cache: acertos, falhas, descartes, entradas e bytes ocupados.
+        """
+
+        with self._lock:
+            return {
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "evictions": self.evictions,
+                "entries":   len(self._entries),
+                "bytes":     self._bytes,
+            }
+
+    def memoize(self, name, canonical=None):
+
+        """
+            Decorador que guarda a resposta de um callback pelas suas entradas.
+                - name: nome do callback, usado como prefixo da chave.
+                - canonical: função opcional que reduz as entradas às que definem a
+                  resposta (ex.: arredondando um zoom), aplicada antes da chave e da
+                  chamada, de modo que entradas equivalentes compartilham a entrada.
+            Sem cache em memória (max_bytes 0), o backend compartilhado continua em uso.
+        """
+
+        def decorator(func):
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                if canonical:
+                    args = canonical(*args)
+                if not self.enabled and not self.backend:
+                    return plain(func(*args))
+
+                args  = versioned(args)
+
+                key   = (name, normalize(args))
+                value = self.get(key)
+                if value is None:
+                    value = plain(func(*args))
+                    self.set(key, value)
+                return value
+
+            return wrapper
+
+        return decorator
+
+
+def build_cache():
+
+    """
+        Instancia o cache de figuras conforme as configurações do ambiente.
+    """
+
+    backend = None
+    if config.CACHE_DIR:
+        backend = DiskBackend(config.CACHE_DIR, config.CACHE_DIR_MB * 1024 * 1024)
+    return FigureCache(config.CACHE_MB * 1024 * 1024, backend=backend)
+
+
+# Instância única compartilhada pelos callbacks do processo
+figure_cache = build_cache()
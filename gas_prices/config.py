@@ -0,0 +1,66 @@
+#######################################################################################
+# -= CONFIGURAÇÕES DO PAINEL =-
+#
+# Parâmetros lidos das variáveis de ambiente, com valores padrão para rodar localmente.
+
+import os
+
+# Diretório raiz do projeto
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fonte original dos dados (URL ou caminho local do CSV da ANP)
+SOURCE = os.environ.get(
+    "GAS_PRICES_SOURCE",
+    "https://raw.githubusercontent.com/asimov-academy/Dashboards/main/gas-prices-dash/data_gas.csv"
+)
+
+# Diretório do snapshot colunar gerado a partir do CSV
+SNAPSHOT_DIR = os.environ.get("GAS_PRICES_SNAPSHOT", os.path.join(BASE_DIR, "data", "snapshot"))
+
+# Representação compacta do DataFrame (ano int16, categorias e float32)
+COMPACT = os.environ.get("GAS_PRICES_COMPACT", "1") != "0"
+
+# Cache de figuras: limite em memória por processo (0 desativa) e diretório opcional
+# compartilhado entre os workers do gunicorn
+CACHE_MB     = int(os.environ.get("GAS_PRICES_CACHE_MB", "64"))
+CACHE_DIR    = os.environ.get("GAS_PRICES_CACHE_DIR") or None
+CACHE_DIR_MB = int(os.environ.get("GAS_PRICES_CACHE_DIR_MB", "256"))
+
+# Produto exibido ao abrir o painel e quantidade de produtos mantidos em memória
+PRODUCT      = os.environ.get("GAS_PRICES_PRODUCT", "GASOLINA COMUM")
+PRODUCTS_LRU = int(os.environ.get("GAS_PRICES_PRODUCTS_LRU", "3"))
+
+# Intervalo (segundos) da verificação de novas gerações do snapshot (0 desativa)
+RELOAD_SECONDS = int(os.environ.get("GAS_PRICES_RELOAD_SECONDS", "30"))
+
+# Profiler por amostragem: grava o perfil dos callbacks mais lentos que o limite, em
+# milissegundos (0 desativa)
+PROFILE_MS  = int(os.environ.get("GAS_PRICES_PROFILE_MS", "0"))
+PROFILE_DIR = os.environ.get("GAS_PRICES_PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles"))
+
+# Limite de pontos (somando todas as séries) do gráfico Preço x Estado
+MAX_POINTS = int(os.environ.get("GAS_PRICES_MAX_POINTS", "4000"))
+
+# Serialização das respostas: motor JSON do plotly ("auto" usa o orjson quando
+# instalado), casas decimais dos valores das figuras e compressão gzip/brotli das
+# respostas a partir de um tamanho mínimo, em bytes
+JSON_ENGINE        = os.environ.get("GAS_PRICES_JSON_ENGINE", "auto")
+PRECISION          = int(os.environ.get("GAS_PRICES_PRECISION", "3"))
+COMPRESS           = os.environ.get("GAS_PRICES_COMPRESS", "1") != "0"
+COMPRESS_MIN_BYTES = int(os.environ.get("GAS_PRICES_COMPRESS_MIN_BYTES", "1024"))
+
+# Limite, em MB, dos resultados intermediários compartilhados entre callbacks, um
+# segundo cache por processo além do de figuras (0 desativa a memoização)
+CONTEXT_MB = int(os.environ.get("GAS_PRICES_CONTEXT_MB", "16"))
+
+# Callbacks pesados em um pool local de processos: processos por worker do servidor
+# (0 desativa), diretório do estado e dos resultados, limite em disco e intervalo, em
+# milissegundos, das consultas do navegador ao estado dos jobs
+JOBS         = int(os.environ.get("GAS_PRICES_JOBS", "0"))
+JOBS_DIR     = os.environ.get("GAS_PRICES_JOBS_DIR", os.path.join(BASE_DIR, "data", "jobs"))
+JOBS_DIR_MB  = int(os.environ.get("GAS_PRICES_JOBS_DIR_MB", "64"))
+JOBS_POLL_MS = int(os.environ.get("GAS_PRICES_JOBS_POLL_MS", "500"))
+
+# Tempo (segundos) que clientes e proxies podem reutilizar as respostas da API de
+# consulta sem revalidar; consultas com a versão fixada não expiram
+API_MAX_AGE = int(os.environ.get("GAS_PRICES_API_MAX_AGE", "30"))
@@ -0,0 +1,291 @@
+#######################################################################################
+# -= RESULTADOS INTERMEDIÁRIOS COMPARTILHADOS ENTRE CALLBACKS =-
+#
+# Uma mesma ação do usuário dispara vários callbacks, cada um em sua requisição:
+# trocar o estado 1, por exemplo, atualiza a comparação direta e o card 1, e mudar o
+# intervalo de anos atualiza todos os gráficos. Os cálculos comuns a esses callbacks
+# ("linha do estado X no intervalo R", "diferença entre X e Y", "anos do intervalo")
+# são nós nomeados de um pequeno grafo de dependências: cada nó é uma função das
+# entradas, que pode consultar outros nós, e o seu resultado fica guardado pela chave
+# do dataset (produto, versão e intervalo) e pelos parâmetros.
+#
+# Callbacks concorrentes que precisam do mesmo nó aguardam o primeiro cálculo em vez de
+# repeti-lo. As contagens de cálculos, reaproveitamentos e esperas de cada nó, isto é,
+# o trabalho duplicado evitado, são exportadas junto das métricas dos callbacks.
+#
+# Os resultados ficam em um segundo cache por processo, ao lado do cache de figuras
+# (gas_prices.cache): este guarda as respostas prontas de cada callback, aquele os
+# cálculos que callbacks diferentes têm em comum. Ambos são limitados em bytes
+# (GAS_PRICES_CACHE_MB e GAS_PRICES_CONTEXT_MB) e somam-se na memória de cada worker.
+#
+# Os resultados guardados são compartilhados e não devem ser alterados.
+
+import functools
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from gas_prices import config
+from gas_prices.cache import normalize, versioned
+from gas_prices.registry import registry
+
+PRICE = "VALOR REVENDA (R$/L)"
+
+# Marcador de resultado ausente (um nó pode devolver None)
+_MISSING = object()
+
+
+def sizeof(value):
+
+    """
+        Tamanho aproximado, em bytes, de um resultado intermediário: arrays do numpy e
+        objetos do pandas pelos seus buffers, tuplas e listas pela soma dos itens.
+    """
+
+    if hasattr(value, "memory_usage"):
+        uso = value.memory_usage()
+        return int(uso.sum()) if hasattr(uso, "sum") else int(uso)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ComputationContext:
+
+    """
+        Grafo de resultados intermediários com memoização e cálculo único por chave.
+            - max_bytes: limite aproximado (ver sizeof) dos resultados mantidos,
+              descartando os usados há mais tempo (0 desativa a memoização; as contagens
+              continuam).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes   = max_bytes
+        self._nodes      = {}
+        self._values     = OrderedDict()
+        self._bytes      = 0
+        self._pending    = {}
+        self._lock       = threading.Lock()
+        self._computed   = Counter()
+        self._reused     = Counter()
+        self._waited     = Counter()
+        self._seconds    = defaultdict(float)
+
+    def node(self, name):
+
+        """
+            Decorador que registra uma função como nó do grafo. A função recebe a chave
+            do dcc.Store e os parâmetros do nó, e pode consultar outros nós com get.
+        """
+
+        def decorator(func):
+            self._nodes[name] = func
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                return self.get(name, *args)
+
+            return wrapper
+
+        return decorator
+
+    def get(self, name, *args):
+
+        """
+            Resultado do nó para as entradas, calculado apenas se ainda não existe.
+        """
+
+        args  = versioned(args)
+        chave = (name, normalize(args))
+        while True:
+            with self._lock:
+                valor = self._values.get(chave, _MISSING)
+                if valor is not _MISSING:
+                    self._values.move_to_end(chave)
+                    self._reused[name] += 1
+                    return valor[0]
+
+                evento = self._pending.get(chave)
+                if evento is None:
+                    evento = self._pending[chave] = threading.Event()
+                    break
+                self._waited[name] += 1
+
+            # Outro callback já está calculando o mesmo nó; se ele falhar, o cálculo é
+            # refeito aqui
+            evento.wait()
+            with self._lock:
+                valor = self._values.get(chave, _MISSING)
+            if valor is not _MISSING:
+                return valor[0]
+
+        inicio = time.perf_counter()
+        try:
+            valor   = self._nodes[name](*args)
+            tamanho = sizeof(valor) if self.max_bytes else 0
+            with self._lock:
+                self._computed[name] += 1
+                self._seconds[name] += time.perf_counter() - inicio
+                if 0 < tamanho <= self.max_bytes:
+                    self._values[chave] = (valor, tamanho)
+                    self._bytes += tamanho
+                    while self._bytes > self.max_bytes:
+                        _, (_, descartado) = self._values.popitem(last=False)
+                        self._bytes -= descartado
+            return valor
+        finally:
+            with self._lock:
+                self._pending.pop(chave, None)
+            evento.set()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries":  len(self._values),
+                "bytes":    self._bytes,
+                "computed": sum(self._computed.values()),
+                "reused":   sum(self._reused.values()),
+                "waited":   sum(self._waited.values()),
+            }
+
+    def lines(self):
+
+        """
+            Contagens por nó no formato texto do Prometheus.
+        """
+
+        with self._lock:
+            linhas = []
+            contagens = [
+                ("gas_prices_intermediate_computed_total", "Cálculos de cada resultado intermediário.", self._computed),
+                ("gas_prices_intermediate_reused_total", "Resultados intermediários reaproveitados de outro callback.", self._reused),
+                ("gas_prices_intermediate_waited_total", "Esperas pelo cálculo em andamento em outro callback.", self._waited),
+            ]
+            for metrica, help_text, contagem in contagens:
+                linhas.append(f"# HELP {metrica} {help_text}")
+                linhas.append(f"# TYPE {metrica} counter")
+                for nome in sorted(self._nodes):
+                    linhas.append(f'{metrica}{{node="{nome}"}} {contagem[nome]}')
+
+            linhas.append("# HELP gas_prices_intermediate_seconds_total Tempo gasto calculando cada resultado intermediário, incluindo os nós consultados por ele.")
+            linhas.append("# TYPE gas_prices_intermediate_seconds_total counter")
+            for nome in sorted(self._nodes):
+                linhas.append(f'gas_prices_intermediate_seconds_total{{node="{nome}"}} {self._seconds[nome]:.6f}')
+
+        return linhas
+
+
+# Instância única compartilhada pelos callbacks do processo
+context = ComputationContext(config.CONTEXT_MB * 1024 * 1024)
+
+
+#######################################################################################
+# -= NÓS =-
+
+@context.node("years")
+def years(key):
+
+    """
+        Anos com dados dentro do intervalo da chave.
+    """
+
+    return registry.cube(key).years(*registry.years(key))
+
+
+@context.node("endpoints")
+def endpoints(key, estado):
+
+    """
+        Primeiro e último preço do estado dentro do intervalo da chave.
+    """
+
+    return registry.cube(key).endpoints(estado, *registry.years(key))
+
+
+@context.node("month_bounds")
+def month_bounds(key):
+
+    """
+        Colunas [inicial, final) da matriz de preços no intervalo da chave.
+    """
+
+    return registry.cube(key).prices.month_bounds(*registry.years(key))
+
+
+@context.node("state_row")
+def state_row(key, estado):
+
+    """
+        Preços mensais do estado no intervalo da chave.
+    """
+
+    return registry.cube(key).prices.row(estado, *month_bounds(key))
+
+
+@context.node("difference")
+def difference(key, estado1, estado2):
+
+    """
+        Meses do intervalo e diferença mensal estado1 - estado2.
+    """
+
+    primeiro, ultimo = month_bounds(key)
+    meses = registry.cube(key).prices.months[primeiro:ultimo]
+    return meses, state_row(key, estado1) - state_row(key, estado2)
+
+
+@context.node("cheaper_share")
+def cheaper_share(key, estado1, estado2):
+
+    """
+        Fração dos meses comparáveis em que estado1 foi mais barato.
+    """
+
+    from gas_prices.matrix import cheaper_fraction
+
+    return cheaper_fraction(difference(key, estado1, estado2)[1])
+
+
+@context.node("week_bounds")
+def week_bounds(key):
+
+    """
+        Colunas [inicial, final) da matriz semanal de indicadores no intervalo da chave.
+    """
+
+    return registry.cube(key).analytics.week_bounds(*registry.years(key))
+
+
+@context.node("weekly_row")
+def weekly_row(key, metric, label):
+
+    """
+        Semanas do intervalo e indicador semanal do estado ou região.
+    """
+
+    primeiro, ultimo = week_bounds(key)
+    analytics = registry.cube(key).analytics
+    return analytics.weeks[primeiro:ultimo], analytics.row(metric, label, primeiro, ultimo)
+
+
+@context.node("state_series")
+def state_series(key, start, end, estado, points):
+
+    """
+        Observações do estado na faixa visível, reduzidas a no máximo `points` pontos.
+            - start, end: datas da faixa visível (None para o intervalo todo).
+    """
+
+    from gas_prices.downsample import minmax
+
+    linhas = registry.resolve(key, start, end)
+    linhas = linhas[(linhas["ESTADO"] == estado).to_numpy()]
+    return linhas.iloc[minmax(linhas[PRICE].to_numpy(), points)]
@@ -0,0 +1,150 @@
+#######################################################################################
+# -= CUBO DE AGREGADOS =-
+#
+# Todas as agregações exibidas pelo painel são materializadas uma única vez, quando o
+# dataset é publicado. Os callbacks passam a fazer apenas consultas e fatias sobre
+# tabelas pequenas (anos x regiões, anos x estados, estados x meses, estados e regiões
+# x semanas), cujo custo não depende da quantidade de linhas do dataset.
+
+import pandas as pd
+
+from gas_prices.analytics import PriceAnalytics
+from gas_prices.matrix import PriceMatrix
+
+PRICE = "VALOR REVENDA (R$/L)"
+
+
+class AggregateCube:
+
+    """
+        Agregados pré-calculados de um dataset.
+            - frame: DataFrame pré-processado (ver gas_prices.data.COLUMNS).
+    """
+
+    def __init__(self, frame):
+
+        # Máximos e mínimos por ano
+        por_ano          = frame.groupby("ANO")[PRICE]
+        self.year_maxmin = pd.concat([por_ano.max(), por_ano.min()], axis=1)
+        self.year_maxmin.columns = ["Máximo", "Mínimo"]
+
+        # Médias anuais por região e por estado
+        self.region_year = frame.groupby(["ANO", "REGIÃO"], observed=True)[PRICE].mean().reset_index()
+        self.state_year  = frame.groupby(["ANO", "ESTADO", "REGIÃO"], observed=True)[PRICE].mean().reset_index()
+
+        # Primeiro e último preço de cada estado em cada ano (frame ordenado por DATA)
+        por_estado = frame.groupby(["ESTADO", "ANO"], observed=True)[PRICE]
+        self.state_endpoints = pd.concat([por_estado.first(), por_estado.last()], axis=1)
+        self.state_endpoints.columns = ["first", "last"]
+
+        # Matriz densa estados x meses do calendário
+        self.prices = PriceMatrix(frame)
+
+        # Matriz estados e regiões x semanas, com os indicadores móveis
+        self.analytics = PriceAnalytics(frame)
+
+    @classmethod
+    def extend(cls, previous, frame, years):
+
+        """
+            Novo cubo a partir de um anterior, recalculando apenas os anos afetados.
+                - previous: cubo da versão anterior do dataset.
+                - frame: linhas de todos os anos afetados (e apenas deles).
+                - years: anos afetados (ex.: os anos das semanas recém-ingeridas).
+        """
+
+        parcial = cls(frame)
+        cube    = cls.__new__(cls)
+
+        cube.year_maxmin = pd.concat([
+            previous.year_maxmin.drop(index=years, errors="ignore"), parcial.year_maxmin
+        ]).sort_index()
+
+        def substituir(anterior, novo, colunas):
+            mantidos = anterior[~anterior["ANO"].isin(years)]
+            return pd.concat([mantidos, novo]).sort_values(colunas).reset_index(drop=True)
+
+        cube.region_year = substituir(previous.region_year, parcial.region_year, ["ANO", "REGIÃO"])
+        cube.state_year  = substituir(previous.state_year, parcial.state_year, ["ANO", "ESTADO"])
+
+        anos_anteriores = previous.state_endpoints.index.get_level_values("ANO")
+        cube.state_endpoints = pd.concat([
+            previous.state_endpoints[~anos_anteriores.isin(years)], parcial.state_endpoints
+        ]).sort_index()
+
+        cube.prices    = previous.prices.merge(parcial.prices)
+        cube.analytics = previous.analytics.extend(parcial.analytics)
+        return cube
+
+    def years(self, start=None, end=None):
+
+        """
+            Anos com dados dentro do intervalo (inclusivo).
+        """
+
+        return self.year_maxmin.loc[start:end].index
+
+    def maxmin(self, start=None, end=None):
+
+        """
+            Máximos e mínimos anuais dentro do intervalo de anos.
+        """
+
+        return self.year_maxmin.loc[start:end]
+
+    def regions(self, ano):
+
+        """
+            Médias por região no ano selecionado.
+        """
+
+        df = self.region_year
+        return df[df["ANO"] == ano].copy()
+
+    def states(self, ano, regiao):
+
+        """
+            Médias por estado no ano e na região selecionados.
+        """
+
+        df = self.state_year
+        return df[(df["ANO"] == ano) & (df["REGIÃO"] == regiao)].copy()
+
+    def monthly(self, start=None, end=None):
+
+        """
+            Matriz mensal meses x estados restrita ao intervalo de anos.
+        """
+
+        return self.prices.frame(start, end)
+
+    def weekly(self, metric, labels, start=None, end=None):
+
+        """
+            Indicador semanal (ver gas_prices.analytics) dos estados e regiões
+            dentro do intervalo de anos, semanas x linhas.
+        """
+
+        return self.analytics.series(metric, labels, start, end)
+
+    def ranking(self, metric, start=None, end=None, regions=False):
+
+        """
+            Último valor do indicador de cada estado (ou região) no intervalo de anos.
+        """
+
+        return self.analytics.latest(metric, start, end, regions)
+
+    def endpoints(self, estado, start=None, end=None):
+
+        """
+            Primeiro e último preço do estado dentro do intervalo de anos.
+        """
+
+        if estado not in self.state_endpoints.index.get_level_values("ESTADO"):
+            return float("nan"), float("nan")
+
+        df = self.state_endpoints.loc[estado].loc[start:end]
+        if df.empty:
+            return float("nan"), float("nan")
+        return df["first"].iat[0], df["last"].iat[-1]
@@ -0,0 +1,290 @@
+#######################################################################################
+# -= CARGA E PRÉ-PROCESSAMENTO DOS DADOS =-
+
+import argparse
+import contextlib
+import logging
+import os
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+from gas_prices import config, snapshot
+
+logger = logging.getLogger(__name__)
+
+# Colunas mantidas após o pré-processamento, na ordem em que são gravadas
+COLUMNS = ["DATA", "ANO", "REGIÃO", "ESTADO", "VALOR REVENDA (R$/L)"]
+
+# Colunas do CSV original necessárias ao pré-processamento
+SOURCE_COLUMNS = {"DATA INICIAL", "DATA FINAL", "REGIÃO", "ESTADO", "PRODUTO", "PREÇO MÉDIO REVENDA"}
+
+
+def prepare(dados, product=config.PRODUCT, compact=config.COMPACT):
+
+    """
+        Pré-processamento do CSV original da ANP.
+            - dados: DataFrame lido diretamente do CSV.
+            - product: produto (combustível) mantido.
+            - compact: aplica a representação compacta (ver compact_frame).
+    """
+
+    # Erro no nome da coluna
+    dados = dados.rename(columns={' DATA INICIAL': 'DATA INICIAL'})
+
+    # Filtrando o produto antes de qualquer ordenação ou cópia
+    dados = dados[dados["PRODUTO"] == product]
+
+    # Data média da semana pesquisada
+    inicio = pd.to_datetime(dados['DATA INICIAL'])
+    fim    = pd.to_datetime(dados['DATA FINAL'])
+
+    frame = pd.DataFrame({
+        "DATA":                 inicio + (fim - inicio)/2,
+        "REGIÃO":               dados["REGIÃO"],
+        "ESTADO":               dados["ESTADO"],
+        "VALOR REVENDA (R$/L)": dados["PREÇO MÉDIO REVENDA"],
+    })
+
+    # Estabelecendo a ordem do DF pelas datas
+    frame = frame.sort_values(by="DATA", kind="mergesort").reset_index(drop=True)
+
+    # Criando uma coluna de Ano (inteiro, de forma vetorizada)
+    frame.insert(1, "ANO", frame["DATA"].dt.year.astype("int64"))
+
+    # Retornando os dados já organizados
+    return compact_frame(frame) if compact else frame
+
+
+def compact_frame(frame):
+
+    """
+        Representação compacta do DataFrame: ano em int16, estado e região como
+        categorias e preço em float32 quando a conversão não altera os valores.
+            - frame: DataFrame no formato de COLUMNS.
+    """
+
+    frame = frame.copy()
+    frame["ANO"]    = frame["ANO"].astype("int16")
+    frame["REGIÃO"] = frame["REGIÃO"].astype("category")
+    frame["ESTADO"] = frame["ESTADO"].astype("category")
+
+    # Os preços têm 3 casas decimais; float32 preserva-os com folga até a casa dos milhares
+    preco   = frame["VALOR REVENDA (R$/L)"]
+    preco32 = preco.astype("float32")
+    if (preco32.astype("float64") - preco).abs().max() < 1e-4:
+        frame["VALOR REVENDA (R$/L)"] = preco32
+
+    return frame
+
+
+def memory_report(frame):
+
+    """
+        Uso de memória do DataFrame, incluindo o conteúdo das strings.
+            - frame: DataFrame a ser medido.
+    """
+
+    usage = frame.memory_usage(index=True, deep=True)
+    rows  = max(len(frame), 1)
+
+    report = {name: round(nbytes / rows, 2) for name, nbytes in usage.items()}
+    report["TOTAL"] = round(usage.sum() / rows, 2)
+    return report
+
+
+def read_source(source=config.SOURCE):
+
+    """
+        Leitura do CSV original, apenas com as colunas necessárias.
+            - source: localização do CSV (URL ou caminho local).
+    """
+
+    return pd.read_csv(source, usecols=lambda column: column.strip() in SOURCE_COLUMNS)
+
+
+def load_csv(source=config.SOURCE, product=config.PRODUCT, compact=config.COMPACT):
+
+    """
+        Carga dos dados a partir do CSV original (URL ou caminho local).
+            - source: localização do CSV.
+            - product: produto (combustível) carregado.
+            - compact: aplica a representação compacta.
+    """
+
+    return prepare(read_source(source), product=product, compact=compact)
+
+
+def list_products(path=config.SNAPSHOT_DIR, source=config.SOURCE):
+
+    """
+        Produtos disponíveis: catálogo do snapshot ou, sem ele, a coluna PRODUTO do CSV.
+    """
+
+    if snapshot.exists_catalogue(path):
+        return snapshot.read_catalogue(path)
+
+    produtos = pd.read_csv(source, usecols=["PRODUTO"])["PRODUTO"]
+    return sorted(produtos.unique().tolist())
+
+
+def load_data(product=config.PRODUCT, path=config.SNAPSHOT_DIR, source=config.SOURCE):
+
+    """
+        Carga dos dados de um produto utilizados pelo painel.
+            - product: produto (combustível) carregado.
+            - path: diretório do snapshot colunar (partições carregadas via memory-map).
+            - source: CSV original, usado apenas quando não há snapshot válido.
+        Sem snapshot válido, o CSV é convertido em snapshot antes da carga: assim todos
+        os workers mapeiam os mesmos arquivos e compartilham as páginas de memória, em
+        vez de cada um manter a sua própria cópia do DataFrame.
+    """
+
+    partition = snapshot.partition_path(path, product)
+    if snapshot.exists(partition):
+        try:
+            return snapshot.load(partition, compact=config.COMPACT)
+        except snapshot.StaleSnapshotError as error:
+            logger.warning("Snapshot ignorado: %s", error)
+
+    try:
+        materialize(source, path, product)
+        return snapshot.load(partition, compact=config.COMPACT)
+    except (OSError, snapshot.StaleSnapshotError) as error:
+        logger.warning("Não foi possível gravar o snapshot em %s: %s", path, error)
+
+    logger.info("Carregando %s a partir do CSV %s", product, source)
+    return load_csv(source, product=product)
+
+
+@contextlib.contextmanager
+def snapshot_lock(path=config.SNAPSHOT_DIR):
+
+    """
+        Lock de arquivo exclusivo do diretório do snapshot, mantido por todo processo que
+        grava gerações (conversão do CSV, ingestão): a gravação, a troca do CURRENT e a
+        remoção das gerações antigas de um processo não se intercalam com as de outro.
+    """
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, ".lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def materialize(source=config.SOURCE, path=config.SNAPSHOT_DIR, product=config.PRODUCT):
+
+    """
+        Gera o snapshot a partir do CSV sob um lock de arquivo, de modo que apenas um
+        processo faça a conversão e os demais aguardem e reaproveitem o resultado.
+    """
+
+    with snapshot_lock(path):
+        partition = snapshot.partition_path(path, product)
+        if snapshot.exists(partition):
+            try:
+                snapshot.read_meta(partition, compact=config.COMPACT)
+                return
+            except snapshot.StaleSnapshotError:
+                pass
+
+        logger.info("Gerando o snapshot em %s a partir do CSV %s", path, source)
+        write_snapshot(source, path)
+
+
+def snapshot_generation(product, path=config.SNAPSHOT_DIR):
+
+    """
+        Geração ativa da partição do produto no snapshot (None quando não existe).
+    """
+
+    return snapshot.generation(snapshot.partition_path(path, product))
+
+
+def write_snapshot(source=config.SOURCE, path=config.SNAPSHOT_DIR, compact=config.COMPACT):
+
+    """
+        Gera o snapshot particionado: uma partição colunar por produto e o catálogo.
+            - source: CSV original da ANP.
+            - path: diretório raiz do snapshot.
+    """
+
+    dados    = read_source(source)
+    produtos = sorted(dados["PRODUTO"].unique().tolist())
+
+    linhas = 0
+    for produto in produtos:
+        frame = prepare(dados, product=produto, compact=compact)
+        meta  = snapshot.write(frame, snapshot.partition_path(path, produto), source=source, compact=compact, product=produto)
+        linhas += meta["rows"]
+
+    snapshot.write_catalogue(path, produtos)
+    return produtos, linhas
+
+
+def baseline(source=config.SOURCE, product=config.PRODUCT):
+
+    """
+        Carga original do painel, usada como referência do relatório de memória: o CSV
+        completo, o ano como texto, estados e regiões como objetos e a coluna "index"
+        criada pelo reset_index, antes do filtro do produto.
+            - source: localização do CSV.
+            - product: produto (combustível) mantido.
+    """
+
+    dados = pd.read_csv(source)
+    dados = dados.rename(columns={' DATA INICIAL': 'DATA INICIAL'})
+
+    dados['DATA INICIAL'] = pd.to_datetime(dados['DATA INICIAL'])
+    dados['DATA FINAL']   = pd.to_datetime(dados['DATA FINAL'])
+    dados['DATA MEDIA']   = ((dados['DATA FINAL'] - dados['DATA INICIAL'])/2) + dados['DATA INICIAL']
+    dados                 = dados.sort_values(by='DATA MEDIA', ascending=True)
+    dados                 = dados.rename(columns={'DATA MEDIA': 'DATA', 'PREÇO MÉDIO REVENDA': 'VALOR REVENDA (R$/L)'})
+    dados["ANO"]          = dados["DATA"].apply(lambda x: str(x.year))
+
+    dados = dados.reset_index()
+    dados = dados[dados.PRODUTO == product]
+
+    # Excluindo as mesmas colunas que a carga original (as demais, como a coluna sem
+    # nome do CSV da ANP, permaneciam em memória)
+    return dados.drop(columns=[
+        'UNIDADE DE MEDIDA', 'COEF DE VARIAÇÃO REVENDA', 'COEF DE VARIAÇÃO DISTRIBUIÇÃO',
+        'NÚMERO DE POSTOS PESQUISADOS', 'DATA INICIAL', 'DATA FINAL', 'PREÇO MÁXIMO DISTRIBUIÇÃO',
+        'PREÇO MÍNIMO DISTRIBUIÇÃO', 'DESVIO PADRÃO DISTRIBUIÇÃO', 'MARGEM MÉDIA REVENDA',
+        'PREÇO MÍNIMO REVENDA', 'PREÇO MÁXIMO REVENDA', 'DESVIO PADRÃO REVENDA', 'PRODUTO',
+        'PREÇO MÉDIO DISTRIBUIÇÃO',
+    ], errors="ignore")
+
+
+def main(argv=None):
+
+    """
+        Relatório de memória (bytes por linha) da carga original e da representação
+        compacta.
+    """
+
+    parser = argparse.ArgumentParser(description="Relatório de memória do DataFrame de preços.")
+    parser.add_argument("--source", default=config.SOURCE, help="CSV original (URL ou caminho)")
+    parser.add_argument("--product", default=config.PRODUCT, help="produto (combustível)")
+    args = parser.parse_args(argv)
+
+    # Antes: a carga original; depois: a carga atual, na representação compacta
+    antes  = memory_report(baseline(args.source, args.product))
+    depois = memory_report(prepare(read_source(args.source), product=args.product, compact=True))
+
+    print(f"{'COLUNA':<24}{'ANTES (B/linha)':>18}{'DEPOIS (B/linha)':>18}")
+    for name in list(antes) + [name for name in depois if name not in antes]:
+        print(f"{str(name):<24}{antes.get(name, 0):>18}{depois.get(name, 0):>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#######################################################################################
+# -= REDUÇÃO DE PONTOS DAS SÉRIES TEMPORAIS =-
+#
+# Um gráfico de linha não mostra mais detalhes do que a sua largura em pixels. As séries
+# enviadas ao navegador são reduzidas por baldes de mínimo/máximo: o eixo X é dividido
+# em baldes consecutivos e, de cada balde, ficam apenas o ponto de menor e o de maior
+# valor, na ordem em que ocorrem. Picos e vales são preservados (o que importa em uma
+# série de preços) e a redução é inteiramente vetorizada.
+#
+# A faixa visível e a largura da janela entram na chave do cache de figuras; ambas são
+# arredondadas antes (snap_relayout, snap_viewport), senão cada zoom ou
+# redimensionamento geraria uma entrada nova.
+#
+# O numpy e o pandas são importados apenas na primeira redução, já que o app importa
+# este módulo antes de o servidor subir (ver gas_prices.startup).
+
+import math
+
+# Passo, em pixels, do arredondamento da largura da janela
+WIDTH_STEP = 100
+
+
+def visible_range(relayout):
+
+    """
+        Intervalo do eixo X visível a partir do relayoutData do dcc.Graph.
+            - Retorna (início, fim) como texto de data, ou (None, None) para a série toda.
+    """
+
+    relayout = relayout or {}
+    if relayout.get("xaxis.autorange"):
+        return None, None
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    if isinstance(relayout.get("xaxis.range"), list):
+        return tuple(relayout["xaxis.range"][:2])
+    return None, None
+
+
+def snap_relayout(relayout, divisions=16):
+
+    """
+        Faixa visível alargada até os limites de uma grade de dias, no formato do
+        relayoutData ({"xaxis.range": [início, fim]}), ou None para a série toda. O
+        passo da grade é a menor potência de 2 dias que divide a faixa em até
+        `divisions` partes, então deslocamentos pequenos do zoom resultam na mesma faixa
+        (e na mesma entrada do cache de figuras) e o gráfico continua com dados em toda
+        a área visível.
+    """
+
+    import pandas as pd
+
+    inicio, fim = visible_range(relayout)
+    if inicio is None or fim is None:
+        return None
+
+    inicio, fim = sorted([pd.Timestamp(inicio), pd.Timestamp(fim)])
+    dias  = (fim - inicio) / pd.Timedelta(days=1)
+    passo = pd.Timedelta(days=2 ** max(math.ceil(math.log2(max(dias, 1) / divisions)), 0))
+
+    origem = pd.Timestamp(0)
+    inicio = origem + ((inicio - origem) // passo) * passo
+    fim    = origem - ((origem - fim) // passo) * passo
+    return {"xaxis.range": [inicio.strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d")]}
+
+
+def snap_viewport(viewport, step=WIDTH_STEP):
+
+    """
+        Largura da janela arredondada para baixo a um múltiplo de `step` pixels, de modo
+        que redimensionar a janela não gera uma figura (e uma entrada do cache) nova a
+        cada pixel; o resultado nunca pede mais pontos do que a janela mostra.
+    """
+
+    largura = (viewport or {}).get("width")
+    if not largura:
+        return viewport
+    return {"width": max(step, int(largura) // step * step)}
+
+
+def budget(traces, width, max_points, minimum=100):
+
+    """
+        Quantidade de pontos por série, de modo que a figura toda nunca passa de
+        max_points (para até max_points séries).
+            - traces: quantidade de séries da figura.
+            - width: largura do gráfico em pixels (um ponto por pixel basta).
+            - max_points: limite de pontos somando todas as séries.
+            - minimum: piso aplicado à largura, para manter a forma em janelas
+              estreitas; não ultrapassa a parte de cada série em max_points.
+    """
+
+    return max(1, min(max(int(width), minimum), max_points // max(traces, 1)))
+
+
+def minmax(y, points):
+
+    """
+        Posições dos pontos mantidos ao reduzir a série a no máximo `points` pontos por
+        baldes de mínimo/máximo.
+            - y: valores da série, na ordem do eixo X.
+            - points: quantidade máxima de pontos do resultado (ao menos 1).
+        Séries já pequenas resultam em slice(None), isto é, todos os pontos.
+    """
+
+    import numpy as np
+
+    n = len(y)
+    if n <= points:
+        return slice(None)
+
+    # Sem espaço para dois pontos por balde: pontos igualmente espaçados
+    if points < 4:
+        return np.unique(np.linspace(0, n - 1, max(points, 1)).round().astype("int64"))
+
+    # Dois pontos por balde; o primeiro e o último ponto da série são sempre mantidos
+    baldes  = (points - 2) // 2
+    tamanho = -(-(n - 2) // baldes)
+    miolo   = np.asarray(y[1:-1], dtype="float64")
+
+    # Completando o último balde com NaN para formar uma matriz baldes x tamanho
+    matriz = np.full(baldes * tamanho, np.nan)
+    matriz[:len(miolo)] = miolo
+    matriz = matriz.reshape(baldes, tamanho)
+
+    # Baldes vazios (quando o último fica sem pontos) são descartados
+    validos = ~np.isnan(matriz).all(axis=1)
+    matriz  = matriz[validos]
+    inicio  = np.flatnonzero(validos) * tamanho
+
+    menores = inicio + np.nanargmin(matriz, axis=1)
+    maiores = inicio + np.nanargmax(matriz, axis=1)
+
+    return np.unique(np.concatenate([[0], menores + 1, maiores + 1, [n - 1]]))
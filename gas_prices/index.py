@@ -0,0 +1,53 @@
+#######################################################################################
+# -= ÍNDICE TEMPORAL =-
+#
+# O DataFrame publicado fica ordenado por DATA (e, portanto, por ANO). O índice guarda
+# as posições onde cada ano começa e termina, de modo que um intervalo de anos vira um
+# par de limites de linhas e o filtro é uma fatia (iloc) sem cópia do DataFrame.
+
+import numpy as np
+import pandas as pd
+
+
+class TimeIndex:
+
+    """
+        Limites de linhas por ano e busca binária por datas.
+            - frame: DataFrame ordenado por DATA, com a coluna ANO.
+    """
+
+    def __init__(self, frame):
+        self.dates = frame["DATA"].to_numpy()
+        anos       = frame["ANO"].to_numpy()
+
+        # Anos presentes e a posição da primeira e da última linha (exclusiva) de cada um
+        self.years  = np.unique(anos)
+        self.starts = np.searchsorted(anos, self.years, side="left")
+        self.ends   = np.searchsorted(anos, self.years, side="right")
+
+    @staticmethod
+    def is_sorted(frame):
+        dates = frame["DATA"].to_numpy()
+        return bool((dates[1:] >= dates[:-1]).all())
+
+    def year_bounds(self, start=None, end=None):
+
+        """
+            Limites [inicial, final) das linhas dos anos start..end, inclusivos.
+        """
+
+        primeiro = 0 if start is None else np.searchsorted(self.years, start, side="left")
+        ultimo   = len(self.years) if end is None else np.searchsorted(self.years, end, side="right")
+        if primeiro >= ultimo:
+            return 0, 0
+        return int(self.starts[primeiro]), int(self.ends[ultimo - 1])
+
+    def date_bounds(self, start=None, end=None):
+
+        """
+            Limites [inicial, final) das linhas com DATA entre start e end, inclusivos.
+        """
+
+        primeiro = 0 if start is None else np.searchsorted(self.dates, pd.Timestamp(start).to_datetime64(), side="left")
+        ultimo   = len(self.dates) if end is None else np.searchsorted(self.dates, pd.Timestamp(end).to_datetime64(), side="right")
+        return int(primeiro), int(max(primeiro, ultimo))
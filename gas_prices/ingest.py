@@ -0,0 +1,168 @@
+#######################################################################################
+# -= INGESTÃO INCREMENTAL =-
+#
+# A ANP publica uma nova semana de pesquisa de cada vez. Em vez de regravar o snapshot
+# inteiro, a ingestão lê apenas o CSV com as semanas novas, inclui em cada partição as
+# linhas (DATA, ESTADO) ainda não gravadas ou com preço corrigido e publica uma nova
+# geração. A geração registra a anterior como base, com a quantidade de linhas iniciais
+# inalteradas, o que permite aos processos em execução recalcular apenas os anos
+# afetados do cubo de agregados (ver gas_prices.registry).
+#
+# A nova geração ainda contém a partição inteira: cada coluna é um único .npy mapeado
+# em memória, então não há como gravar apenas os anos afetados sem fragmentar as
+# colunas. A regravação é sequencial e proporcional ao tamanho da partição (alguns MB
+# por produto), enquanto o custo relevante, o recálculo dos agregados, é incremental.
+# A gravação ocorre sob o mesmo lock da conversão do CSV (ver gas_prices.data), de
+# modo que duas ingestões, ou uma ingestão e uma conversão, não publicam nem removem
+# gerações ao mesmo tempo.
+#
+#     python -m gas_prices.ingest --source novas_semanas.csv
+
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from gas_prices import config, snapshot
+from gas_prices.data import compact_frame, prepare, read_source, snapshot_lock
+
+logger = logging.getLogger(__name__)
+
+PRICE = "VALOR REVENDA (R$/L)"
+
+# Identificação de uma linha da partição: semana e estado
+KEY = ["DATA", "ESTADO"]
+
+
+def append(atual, novas, compact=config.COMPACT):
+
+    """
+        DataFrame da partição com as linhas novas e as correções do CSV.
+            - atual: DataFrame já gravado na partição (ordenado por DATA).
+            - novas: linhas pré-processadas (sem a representação compacta).
+            - compact: aplica a representação compacta ao resultado.
+        As linhas são identificadas por (DATA, ESTADO), e não por uma data de corte:
+        semanas atrasadas e estados que faltavam em uma semana já gravada são incluídos,
+        e uma linha gravada com outro preço é substituída. As linhas idênticas às já
+        gravadas e as repetidas no próprio CSV são descartadas e registradas no log.
+        Retorna (frame, linhas incluídas ou corrigidas, quantidade de linhas iniciais
+        de frame idênticas às de atual).
+    """
+
+    # As categorias são recalculadas, já que as semanas novas podem trazer estados novos
+    textos = {coluna: object for coluna in ["REGIÃO", "ESTADO"]}
+    atual  = atual.astype(textos)
+    unicas = novas.astype(textos).drop_duplicates(KEY, keep="last")
+
+    # Cruzando com as linhas gravadas: posição na partição (NaN para as que não existem)
+    # e preço gravado; os preços compactos (float32) são comparados com tolerância
+    gravadas   = atual[KEY + [PRICE]].reset_index().drop_duplicates(KEY, keep="last")
+    cruzamento = unicas.merge(gravadas, on=KEY, how="left", suffixes=("", " GRAVADO"))
+    iguais     = ((cruzamento[PRICE] - cruzamento[f"{PRICE} GRAVADO"]).abs() < 1e-4).to_numpy()
+    corrigidas = cruzamento.loc[~iguais & cruzamento["index"].notna().to_numpy(), "index"].astype("int64")
+    alteradas  = unicas[~iguais]
+
+    repetidas = len(novas) - len(unicas)
+    if repetidas or iguais.any():
+        logger.warning(
+            "Linhas descartadas na ingestão: %d já gravadas, %d repetidas no CSV",
+            int(iguais.sum()), repetidas
+        )
+
+    # As linhas anteriores à primeira substituída e à posição da semana mais antiga
+    # incluída continuam idênticas (a ordenação é estável)
+    inicio = len(atual)
+    if len(corrigidas):
+        inicio = min(inicio, int(corrigidas.min()))
+    if len(alteradas):
+        inicio = min(inicio, int(atual["DATA"].searchsorted(alteradas["DATA"].min(), side="right")))
+
+    partes = [parte for parte in (atual.drop(index=corrigidas), alteradas) if len(parte)] or [alteradas]
+    frame  = pd.concat(partes, ignore_index=True).sort_values(by="DATA", kind="mergesort", ignore_index=True)
+    frame["ANO"] = frame["ANO"].astype("int64")
+
+    return (compact_frame(frame) if compact else frame), alteradas, inicio
+
+
+def ingest(source, path=config.SNAPSHOT_DIR, compact=config.COMPACT):
+
+    """
+        Anexa as semanas novas do CSV ao snapshot, produto a produto.
+            - source: CSV (URL ou caminho) no formato original da ANP.
+            - path: diretório raiz do snapshot.
+            - compact: representação das partições gravadas.
+        Retorna {produto: (linhas novas, anos afetados)}.
+    """
+
+    dados    = read_source(source)
+    produtos = sorted(dados["PRODUTO"].unique().tolist())
+    frames   = {produto: prepare(dados, product=produto, compact=False) for produto in produtos}
+    return publish(frames, source, path, compact)
+
+
+def publish(frames, source, path=config.SNAPSHOT_DIR, compact=config.COMPACT):
+
+    """
+        Anexa ao snapshot as linhas novas de cada produto.
+            - frames: {produto: linhas pré-processadas, sem a representação compacta}.
+            - source: origem dos dados, registrada no cabeçalho das partições.
+            - path: diretório raiz do snapshot.
+            - compact: representação das partições gravadas.
+        Retorna {produto: (linhas novas, anos afetados)}.
+    """
+
+    # Leitura da geração atual, gravação da nova e troca do CURRENT sob o lock
+    with snapshot_lock(path):
+        produtos   = sorted(frames)
+        catalogo   = snapshot.read_catalogue(path) if snapshot.exists_catalogue(path) else []
+        resultados = {}
+
+        for produto in produtos:
+            partition = snapshot.partition_path(path, produto)
+            recentes  = frames[produto]
+
+            existe = snapshot.exists(partition)
+            atual  = snapshot.load(partition, compact=compact) if existe else recentes.iloc[:0]
+
+            frame, novas, inicio = append(atual, recentes, compact)
+            if novas.empty:
+                resultados[produto] = (0, [])
+                continue
+
+            # Linhas iniciais inalteradas: os processos em execução recalculam apenas os
+            # anos a partir da primeira linha incluída ou corrigida
+            base = {"generation": snapshot.generation(partition), "rows": inicio} if existe else None
+
+            snapshot.write(frame, partition, source=source, compact=compact, product=produto, base=base)
+            resultados[produto] = (len(novas), sorted(novas["ANO"].unique().tolist()))
+
+        # Registrando no catálogo os produtos que ainda não existiam
+        novos = [produto for produto in produtos if produto not in catalogo]
+        if novos:
+            snapshot.write_catalogue(path, sorted(catalogo + novos))
+
+    return resultados
+
+
+def main(argv=None):
+
+    """
+        Linha de comando para anexar semanas novas ao snapshot.
+    """
+
+    parser = argparse.ArgumentParser(description="Anexa semanas novas da ANP ao snapshot colunar.")
+    parser.add_argument("--source", required=True, help="CSV com as semanas novas (URL ou caminho)")
+    parser.add_argument("--snapshot", default=config.SNAPSHOT_DIR, help="diretório do snapshot")
+    args = parser.parse_args(argv)
+
+    start      = time.perf_counter()
+    resultados = ingest(args.source, args.snapshot)
+
+    for produto, (linhas, anos) in resultados.items():
+        print(f"{produto:<24}{linhas:>8} linhas novas  anos afetados: {anos or '-'}")
+    print(f"Ingestão concluída em {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#######################################################################################
+# -= EXECUÇÃO DE CALLBACKS PESADOS EM PROCESSOS =-
+#
+# Um callback demorado ocupa a thread do worker do servidor até terminar, atrasando as
+# demais requisições atendidas por ele. Os callbacks registrados aqui como tarefas
+# podem ser executados em um pool local de processos: o callback apenas submete o job
+# e devolve o seu identificador, e um dcc.Interval consulta o estado até o resultado
+# ficar pronto. Não há broker externo; o estado e o resultado de cada job ficam em um
+# diretório local, de modo que qualquer worker do gunicorn pode responder à consulta.
+#
+#   - identificador: derivado da tarefa, das entradas (que incluem a versão do
+#     dataset) e do escopo que submeteu o job (a sessão do navegador), então entradas
+#     repetidas na mesma sessão reaproveitam o resultado já gravado, e sessões com as
+#     mesmas entradas têm jobs distintos;
+#   - progresso: a tarefa informa o andamento com progress(fração, mensagem), que fora
+#     de um job não faz nada;
+#   - cancelamento: quando as entradas de uma sessão mudam, o job anterior dela é
+#     marcado como cancelado e a tarefa é interrompida no próximo progress, sem afetar
+#     os jobs das demais sessões;
+#   - concorrência: cada worker do servidor tem o seu pool, com no máximo
+#     GAS_PRICES_JOBS processos; os jobs excedentes aguardam na fila do pool.
+#
+# Os processos do pool são criados por fork, herdando o app já importado, as tarefas
+# registradas e, com o gunicorn em preload, os dados já carregados pelo mestre. O fork acontece em start, chamado pelo gunicorn.conf.py logo que
+# o worker é criado, antes de qualquer outra thread existir: um fork feito mais tarde,
+# de uma thread de requisição, poderia copiar para o filho um lock (do logging, do
+# cache, do registro) mantido por outra thread, que ficaria travado para sempre. Sem o
+# pool (não iniciado ou encerrado com erro), os jobs rodam na própria thread que os
+# submete.
+
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+
+from gas_prices import config
+from gas_prices.cache import DiskBackend, normalize
+
+logger = logging.getLogger(__name__)
+
+# Estados finais de um job
+FINISHED = ("done", "failed", "cancelled")
+
+# Tempo de vida dos estados de jobs sem resultado em disco (falhos, cancelados ou
+# abandonados por um processo encerrado); os dos concluídos expiram com o resultado
+STATUS_SECONDS = 24 * 3600
+
+# Jobs concluídos entre duas limpezas dos estados em disco
+SWEEP_EVERY = 64
+
+# Job em execução no processo atual: (runner, identificador)
+_current = contextvars.ContextVar("job", default=None)
+
+
+class JobCancelled(Exception):
+
+    """
+        Cancelamento solicitado para o job em execução.
+    """
+
+
+class JobRunner:
+
+    """
+        Pool local de processos para tarefas registradas, com estado em disco.
+            - directory: diretório do estado e dos resultados, comum a todos os workers.
+            - workers: processos por worker do servidor (0 desativa o pool: os
+              callbacks são executados no próprio worker).
+            - max_bytes: limite aproximado dos resultados em disco.
+    """
+
+    def __init__(self, directory, workers, max_bytes):
+        self.directory = directory
+        self.workers   = workers
+        self.max_bytes = max_bytes
+        self._tasks    = {}
+        self._futures  = {}
+        self._store    = None
+        self._pool     = None
+        self._pid      = None
+        self._finishes = 0
+        self._lock     = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0 and "fork" in multiprocessing.get_all_start_methods()
+
+    def task(self, name):
+
+        """
+            Decorador que registra uma função como tarefa executável em processo.
+        """
+
+        def decorator(func):
+            self._tasks[name] = func
+            return func
+
+        return decorator
+
+    def submit(self, name, *args, scope=None):
+
+        """
+            Submete a tarefa com as entradas e devolve o identificador do job. Jobs já
+            concluídos ou em andamento neste worker não são submetidos de novo.
+                - scope: escopo do job (ex.: a sessão do navegador); o cancelamento de
+                  um job não afeta os de outros escopos com as mesmas entradas.
+        """
+
+        job = self.job_id(name, args, scope)
+        if self.store.get(job) is not None:
+            return job
+
+        with self._lock:
+            futuro = self._futures.get(job)
+            if futuro is not None and not futuro.done():
+                # Entradas que voltaram a valer (ex.: A -> B -> A) antes do job terminar:
+                # o cancelamento pedido pela troca anterior é desfeito
+                self._remove(job, "cancel")
+                return job
+
+            self._remove(job, "cancel")
+            self._write_status(job, "queued")
+            pool = self._pool if self._pid == os.getpid() else None
+            if pool is not None:
+                futuro = pool.submit(_execute, name, job, args)
+                self._futures[job] = futuro
+
+        if pool is None:
+            self.run(name, job, args)
+            return job
+
+        futuro.add_done_callback(lambda futuro: self._finished(job, futuro))
+        return job
+
+    def status(self, job):
+
+        """
+            Estado do job: {"state", "progress", "message"}. O estado é "queued",
+            "running", "done", "failed", "cancelled" ou "unknown".
+        """
+
+        try:
+            with open(self._path(job, "json"), encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            if self.store.get(job) is not None:
+                return {"state": "done", "progress": 1.0, "message": ""}
+            return {"state": "unknown", "progress": 0.0, "message": ""}
+
+    def result(self, job):
+
+        """
+            Resultado de um job concluído, ou None.
+        """
+
+        payload = self.store.get(job)
+        return None if payload is None else pickle.loads(payload)
+
+    def cancel(self, job):
+
+        """
+            Solicita o cancelamento do job: os ainda na fila deste worker são retirados
+            dela, e os em execução param no próximo progress.
+        """
+
+        if not job or self.status(job)["state"] in FINISHED:
+            return
+
+        # Sob o lock, para não desfazer uma nova submissão das mesmas entradas
+        with self._lock:
+            with open(self._path(job, "cancel"), "w", encoding="utf-8"):
+                pass
+            futuro = self._futures.get(job)
+        if futuro is not None and futuro.cancel():
+            self._write_status(job, "cancelled")
+            self._remove(job, "cancel")
+
+    def progress(self, job, fraction, message=""):
+
+        """
+            Grava o andamento do job; levanta JobCancelled se o job foi cancelado.
+        """
+
+        if os.path.exists(self._path(job, "cancel")):
+            raise JobCancelled(job)
+        self._write_status(job, "running", fraction, message)
+
+    def run(self, name, job, args):
+
+        """
+            Executa a tarefa no processo atual, gravando o resultado e o estado do job.
+        """
+
+        if os.path.exists(self._path(job, "cancel")):
+            self._write_status(job, "cancelled")
+            self._remove(job, "cancel")
+            return
+
+        token = _current.set((self, job))
+        try:
+            self.progress(job, 0.0)
+            resultado = self._tasks[name](*args)
+            self.store.set(job, pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL))
+            self._write_status(job, "done", 1.0)
+        except JobCancelled:
+            self._write_status(job, "cancelled")
+        except Exception as error:
+            logger.exception("Falha no job %s (%s)", job, name)
+            self._write_status(job, "failed", message=repr(error))
+        finally:
+            _current.reset(token)
+            self._remove(job, "cancel")
+
+    def sweep(self):
+
+        """
+            Remove os estados expirados: os dos jobs concluídos cujo resultado já foi
+            descartado do disco e os demais sem alteração há mais de STATUS_SECONDS.
+        """
+
+        limite = time.time() - STATUS_SECONDS
+        for entry in os.scandir(self.directory):
+            job, _, extensao = entry.name.partition(".")
+            if extensao not in ("json", "cancel"):
+                continue
+            try:
+                expirado = entry.stat().st_mtime < limite
+                if not expirado and extensao == "json":
+                    expirado = self.status(job)["state"] == "done" and not self.store.contains(job)
+                if expirado:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = DiskBackend(os.path.join(self.directory, "results"), self.max_bytes)
+        return self._store
+
+    @staticmethod
+    def job_id(name, args, scope=None):
+        return hashlib.sha1(repr((name, normalize(args), scope)).encode("utf-8")).hexdigest()[:20]
+
+    def start(self):
+
+        """
+            Cria o pool do processo atual e os seus processos. Deve ser chamado antes de
+            o processo iniciar outras threads (ex.: no post_worker_init do gunicorn).
+        """
+
+        if not self.enabled or self._pid == os.getpid():
+            return
+
+        # Um pool por processo: os workers do gunicorn são criados por fork e não podem
+        # reaproveitar o pool do mestre. Com o contexto fork, o pool cria todos os
+        # processos na primeira submissão, então uma tarefa vazia os cria aqui mesmo
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("fork")
+        )
+        pool.submit(int).result()
+
+        with self._lock:
+            self._pid     = os.getpid()
+            self._futures = {}
+            self._pool    = pool
+
+    def _finished(self, job, futuro):
+        with self._lock:
+            if self._futures.get(job) is futuro:
+                del self._futures[job]
+            self._finishes += 1
+            limpar = self._finishes % SWEEP_EVERY == 0
+
+        if limpar:
+            self.sweep()
+
+        # Processo do pool encerrado de forma abrupta (ex.: falta de memória): o pool
+        # fica inutilizável e, como não pode ser recriado com segurança depois que o
+        # worker já tem threads, os jobs seguintes rodam na thread que os submete
+        if not futuro.cancelled() and futuro.exception() is not None:
+            self._write_status(job, "failed", message=repr(futuro.exception()))
+            if isinstance(futuro.exception(), concurrent.futures.process.BrokenProcessPool):
+                logger.error("Pool de processos encerrado; os jobs passam a rodar no próprio worker")
+                with self._lock:
+                    self._pool = None
+
+    def _path(self, job, extension):
+        return os.path.join(self.directory, f"{job}.{extension}")
+
+    def _write_status(self, job, state, fraction=0.0, message=""):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(job, "json")
+        tmp  = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({"state": state, "progress": round(float(fraction), 3), "message": message}, file)
+        os.replace(tmp, path)
+
+    def _remove(self, job, extension):
+        try:
+            os.remove(self._path(job, extension))
+        except FileNotFoundError:
+            pass
+
+
+def _execute(name, job, args):
+
+    # Ponto de entrada nos processos do pool, que herdam do fork a instância do módulo
+    runner.run(name, job, args)
+
+
+def progress(fraction, message=""):
+
+    """
+        Informa o andamento do job em execução (fração entre 0 e 1) e interrompe a
+        tarefa com JobCancelled se o job foi cancelado. Fora de um job não faz nada.
+    """
+
+    atual = _current.get()
+    if atual is not None:
+        atual[0].progress(atual[1], fraction, message)
+
+
+# Instância única do processo
+runner = JobRunner(config.JOBS_DIR, config.JOBS, config.JOBS_DIR_MB * 1024 * 1024)
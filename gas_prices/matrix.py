@@ -0,0 +1,225 @@
+#######################################################################################
+# -= MATRIZ ESTADO x MÊS =-
+#
+# Matriz densa com o preço médio de cada estado em cada mês do calendário, do primeiro
+# ao último mês do dataset. Meses sem pesquisa ficam explicitamente como NaN, então a
+# diferença entre dois estados é uma subtração de linhas alinhada pelo calendário, e
+# a comparação de todos os pares (27 x 27) é uma única operação vetorizada.
+
+import numpy as np
+import pandas as pd
+
+PRICE = "VALOR REVENDA (R$/L)"
+
+# Fronteiras terrestres entre as unidades da federação
+NEIGHBOURS = {
+    "ACRE":                ["AMAZONAS", "RONDONIA"],
+    "ALAGOAS":             ["BAHIA", "PERNAMBUCO", "SERGIPE"],
+    "AMAPA":               ["PARA"],
+    "AMAZONAS":            ["ACRE", "MATO GROSSO", "PARA", "RONDONIA", "RORAIMA"],
+    "BAHIA":               ["ALAGOAS", "ESPIRITO SANTO", "GOIAS", "MINAS GERAIS", "PERNAMBUCO", "PIAUI", "SERGIPE", "TOCANTINS"],
+    "CEARA":               ["PARAIBA", "PERNAMBUCO", "PIAUI", "RIO GRANDE DO NORTE"],
+    "DISTRITO FEDERAL":    ["GOIAS", "MINAS GERAIS"],
+    "ESPIRITO SANTO":      ["BAHIA", "MINAS GERAIS", "RIO DE JANEIRO"],
+    "GOIAS":               ["BAHIA", "DISTRITO FEDERAL", "MATO GROSSO", "MATO GROSSO DO SUL", "MINAS GERAIS", "TOCANTINS"],
+    "MARANHAO":            ["PARA", "PIAUI", "TOCANTINS"],
+    "MATO GROSSO":         ["AMAZONAS", "GOIAS", "MATO GROSSO DO SUL", "PARA", "RONDONIA", "TOCANTINS"],
+    "MATO GROSSO DO SUL":  ["GOIAS", "MATO GROSSO", "MINAS GERAIS", "PARANA", "SAO PAULO"],
+    "MINAS GERAIS":        ["BAHIA", "DISTRITO FEDERAL", "ESPIRITO SANTO", "GOIAS", "MATO GROSSO DO SUL", "RIO DE JANEIRO", "SAO PAULO"],
+    "PARA":                ["AMAPA", "AMAZONAS", "MARANHAO", "MATO GROSSO", "RORAIMA", "TOCANTINS"],
+    "PARAIBA":             ["CEARA", "PERNAMBUCO", "RIO GRANDE DO NORTE"],
+    "PARANA":              ["MATO GROSSO DO SUL", "SANTA CATARINA", "SAO PAULO"],
+    "PERNAMBUCO":          ["ALAGOAS", "BAHIA", "CEARA", "PARAIBA", "PIAUI"],
+    "PIAUI":               ["BAHIA", "CEARA", "MARANHAO", "PERNAMBUCO", "TOCANTINS"],
+    "RIO DE JANEIRO":      ["ESPIRITO SANTO", "MINAS GERAIS", "SAO PAULO"],
+    "RIO GRANDE DO NORTE": ["CEARA", "PARAIBA"],
+    "RIO GRANDE DO SUL":   ["SANTA CATARINA"],
+    "RONDONIA":            ["ACRE", "AMAZONAS", "MATO GROSSO"],
+    "RORAIMA":             ["AMAZONAS", "PARA"],
+    "SANTA CATARINA":      ["PARANA", "RIO GRANDE DO SUL"],
+    "SAO PAULO":           ["MATO GROSSO DO SUL", "MINAS GERAIS", "PARANA", "RIO DE JANEIRO"],
+    "SERGIPE":             ["ALAGOAS", "BAHIA"],
+    "TOCANTINS":           ["BAHIA", "GOIAS", "MARANHAO", "MATO GROSSO", "PARA", "PIAUI"],
+}
+
+
+def cheaper_fraction(diferencas):
+
+    """
+        Fração das diferenças válidas (não NaN) que são negativas; NaN quando não há
+        nenhuma diferença válida.
+    """
+
+    comparaveis = diferencas[~np.isnan(diferencas)]
+    return (comparaveis < 0).mean() if len(comparaveis) else np.nan
+
+
+class PriceMatrix:
+
+    """
+        Preço médio mensal por estado em uma matriz densa estados x meses.
+            - frame: DataFrame pré-processado (ver gas_prices.data.COLUMNS).
+    """
+
+    def __init__(self, frame):
+        datas   = frame["DATA"]
+        estados = pd.Categorical(frame["ESTADO"])
+
+        # Mês de cada linha contado a partir do primeiro mês com dados
+        mes    = (datas.dt.year.to_numpy(dtype="int64") * 12 + datas.dt.month.to_numpy(dtype="int64") - 1)
+        coluna = mes - mes.min()
+
+        # Calendário completo, do primeiro ao último mês com dados
+        calendario  = pd.period_range(datas.min(), datas.max(), freq="M")
+        self.months = calendario.to_timestamp()
+        self.states = pd.Index(estados.categories)
+        self._rows  = {estado: linha for linha, estado in enumerate(self.states)}
+
+        # Médias por (estado, mês) com bincount sobre o índice linear da célula
+        celula  = estados.codes.astype("int64") * len(calendario) + coluna
+        tamanho = len(self.states) * len(calendario)
+
+        soma     = np.bincount(celula, weights=frame[PRICE].to_numpy(dtype="float64"), minlength=tamanho)
+        contagem = np.bincount(celula, minlength=tamanho)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = np.where(contagem > 0, soma / contagem, np.nan)
+
+        self.values = medias.reshape(len(self.states), len(calendario))
+
+    @classmethod
+    def from_values(cls, months, states, values):
+
+        """
+            Matriz montada diretamente a partir de meses, estados e valores já calculados.
+        """
+
+        matrix        = cls.__new__(cls)
+        matrix.months = months
+        matrix.states = states
+        matrix.values = values
+        matrix._rows  = {estado: linha for linha, estado in enumerate(states)}
+        return matrix
+
+    def merge(self, newer):
+
+        """
+            Nova matriz com as colunas de `newer` substituindo as desta matriz. Usada na
+            ingestão incremental: `newer` contém todos os meses dos anos afetados.
+        """
+
+        meses   = pd.date_range(min(self.months[0], newer.months[0]), max(self.months[-1], newer.months[-1]), freq="MS")
+        estados = self.states.union(newer.states)
+        valores = np.full((len(estados), len(meses)), np.nan)
+
+        # Colunas anteriores, exceto o período coberto por `newer`, que é recalculado
+        linhas  = estados.get_indexer(self.states)
+        colunas = meses.get_indexer(self.months)
+        valores[np.ix_(linhas, colunas)] = self.values
+        valores[:, meses.get_indexer([newer.months[0]])[0]:meses.get_indexer([newer.months[-1]])[0] + 1] = np.nan
+
+        linhas  = estados.get_indexer(newer.states)
+        colunas = meses.get_indexer(newer.months)
+        valores[np.ix_(linhas, colunas)] = newer.values
+
+        return PriceMatrix.from_values(meses, estados, valores)
+
+    def month_bounds(self, start=None, end=None):
+
+        """
+            Limites [inicial, final) das colunas dos anos start..end, inclusivos.
+        """
+
+        primeiro = 0 if start is None else self.months.searchsorted(pd.Timestamp(year=int(start), month=1, day=1))
+        ultimo   = len(self.months) if end is None else self.months.searchsorted(pd.Timestamp(year=int(end) + 1, month=1, day=1))
+        return primeiro, max(primeiro, ultimo)
+
+    def frame(self, start=None, end=None):
+
+        """
+            Matriz como DataFrame meses x estados, restrita ao intervalo de anos.
+        """
+
+        primeiro, ultimo = self.month_bounds(start, end)
+        return pd.DataFrame(
+            self.values[:, primeiro:ultimo].T,
+            index=self.months[primeiro:ultimo].rename("DATA"),
+            columns=self.states
+        )
+
+    def difference(self, estado1, estado2, start=None, end=None):
+
+        """
+            Diferença mensal estado1 - estado2, alinhada pelo calendário.
+                - Retorna (meses, diferenças); meses sem dado em algum dos estados são NaN.
+        """
+
+        primeiro, ultimo = self.month_bounds(start, end)
+        return self.months[primeiro:ultimo], self.row(estado1, primeiro, ultimo) - self.row(estado2, primeiro, ultimo)
+
+    def cheaper_share(self, estado1, estado2, start=None, end=None):
+
+        """
+            Fração dos meses (com dado nos dois estados) em que estado1 foi mais barato;
+            NaN quando não há meses comparáveis.
+        """
+
+        return cheaper_fraction(self.difference(estado1, estado2, start, end)[1])
+
+    def row(self, estado, primeiro=0, ultimo=None):
+
+        """
+            Linha do estado entre as colunas [primeiro, ultimo); estados sem pesquisa no
+            produto resultam em uma linha inteira de NaN.
+        """
+
+        if estado not in self._rows:
+            return np.full(len(self.months[primeiro:ultimo]), np.nan)
+        return self.values[self._rows[estado], primeiro:ultimo]
+
+    def pair_summary(self, start=None, end=None):
+
+        """
+            Comparação de todos os pares de estados de uma vez.
+                - cheaper_share: fração dos meses (com dado nos dois) em que o estado da
+                  linha foi mais barato que o da coluna.
+                - mean_difference: diferença média linha - coluna.
+                - months: quantidade de meses comparáveis.
+        """
+
+        primeiro, ultimo = self.month_bounds(start, end)
+        valores = self.values[:, primeiro:ultimo]
+
+        diferencas = valores[:, None, :] - valores[None, :, :]
+        validos    = ~np.isnan(diferencas)
+        meses      = validos.sum(axis=2)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fracao = (diferencas < 0).sum(axis=2) / meses
+            media  = np.where(validos, diferencas, 0.0).sum(axis=2) / meses
+
+        def tabela(valores):
+            return pd.DataFrame(valores, index=self.states, columns=self.states)
+
+        return {"cheaper_share": tabela(fracao), "mean_difference": tabela(media), "months": tabela(meses)}
+
+    def cheapest_neighbours(self, start=None, end=None):
+
+        """
+            Vizinho mais barato de cada estado no intervalo, a partir de uma única
+            comparação de todos os pares: o vizinho de menor preço médio, a diferença
+            média vizinho - estado (negativa quando o vizinho é mais barato) e a fração
+            dos meses em que o vizinho foi mais barato. Estados sem vizinho comparável
+            ficam de fora.
+        """
+
+        resumo = self.pair_summary(start, end)
+        linhas = []
+        for estado in self.states:
+            vizinhos = [vizinho for vizinho in NEIGHBOURS.get(estado, []) if vizinho in self._rows]
+            media    = resumo["mean_difference"].loc[vizinhos, estado].dropna()
+            if media.empty:
+                continue
+            vizinho = media.idxmin()
+            linhas.append((estado, vizinho, media[vizinho], resumo["cheaper_share"].at[vizinho, estado]))
+
+        return pd.DataFrame(linhas, columns=["ESTADO", "VIZINHO", "DIFERENÇA MÉDIA", "FRAÇÃO MAIS BARATO"])
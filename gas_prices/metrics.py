@@ -0,0 +1,317 @@
+#######################################################################################
+# -= MÉTRICAS DOS CALLBACKS =-
+#
+# Cada callback registrado no Dash é envolvido por uma medição do tempo total da
+# chamada (incluindo a serialização da resposta), dividido em fases marcadas dentro do
+# callback com metrics.lap ("pandas" para consultas e agregações, "figure" para a
+# montagem das figuras). O tamanho das requisições e respostas de
+# /_dash-update-component e a contagem de erros completam o quadro. Tudo é exportado
+# no formato texto do Prometheus pela rota /metrics.
+#
+# Opcionalmente (GAS_PRICES_PROFILE_MS), um profiler por amostragem registra a pilha
+# da thread de cada callback em andamento e grava, para as chamadas mais lentas que o
+# limite, as pilhas no formato "collapsed" (uma linha por pilha e contagem), aceito
+# por ferramentas de flame graph.
+
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from gas_prices import config
+
+logger = logging.getLogger(__name__)
+
+# Limites dos histogramas: duração (segundos) e tamanho das respostas (bytes)
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+BYTES_BUCKETS   = [1e3, 1e4, 1e5, 1e6, 1e7]
+
+# Fases da chamada em andamento na thread/contexto atual
+_laps = contextvars.ContextVar("laps", default=None)
+
+
+class Histogram:
+
+    """
+        Histograma cumulativo no formato do Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value):
+        self.sum   += value
+        self.count += 1
+        for posicao, limite in enumerate(self.buckets):
+            if value <= limite:
+                self.counts[posicao] += 1
+
+    def lines(self, name, labels):
+        linhas = []
+        for limite, contagem in zip(self.buckets, self.counts):
+            linhas.append(f'{name}_bucket{{{labels},le="{limite:g}"}} {contagem}')
+        linhas.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        linhas.append(f"{name}_sum{{{labels}}} {round(self.sum, 6)}")
+        linhas.append(f"{name}_count{{{labels}}} {self.count}")
+        return linhas
+
+
+class SamplingProfiler:
+
+    """
+        Profiler por amostragem das threads que estão executando callbacks.
+            - threshold_ms: duração a partir da qual o perfil da chamada é gravado.
+            - directory: diretório dos perfis gravados.
+            - interval: intervalo entre amostras, em segundos.
+    """
+
+    def __init__(self, threshold_ms, directory, interval=0.005):
+        self.threshold_ms = threshold_ms
+        self.directory    = directory
+        self.interval     = interval
+        self._active      = {}
+        self._lock        = threading.Lock()
+        self._pid         = None
+
+    def begin(self):
+        self._ensure_thread()
+        amostras = Counter()
+        with self._lock:
+            self._active[threading.get_ident()] = amostras
+        return amostras
+
+    def end(self, name, elapsed, amostras):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+        if elapsed * 1000 < self.threshold_ms or not amostras:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{elapsed * 1000:.0f}ms.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            for pilha, contagem in amostras.most_common():
+                file.write(f"{pilha} {contagem}\n")
+        logger.warning("Callback %s levou %.0f ms; perfil gravado em %s", name, elapsed * 1000, path)
+        return path
+
+    def _ensure_thread(self):
+
+        # Uma thread de amostragem por processo (os workers do gunicorn são criados por fork)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._sample, name="callback-profiler", daemon=True).start()
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                ativos = list(self._active.items())
+            if not ativos:
+                continue
+
+            frames = sys._current_frames()
+            for ident, amostras in ativos:
+                frame = frames.get(ident)
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if pilha:
+                    amostras[";".join(reversed(pilha))] += 1
+
+
+class Metrics:
+
+    """
+        Métricas por callback do processo.
+            - profiler: SamplingProfiler opcional para as chamadas lentas.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler  = profiler
+        self._lock     = threading.Lock()
+        self._calls    = Counter()
+        self._errors   = Counter()
+        self._phases   = defaultdict(float)
+        self._seconds  = defaultdict(lambda: Histogram(SECONDS_BUCKETS))
+        self._requests = Counter()
+        self._response = defaultdict(lambda: Histogram(BYTES_BUCKETS))
+        self._gauges   = []
+        self._extra    = []
+
+    def lap(self, phase):
+
+        """
+            Atribui à fase o tempo decorrido desde a marca anterior (ou o início do
+            callback). Fora de um callback instrumentado não faz nada.
+        """
+
+        laps = _laps.get()
+        if laps is None:
+            return
+
+        agora = time.perf_counter()
+        laps["phases"][phase] = laps["phases"].get(phase, 0.0) + agora - laps["last"]
+        laps["last"] = agora
+
+    def wrap(self, name, func):
+
+        """
+            Envolve a função de um callback com a medição de tempo, fases e erros.
+        """
+
+        from dash.exceptions import PreventUpdate
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio   = time.perf_counter()
+            token    = _laps.set({"last": inicio, "phases": {}})
+            amostras = self.profiler.begin() if self.profiler else None
+            erro     = False
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                erro = True
+                raise
+            finally:
+                total = time.perf_counter() - inicio
+                fases = _laps.get()["phases"]
+                _laps.reset(token)
+
+                fases["other"] = max(total - sum(fases.values()), 0.0)
+                self.record(name, total, fases, erro)
+                if amostras is not None:
+                    self.profiler.end(name, total, amostras)
+
+        return wrapper
+
+    def record(self, name, seconds, phases, error=False):
+        with self._lock:
+            self._calls[name] += 1
+            self._seconds[name].observe(seconds)
+            for phase, valor in phases.items():
+                self._phases[(name, phase)] += valor
+            if error:
+                self._errors[name] += 1
+
+    def record_payload(self, name, request_bytes, response_bytes):
+        with self._lock:
+            self._requests[name] += request_bytes
+            self._response[name].observe(response_bytes)
+
+    def gauge(self, name, help_text, func):
+
+        """
+            Registra um valor calculado no momento da exportação (ex.: tamanho do cache).
+        """
+
+        self._gauges.append((name, help_text, func))
+
+    def collect(self, func):
+
+        """
+            Registra uma função que devolve linhas prontas no formato do Prometheus,
+            acrescentadas na exportação (ex.: contagens com rótulos de outro módulo).
+        """
+
+        self._extra.append(func)
+
+    def instrument(self, app):
+
+        """
+            Instrumenta todos os callbacks do servidor registrados no app Dash e os
+            tamanhos das requisições de /_dash-update-component.
+        """
+
+        from flask import request
+
+        nomes = {}
+        for output, entrada in app.callback_map.items():
+            if "callback" not in entrada:
+                continue
+            nome = entrada["callback"].__name__
+            entrada["callback"] = self.wrap(nome, entrada["callback"])
+            nomes[output] = nome
+
+        @app.server.after_request
+        def payload(response):
+            if request.path.endswith("/_dash-update-component") and response.status_code == 200:
+                corpo = request.get_json(silent=True) or {}
+                nome  = nomes.get(corpo.get("output"), "unknown")
+                self.record_payload(nome, request.content_length or 0, response.calculate_content_length() or 0)
+            return response
+
+    def render(self):
+
+        """
+            Métricas no formato texto do Prometheus.
+        """
+
+        with self._lock:
+            linhas = []
+
+            def cabecalho(name, kind, help_text):
+                linhas.append(f"# HELP {name} {help_text}")
+                linhas.append(f"# TYPE {name} {kind}")
+
+            cabecalho("gas_prices_callback_calls_total", "counter", "Chamadas de cada callback.")
+            for nome, valor in sorted(self._calls.items()):
+                linhas.append(f'gas_prices_callback_calls_total{{callback="{nome}"}} {valor}')
+
+            cabecalho("gas_prices_callback_errors_total", "counter", "Chamadas de cada callback que terminaram em erro.")
+            for nome in sorted(self._calls):
+                linhas.append(f'gas_prices_callback_errors_total{{callback="{nome}"}} {self._errors[nome]}')
+
+            cabecalho("gas_prices_callback_seconds", "histogram", "Duração total das chamadas, incluindo a serialização.")
+            for nome, histograma in sorted(self._seconds.items()):
+                linhas.extend(histograma.lines("gas_prices_callback_seconds", f'callback="{nome}"'))
+
+            cabecalho("gas_prices_callback_phase_seconds_total", "counter", "Tempo por fase (pandas, figure, other).")
+            for (nome, fase), valor in sorted(self._phases.items()):
+                linhas.append(f'gas_prices_callback_phase_seconds_total{{callback="{nome}",phase="{fase}"}} {valor:.6f}')
+
+            cabecalho("gas_prices_callback_request_bytes_total", "counter", "Bytes recebidos nas requisições de cada callback.")
+            for nome, valor in sorted(self._requests.items()):
+                linhas.append(f'gas_prices_callback_request_bytes_total{{callback="{nome}"}} {valor}')
+
+            cabecalho("gas_prices_callback_response_bytes", "histogram", "Tamanho das respostas de cada callback.")
+            for nome, histograma in sorted(self._response.items()):
+                linhas.extend(histograma.lines("gas_prices_callback_response_bytes", f'callback="{nome}"'))
+
+        for name, help_text, func in self._gauges:
+            cabecalho(name, "gauge", help_text)
+            linhas.append(f"{name} {func()}")
+
+        for func in self._extra:
+            linhas.extend(func())
+
+        return "\n".join(linhas) + "\n"
+
+
+def build_metrics():
+
+    """
+        Instancia as métricas conforme as configurações do ambiente.
+    """
+
+    profiler = SamplingProfiler(config.PROFILE_MS, config.PROFILE_DIR) if config.PROFILE_MS else None
+    return Metrics(profiler)
+
+
+# Instância única compartilhada pelos callbacks do processo
+metrics = build_metrics()
@@ -0,0 +1,180 @@
+#######################################################################################
+# -= PRÉ-AQUECIMENTO DO CACHE DE FIGURAS =-
+#
+# O espaço de entradas dos callbacks é pequeno e conhecido de antemão: anos e regiões
+# dos gráficos de barras, estados dos cards, pares de estados da comparação direta e
+# indicadores do ranking semanal. O gráfico dos indicadores semanais, cuja seleção de
+# estados e regiões é livre, fica de fora.
+# Este job enumera todas as combinações das versões correntes dos produtos, renderiza
+# as respostas em paralelo (um processo por núcleo) e as grava no cache de figuras em
+# disco (GAS_PRICES_CACHE_DIR), que os workers do app consultam antes de calcular.
+# Rodando após um deploy ou uma ingestão, os primeiros usuários já encontram as
+# figuras prontas.
+#
+# O tema não entra na enumeração: o template é aplicado no navegador e as respostas do
+# servidor são as mesmas para os dois temas.
+#
+#     python -m gas_prices.prewarm --cache-dir /var/cache/gas-prices
+#     python -m gas_prices.prewarm --products "GASOLINA COMUM" "ETANOL HIDRATADO" --range 2004 2021
+
+import argparse
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+from gas_prices import config
+
+
+def combinations(key, fixed_key):
+
+    """
+        Entradas de cada callback para uma versão de um produto.
+            - key: chave do dcc.Store "dataset" (com o intervalo de anos do RangeSlider).
+            - fixed_key: chave do dcc.Store "dataset_fixed" (sem intervalo).
+        Os valores são os mesmos das opções dos dropdowns do layout.
+    """
+
+    from app import weekly_metrics
+    from gas_prices.registry import registry
+
+    dados   = registry.frame(fixed_key)
+    anos    = [int(ano) for ano in dados["ANO"].unique()]
+    regioes = [str(regiao) for regiao in dados["REGIÃO"].unique()]
+    estados = [str(estado) for estado in dados["ESTADO"].unique()]
+
+    return (
+        [("graph1", (fixed_key, ano, regiao)) for ano, regiao in itertools.product(anos, regioes)]
+        + [(name, (key, estado)) for name in ("card1", "card2") for estado in estados]
+        + [("direct_comparison", (key, est1, est2)) for est1, est2 in itertools.product(estados, estados)]
+        + [("ranking", (key, indicador)) for indicador in weekly_metrics]
+    )
+
+
+def render(tarefas):
+
+    """
+        Renderiza um lote de combinações no processo atual, gravando-as no cache.
+            - tarefas: lista de (callback, entradas).
+        Retorna a contagem de figuras renderizadas por callback.
+    """
+
+    import app
+    from gas_prices.cache import figure_cache, normalize, plain
+
+    # Chamando a função original (sem o decorador do cache), já que com --force as
+    # entradas presentes no cache também são recalculadas
+    contagem = Counter()
+    for name, args in tarefas:
+        func = getattr(app, name).__wrapped__
+        figure_cache.set((name, normalize(args)), plain(func(*args)))
+        contagem[name] += 1
+    return contagem
+
+
+def pending(tarefas, force=False):
+
+    """
+        Combinações ainda ausentes do cache em disco (todas, com force).
+    """
+
+    from gas_prices.cache import figure_cache, normalize
+
+    if force:
+        return tarefas
+    return [(name, args) for name, args in tarefas if figure_cache.backend.get((name, normalize(args))) is None]
+
+
+def prewarm(products, ranges, workers, force=False, batch=32):
+
+    """
+        Pré-aquece o cache de figuras em disco.
+            - products: produtos a enumerar.
+            - ranges: intervalos de anos do RangeSlider; None é o intervalo inicial do
+              painel (sem restrição).
+            - workers: processos usados na renderização.
+            - force: renderiza também as combinações já presentes no cache.
+            - batch: combinações por lote enviado a cada processo.
+        Retorna (combinações enumeradas, contagem de renderizadas por callback).
+    """
+
+    # Callbacks do app importados antes do fork, para que os processos os herdem
+    import app
+    from gas_prices.cache import normalize
+    from gas_prices.registry import registry
+
+    # Carregando os produtos antes de criar os processos, que herdam os dados do fork
+    registry.max_products = max(registry.max_products or 0, len(products))
+    tarefas = []
+    for produto in products:
+        fixa = registry.key(product=produto)
+        for faixa in ranges:
+            chave = fixa if faixa is None else registry.key(fixa["version"], *faixa, product=produto)
+            tarefas.extend(combinations(chave, fixa))
+
+    # A mesma entrada pode se repetir entre intervalos (ex.: graph1 usa a chave fixa)
+    tarefas  = list({(name, normalize(args)): (name, args) for name, args in tarefas}.values())
+    faltando = pending(tarefas, force)
+
+    lotes    = [faltando[inicio:inicio + batch] for inicio in range(0, len(faltando), batch)]
+    contagem = Counter()
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+            for parcial in pool.map(render, lotes):
+                contagem.update(parcial)
+    else:
+        for lote in lotes:
+            contagem.update(render(lote))
+
+    return len(tarefas), contagem
+
+
+def main(argv=None):
+
+    """
+        Linha de comando do pré-aquecimento do cache de figuras.
+    """
+
+    from gas_prices.data import list_products
+
+    parser = argparse.ArgumentParser(description="Renderiza todas as combinações dos dropdowns no cache de figuras em disco.")
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR, help="diretório do cache compartilhado (GAS_PRICES_CACHE_DIR)")
+    parser.add_argument("--products", nargs="+", help="produtos a enumerar (padrão: o produto inicial do painel)")
+    parser.add_argument("--all-products", action="store_true", help="enumera todos os produtos do catálogo")
+    parser.add_argument("--range", nargs=2, type=int, action="append", metavar=("INICIO", "FIM"),
+                        help="intervalo de anos do RangeSlider, além do inicial (pode ser repetido)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos de renderização")
+    parser.add_argument("--force", action="store_true", help="renderiza também as combinações já em cache")
+    args = parser.parse_args(argv)
+
+    if not args.cache_dir:
+        parser.error("informe --cache-dir ou GAS_PRICES_CACHE_DIR: o cache em memória não sobrevive ao job")
+
+    # O cache em disco e a recarga são configurados na importação do app, feita depois
+    config.CACHE_DIR      = args.cache_dir
+    config.RELOAD_SECONDS = 0
+
+    produtos = list_products() if args.all_products else (args.products or [config.PRODUCT])
+    faixas   = [None] + [tuple(faixa) for faixa in args.range or []]
+
+    inicio = time.perf_counter()
+    total, contagem = prewarm(produtos, faixas, max(args.workers or 1, 1), args.force)
+    tempo  = time.perf_counter() - inicio
+
+    renderizadas = sum(contagem.values())
+    for name, quantidade in sorted(contagem.items()):
+        print(f"{name:<20}{quantidade:>8} figuras")
+    print(f"{renderizadas} de {total} combinações renderizadas ({total - renderizadas} já em cache) "
+          f"em {tempo:.1f}s ({renderizadas / max(tempo, 1e-9):.0f}/s) com {args.workers} processos")
+
+    # O cache descarta as entradas mais antigas além do limite: o diretório precisa
+    # comportar todas as combinações para que nenhuma seja perdida
+    ocupado = sum(entry.stat().st_size for entry in os.scandir(args.cache_dir) if entry.name.endswith(".pkl"))
+    print(f"Cache em disco: {ocupado / 1024 / 1024:.1f} MB de {config.CACHE_DIR_MB} MB (GAS_PRICES_CACHE_DIR_MB)")
+
+
+if __name__ == "__main__":
+    main()
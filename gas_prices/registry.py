@@ -0,0 +1,339 @@
+#######################################################################################
+# -= REGISTRO DE DATASETS NO SERVIDOR =-
+#
+# Os componentes dcc.Store guardam apenas uma chave pequena (produto, versão do dataset
+# e intervalo de anos ativo). Os callbacks resolvem essa chave para o DataFrame que já
+# está em memória no processo, sem trafegar os dados pelo navegador. Junto de cada
+# versão ficam o cubo de agregados e o índice temporal usados pelos callbacks.
+#
+# Cada produto é uma partição carregada apenas no primeiro uso e mantida em um LRU,
+# de modo que a memória do processo acompanha os produtos efetivamente consultados.
+#
+# Uma thread de fundo (ver DatasetRegistry.watch) verifica periodicamente se a
+# ingestão publicou uma nova geração do snapshot. A nova versão é montada fora do lock
+# (reaproveitando o cubo anterior quando a geração é uma extensão incremental) e
+# trocada atomicamente; requisições em andamento continuam com a versão anterior, que
+# é mantida até a troca seguinte.
+#
+# O módulo não importa pandas/numpy no topo: o app o importa antes de o servidor subir
+# e essas dependências só são necessárias na primeira carga de dados, que acontece em
+# segundo plano (ver gas_prices.startup).
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from gas_prices import config
+
+logger = logging.getLogger(__name__)
+
+
+def load_product(product):
+
+    """
+        Carga padrão de um produto (snapshot ou CSV), ver gas_prices.data.load_data.
+    """
+
+    from gas_prices.data import load_data
+    return load_data(product)
+
+
+def product_generation(product):
+
+    """
+        Geração do snapshot do produto em disco, ver gas_prices.data.snapshot_generation.
+    """
+
+    from gas_prices.data import snapshot_generation
+    return snapshot_generation(product)
+
+
+def fingerprint(frame):
+
+    """
+        Gera uma versão determinística para o DataFrame a partir do seu conteúdo.
+            - frame: DataFrame já pré-processado.
+    """
+
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(frame, index=False).values
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:12]
+
+
+class Dataset:
+
+    """
+        Versão publicada de um produto: DataFrame, cubo de agregados e índice temporal.
+            - previous: versão anterior do produto; quando o DataFrame é uma extensão
+              incremental dela, apenas os anos afetados do cubo são recalculados.
+    """
+
+    def __init__(self, product, version, frame, previous=None):
+        from gas_prices.cube import AggregateCube
+        from gas_prices.index import TimeIndex
+
+        origem = frame.attrs.get("snapshot") or {}
+
+        self.product    = product
+        self.version    = version
+        self.frame      = frame
+        self.generation = origem.get("generation")
+        self.index      = TimeIndex(frame)
+
+        base = origem.get("base")
+        if previous is not None and base and base["generation"] == previous.generation:
+            anos = frame["ANO"].iloc[base["rows"]:].unique()
+            if len(anos) == 0:
+                self.cube = previous.cube
+            else:
+                primeiro, ultimo = self.index.year_bounds(anos.min(), anos.max())
+                self.cube = AggregateCube.extend(previous.cube, frame.iloc[primeiro:ultimo], anos.tolist())
+        else:
+            self.cube = AggregateCube(frame)
+
+
+class DatasetRegistry:
+
+    """
+        Registro em processo dos datasets publicados, indexados pela versão.
+            - loader: função produto -> DataFrame, usada na primeira consulta ao produto.
+            - max_products: quantidade de produtos mantidos em memória (LRU).
+            - probe: função produto -> geração disponível em disco, para recarga a quente.
+            - reload_seconds: intervalo entre verificações de nova geração (0 desativa).
+    """
+
+    def __init__(self, loader=None, max_products=None, probe=None, reload_seconds=0):
+        self.loader         = loader
+        self.max_products   = max_products
+        self.probe          = probe
+        self.reload_seconds = reload_seconds
+        self._lock          = threading.Lock()
+        self._load_lock     = threading.Lock()
+        self._datasets      = {}
+        self._products      = OrderedDict()
+        self._watcher_pid   = None
+
+    def current(self, product=config.PRODUCT):
+
+        """
+            Versão corrente do produto, carregando a partição se necessário.
+        """
+
+        with self._lock:
+            if product in self._products:
+                self._products.move_to_end(product)
+                return self._products[product]
+
+        # Carregando fora do lock principal; o lock de carga evita cargas duplicadas
+        with self._load_lock:
+            with self._lock:
+                if product in self._products:
+                    return self._products[product]
+            return self.publish(self.loader(product), product)
+
+    def loaded(self):
+
+        """
+            Produtos atualmente em memória, do menos ao mais recentemente usado.
+        """
+
+        with self._lock:
+            return list(self._products)
+
+    def publish(self, frame, product=config.PRODUCT):
+
+        """
+            Registra o DataFrame, materializa seu cubo de agregados e o torna a versão
+            corrente do produto.
+                - frame: DataFrame já pré-processado, com a coluna ANO inteira.
+                - product: produto ao qual o DataFrame pertence.
+        """
+
+        from gas_prices.index import TimeIndex
+
+        # O índice temporal depende da ordenação por DATA
+        if not TimeIndex.is_sorted(frame):
+            frame = frame.sort_values(by="DATA", kind="mergesort").reset_index(drop=True)
+
+        with self._lock:
+            anterior = self._datasets.get(self._products.get(product))
+
+        dataset = Dataset(product, fingerprint(frame), frame, previous=anterior)
+        with self._lock:
+            self._datasets[dataset.version] = dataset
+            self._products[product] = dataset.version
+            self._products.move_to_end(product)
+
+            # Mantendo, de cada produto, apenas a versão corrente e a imediatamente anterior
+            manter = {dataset.version, anterior.version if anterior else None}
+            for version in [v for v, d in self._datasets.items() if d.product == product and v not in manter]:
+                del self._datasets[version]
+
+            # Descartando os produtos menos usados recentemente
+            while self.max_products and len(self._products) > self.max_products:
+                evicted, _ = self._products.popitem(last=False)
+                for version in [v for v, d in self._datasets.items() if d.product == evicted]:
+                    del self._datasets[version]
+
+        return dataset.version
+
+    def key(self, version=None, start=None, end=None, product=config.PRODUCT):
+
+        """
+            Monta a chave armazenada no dcc.Store.
+                - version: versão do dataset (padrão: a corrente do produto).
+                - start, end: anos inicial e final (inclusivos) do intervalo ativo.
+                - product: produto selecionado.
+        """
+
+        year_range = None if start is None or end is None else [int(start), int(end)]
+        return {"product": product, "version": version or self.current(product), "range": year_range}
+
+    def dataset(self, key):
+
+        """
+            Dataset referenciado pela chave. Versões desconhecidas (ex.: após um restart
+            do servidor ou o descarte do produto) resolvem para a versão corrente do
+            produto.
+        """
+
+        key = key or {}
+        with self._lock:
+            dataset = self._datasets.get(key.get("version"))
+        if dataset is not None:
+            return dataset
+
+        version = self.current(key.get("product") or config.PRODUCT)
+        with self._lock:
+            return self._datasets[version]
+
+    def canonical(self, key):
+
+        """
+            Chave com a versão que efetivamente a resolve. Uma chave de versão
+            desconhecida é servida com a versão corrente, então caches indexados pela
+            chave devem usar esta forma para não associar a versão antiga aos dados novos.
+        """
+
+        versao = self.dataset(key).version
+        return key if key.get("version") == versao else {**key, "version": versao}
+
+    def frame(self, key):
+
+        """
+            DataFrame completo da versão referenciada pela chave do dcc.Store.
+        """
+
+        return self.dataset(key).frame
+
+    def cube(self, key):
+
+        """
+            Cubo de agregados da versão referenciada pela chave do dcc.Store.
+        """
+
+        return self.dataset(key).cube
+
+    def index(self, key):
+
+        """
+            Índice temporal da versão referenciada pela chave do dcc.Store.
+        """
+
+        return self.dataset(key).index
+
+    @staticmethod
+    def years(key):
+
+        """
+            Intervalo de anos (inicial, final) da chave; None indica sem limite.
+        """
+
+        year_range = (key or {}).get("range")
+        return tuple(year_range) if year_range else (None, None)
+
+    def resolve(self, key, start=None, end=None):
+
+        """
+            Resolve uma chave de dcc.Store para o DataFrame correspondente.
+                - key: dicionário gerado por DatasetRegistry.key.
+                - start, end: datas (inclusivas) que restringem ainda mais o resultado,
+                  como a faixa visível de um gráfico com zoom.
+            O intervalo de anos vira um par de limites de linhas (busca binária no índice
+            temporal) e o resultado é uma fatia sem cópia do DataFrame compartilhado, que
+            não deve ser alterada.
+        """
+
+        dataset = self.dataset(key)
+
+        # Aplicando o intervalo de anos, inclusivo nas duas pontas
+        inicio, fim = self.years(key)
+        if inicio is None and fim is None and start is None and end is None:
+            return dataset.frame
+
+        primeiro, ultimo = dataset.index.year_bounds(inicio, fim)
+
+        # Aplicando o intervalo de datas sobre o de anos
+        if start is not None or end is not None:
+            data_inicial, data_final = dataset.index.date_bounds(start, end)
+            primeiro = max(primeiro, data_inicial)
+            ultimo   = max(primeiro, min(ultimo, data_final))
+
+        return dataset.frame.iloc[primeiro:ultimo]
+
+    def refresh(self):
+
+        """
+            Recarrega os produtos em memória cuja geração em disco mudou.
+                - Retorna a lista de produtos atualizados.
+        """
+
+        atualizados = []
+        for product in self.loaded():
+            with self._lock:
+                atual = self._datasets.get(self._products.get(product))
+            if atual is None or self.probe(product) in (None, atual.generation):
+                continue
+
+            with self._load_lock:
+                self.publish(self.loader(product), product)
+            atualizados.append(product)
+            logger.info("Produto %s atualizado para a geração %s", product, self.probe(product))
+
+        return atualizados
+
+    def watch(self):
+
+        """
+            Inicia a thread de recarga no processo atual. A verificação do pid faz com que
+            cada worker do gunicorn (criado por fork) tenha a sua própria thread; o app a
+            inicia na primeira requisição, de modo que o mestre, que carrega os dados
+            antes do fork, não tem nenhuma thread ao criar os workers.
+        """
+
+        if not self.reload_seconds or not self.probe or self._watcher_pid == os.getpid():
+            return
+
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="dataset-reload", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_seconds)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Falha ao recarregar os datasets")
+
+
+# Instância única compartilhada pelos callbacks do processo
+registry = DatasetRegistry(
+    loader=load_product,
+    max_products=config.PRODUCTS_LRU,
+    probe=product_generation,
+    reload_seconds=config.RELOAD_SECONDS
+)
@@ -0,0 +1,194 @@
+#######################################################################################
+# -= SERIALIZAÇÃO E COMPRESSÃO DAS RESPOSTAS =-
+#
+# As respostas dos callbacks são figuras com séries de preços. Três etapas reduzem o
+# custo de levá-las ao navegador:
+#
+#   - motor JSON: o plotly serializa arrays do numpy diretamente com o orjson, quando
+#     instalado, em vez de convertê-los em listas de objetos Python;
+#   - precisão: os valores das séries são arredondados às casas decimais da pesquisa
+#     da ANP (os preços float32 viram, sem isso, textos como 4.123000144958496);
+#   - compressão: respostas JSON, HTML, CSS e JavaScript são comprimidas com brotli
+#     (se instalado) ou gzip, conforme o Accept-Encoding do navegador.
+#
+# O orjson e o brotli são opcionais; sem eles o painel usa o json da biblioteca padrão
+# e o gzip.
+
+import gzip
+import threading
+from collections import OrderedDict
+
+from gas_prices import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Atributos dos traços com as séries numéricas arredondadas por trim
+TRACE_ARRAYS = ("x", "y", "z")
+
+# Tipos de conteúdo comprimidos (imagens e fontes já são comprimidas)
+COMPRESSIBLE = ("application/json", "application/javascript", "text/")
+
+# Níveis de compressão: respostas dinâmicas priorizam a velocidade; arquivos estáticos
+# (com ETag ou cache no navegador) são comprimidos uma vez só e guardados, então usam o
+# nível máximo
+GZIP_LEVEL          = 6
+BROTLI_QUALITY      = 5
+STATIC_GZIP_LEVEL   = 9
+STATIC_BROTLI_LEVEL = 11
+
+
+def configure(engine=None):
+
+    """
+        Define o motor JSON usado pelo plotly (e, portanto, pelo Dash).
+            - engine: "json", "orjson" ou "auto" (orjson quando instalado).
+    """
+
+    import plotly.io as pio
+
+    pio.json.config.default_engine = engine or config.JSON_ENGINE
+    return pio.json.config.default_engine
+
+
+def trim(figure, decimals=None):
+
+    """
+        Arredonda as séries numéricas dos traços de uma figura já convertida em
+        dicionário. A figura é alterada e devolvida.
+            - decimals: casas decimais mantidas (padrão: GAS_PRICES_PRECISION).
+    """
+
+    import numpy as np
+
+    decimals = config.PRECISION if decimals is None else decimals
+    for trace in figure.get("data", ()):
+        for attr in TRACE_ARRAYS:
+            valores = trace.get(attr)
+            if isinstance(valores, np.ndarray) and valores.dtype.kind == "f":
+                trace[attr] = np.round(valores.astype("float64"), decimals)
+            elif isinstance(valores, (list, tuple)) and valores and all(isinstance(valor, float) for valor in valores):
+                trace[attr] = [round(valor, decimals) for valor in valores]
+    return figure
+
+
+def negotiate(accept_encoding):
+
+    """
+        Codificação escolhida a partir do cabeçalho Accept-Encoding: "br", "gzip" ou
+        None. Codificações com q=0 são recusadas pelo navegador.
+    """
+
+    aceitas = {}
+    for item in (accept_encoding or "").split(","):
+        nome, _, parametros = item.strip().partition(";")
+        peso = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                peso = float(parametros.strip()[2:])
+            except ValueError:
+                peso = 0.0
+        aceitas[nome.strip().lower()] = peso
+
+    if brotli is not None and aceitas.get("br", 0) > 0:
+        return "br"
+    if aceitas.get("gzip", 0) > 0 or aceitas.get("*", 0) > 0:
+        return "gzip"
+    return None
+
+
+def encode(body, encoding, static=False):
+
+    """
+        Comprime o corpo de uma resposta na codificação informada.
+            - static: usa o nível máximo de compressão (arquivos estáticos).
+    """
+
+    if encoding == "br":
+        return brotli.compress(body, quality=STATIC_BROTLI_LEVEL if static else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+class Compressor:
+
+    """
+        Compressão das respostas do servidor Flask, negociada pelo Accept-Encoding.
+            - minimum: tamanho mínimo, em bytes, das respostas comprimidas.
+            - static_entries: quantidade de arquivos estáticos comprimidos guardados.
+    """
+
+    def __init__(self, minimum, static_entries=64):
+        self.minimum        = minimum
+        self.static_entries = static_entries
+        self._static        = OrderedDict()
+        self._lock          = threading.Lock()
+        self._input         = 0
+        self._output        = 0
+
+    def apply(self, request, response):
+
+        """
+            Comprime a resposta, quando possível, e devolve a mesma resposta.
+        """
+
+        if (response.status_code != 200 or response.direct_passthrough
+                or "Content-Encoding" in response.headers
+                or not (response.mimetype or "").startswith(COMPRESSIBLE)):
+            return response
+
+        # A resposta varia conforme o Accept-Encoding, mesmo quando não é comprimida
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        corpo    = response.get_data()
+        if encoding is None or len(corpo) < self.minimum:
+            return response
+
+        # Arquivos estáticos do Dash (com ETag, ou com versão na URL e cache de longa
+        # duração no navegador) não mudam: são comprimidos uma única vez
+        etag = response.get_etag()[0]
+        if etag or response.cache_control.max_age:
+            chave = (request.full_path, etag, encoding)
+            with self._lock:
+                comprimido = self._static.get(chave)
+                if comprimido is not None:
+                    self._static.move_to_end(chave)
+            if comprimido is None:
+                comprimido = encode(corpo, encoding, static=True)
+                with self._lock:
+                    self._static[chave] = comprimido
+                    while len(self._static) > self.static_entries:
+                        self._static.popitem(last=False)
+        else:
+            comprimido = encode(corpo, encoding)
+
+        response.set_data(comprimido)
+        response.headers["Content-Encoding"] = encoding
+
+        with self._lock:
+            self._input  += len(corpo)
+            self._output += len(comprimido)
+        return response
+
+    def install(self, server):
+
+        """
+            Registra a compressão como after_request do servidor Flask. O Flask executa
+            esses hooks na ordem inversa do registro: hooks registrados depois deste
+            (ex.: a medição do tamanho das respostas) recebem a resposta sem compressão.
+        """
+
+        from flask import request
+
+        @server.after_request
+        def compress(response):
+            return self.apply(request, response)
+
+    def stats(self):
+        with self._lock:
+            return {"input_bytes": self._input, "output_bytes": self._output, "static_entries": len(self._static)}
+
+
+# Instância única do processo
+compressor = Compressor(config.COMPRESS_MIN_BYTES)
@@ -0,0 +1,260 @@
+#######################################################################################
+# -= SNAPSHOT COLUNAR DOS DADOS =-
+#
+# O CSV da ANP é convertido uma única vez em um diretório por produto (partição), com
+# um arquivo .npy por coluna e um cabeçalho meta.json (versão do esquema, tipos e
+# categorias). O catálogo products.json lista os produtos disponíveis. A carga abre
+# os arquivos via memory-map, sem parsing, e leva poucos milissegundos.
+#
+# Cada partição guarda gerações imutáveis (g000001, g000002, ...) e um arquivo CURRENT
+# com o nome da geração ativa. Uma nova geração é gravada ao lado das anteriores e
+# publicada com a troca atômica do CURRENT, então os processos em execução nunca leem
+# uma partição pela metade e podem detectar a nova versão apenas lendo o CURRENT.
+#
+#     python -m gas_prices.snapshot --source data_gas.csv --out data/snapshot
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from gas_prices import config
+
+# Versão do formato. Incrementar sempre que o pré-processamento ou o layout mudar.
+SCHEMA_VERSION = 4
+
+META_FILE      = "meta.json"
+CATALOGUE_FILE = "products.json"
+CURRENT_FILE   = "CURRENT"
+
+# Gerações mantidas em disco por partição (a corrente e as anteriores mais recentes)
+KEEP_GENERATIONS = 2
+
+
+class StaleSnapshotError(Exception):
+
+    """
+        Snapshot gerado com uma versão de esquema diferente da atual.
+    """
+
+
+def generation(path):
+
+    """
+        Nome da geração ativa da partição, ou None quando ela não existe.
+    """
+
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def exists(path):
+    current = generation(path)
+    return current is not None and os.path.isfile(os.path.join(path, current, META_FILE))
+
+
+def exists_catalogue(path):
+    return os.path.isfile(os.path.join(path, CATALOGUE_FILE))
+
+
+def partition_path(path, product):
+
+    """
+        Diretório da partição de um produto (ex.: "GASOLINA COMUM" -> gasolina-comum).
+    """
+
+    ascii_name = unicodedata.normalize("NFKD", product).encode("ascii", "ignore").decode()
+    return os.path.join(path, re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-"))
+
+
+def read_catalogue(path):
+    with open(os.path.join(path, CATALOGUE_FILE), encoding="utf-8") as file:
+        return json.load(file)["products"]
+
+
+def write_catalogue(path, products):
+    tmp = os.path.join(path, f"{CATALOGUE_FILE}.tmp-{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as file:
+        json.dump({"schema": SCHEMA_VERSION, "products": list(products)}, file, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(path, CATALOGUE_FILE))
+
+
+def read_meta(path, compact=None):
+
+    """
+        Lê e valida o cabeçalho do snapshot.
+            - path: diretório do snapshot.
+            - compact: representação esperada (None aceita qualquer uma).
+    """
+
+    with open(os.path.join(path, generation(path), META_FILE), encoding="utf-8") as file:
+        meta = json.load(file)
+
+    if meta.get("schema") != SCHEMA_VERSION:
+        raise StaleSnapshotError(
+            f"{path} usa o esquema {meta.get('schema')}, esperado {SCHEMA_VERSION}"
+        )
+    if compact is not None and meta.get("compact") != compact:
+        raise StaleSnapshotError(f"{path} não está na representação compact={compact}")
+    return meta
+
+
+def write(frame, path, source=None, compact=config.COMPACT, product=None, base=None):
+
+    """
+        Grava o DataFrame como uma nova geração da partição e a torna a ativa.
+            - frame: DataFrame já pré-processado.
+            - path: diretório da partição.
+            - source: origem dos dados, registrada no cabeçalho.
+            - compact: indica se o frame está na representação compacta.
+            - product: produto da partição, registrado no cabeçalho.
+            - base: para ingestões incrementais, {"generation", "rows"} da geração da
+              qual esta é uma extensão (as primeiras linhas são idênticas).
+    """
+
+    os.makedirs(path, exist_ok=True)
+    anterior = generation(path)
+    nome     = f"g{(int(anterior[1:]) if anterior else 0) + 1:06d}"
+
+    # Gravando em um diretório temporário, renomeado ao final
+    tmp = os.path.join(path, f"{nome}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for position, (name, values) in enumerate(frame.items()):
+        column = {"name": name, "file": f"col{position}.npy"}
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            column["kind"]       = "category"
+            column["categories"] = values.cat.categories.tolist()
+            array                = values.cat.codes.to_numpy()
+        elif values.dtype == object:
+            column["kind"] = "string"
+            array          = values.to_numpy().astype(str)
+        else:
+            column["kind"] = "array"
+            array          = values.to_numpy()
+
+        np.save(os.path.join(tmp, column["file"]), array, allow_pickle=False)
+        columns.append(column)
+
+    meta = {
+        "schema":     SCHEMA_VERSION,
+        "generation": nome,
+        "base":       base,
+        "product":    product,
+        "compact":    bool(compact),
+        "rows":       len(frame),
+        "columns":    columns,
+        "source":     source,
+        "created":    time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(path, nome))
+
+    # Publicando a nova geração com a troca atômica do CURRENT
+    current = os.path.join(path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(current, "w", encoding="utf-8") as file:
+        file.write(nome)
+    os.replace(current, os.path.join(path, CURRENT_FILE))
+
+    prune(path)
+    return meta
+
+
+def prune(path, keep=KEEP_GENERATIONS):
+
+    """
+        Remove as gerações antigas da partição. Processos que ainda as tenham mapeadas
+        em memória continuam com acesso aos dados até liberá-las.
+    """
+
+    geracoes = sorted(entry for entry in os.listdir(path) if re.fullmatch(r"g\d{6}", entry))
+    for antiga in geracoes[:-keep]:
+        shutil.rmtree(os.path.join(path, antiga), ignore_errors=True)
+
+
+def frame_from_columns(data):
+
+    """
+        DataFrame com um bloco por coluna, sem copiar os arrays. O construtor a partir de
+        um dicionário empilha as colunas em blocos novos (no pandas 1.3, mesmo as de tipo
+        único), o que tiraria os dados do memory-map e os copiaria para a memória
+        privada de cada worker. Não há caminho público sem cópia no pandas 1.3, então a
+        montagem usa os internos (BlockManager, make_block) da versão fixada em
+        requirements.txt; tests/test_snapshot.py verifica que as colunas carregadas
+        continuam mapeadas ao atualizar o pandas.
+            - data: nome da coluna -> array do numpy (1D) ou Categorical.
+    """
+
+    from pandas.core.internals import BlockManager
+    from pandas.core.internals.api import make_block
+
+    blocos = [
+        make_block(valores.reshape(1, -1) if isinstance(valores, np.ndarray) else valores, placement=[posicao])
+        for posicao, valores in enumerate(data.values())
+    ]
+    linhas = len(next(iter(data.values()))) if data else 0
+    return pd.DataFrame(BlockManager(blocos, [pd.Index(list(data)), pd.RangeIndex(linhas)]))
+
+
+def load(path, compact=None):
+
+    """
+        Carrega o snapshot via memory-map.
+            - path: diretório do snapshot.
+            - compact: representação esperada (None aceita qualquer uma).
+    """
+
+    meta   = read_meta(path, compact)
+    pasta  = os.path.join(path, meta["generation"])
+
+    data = {}
+    for column in meta["columns"]:
+        array = np.load(os.path.join(pasta, column["file"]), mmap_mode="r", allow_pickle=False)
+
+        if column["kind"] == "category":
+            data[column["name"]] = pd.Categorical.from_codes(array, column["categories"])
+        elif column["kind"] == "string":
+            data[column["name"]] = array.astype(object)
+        else:
+            data[column["name"]] = array
+
+    frame = frame_from_columns(data)
+
+    # Geração carregada, usada para detectar novas versões e atualizações incrementais
+    frame.attrs["snapshot"] = {"generation": meta["generation"], "base": meta["base"]}
+    return frame
+
+
+def main(argv=None):
+
+    """
+        Linha de comando para gerar o snapshot particionado a partir do CSV da ANP.
+    """
+
+    from gas_prices.data import write_snapshot
+
+    parser = argparse.ArgumentParser(description="Gera o snapshot colunar dos preços de gás.")
+    parser.add_argument("--source", default=config.SOURCE, help="CSV original (URL ou caminho)")
+    parser.add_argument("--out", default=config.SNAPSHOT_DIR, help="diretório do snapshot")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    produtos, linhas = write_snapshot(args.source, args.out)
+    print(f"Snapshot com {len(produtos)} produtos e {linhas} linhas gravado em {args.out} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
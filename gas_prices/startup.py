@@ -0,0 +1,127 @@
+#######################################################################################
+# -= INICIALIZAÇÃO EM SEGUNDO PLANO =-
+#
+# O servidor precisa responder assim que o processo sobe (liveness), mesmo que a carga
+# dos dados, o cálculo dos agregados e a montagem do layout ainda não tenham terminado.
+# Essas etapas são registradas aqui e executadas em ordem por uma thread de fundo; a
+# prontidão (readiness) e o tempo de cada etapa ficam disponíveis para o endpoint
+# /readyz e para os logs.
+#
+# A thread é iniciada por processo e nunca é herdada pela metade por um fork. Com o
+# gunicorn em preload, as etapas rodam no próprio mestre (run), antes da criação dos
+# workers, que herdam os dados e os agregados já prontos (ver gunicorn.conf.py).
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+
+    """
+        Etapas de inicialização executadas em segundo plano, em ordem de registro.
+    """
+
+    def __init__(self):
+        self.steps   = []
+        self.results = {}
+        self.timings = {}
+        self.error   = None
+        self.origin  = time.perf_counter()
+        self._ready  = threading.Event()
+        self._lock   = threading.Lock()
+        self._pid    = None
+
+    def step(self, name):
+
+        """
+            Decorador que registra uma etapa; o retorno fica em results[name].
+        """
+
+        def decorator(func):
+            self.steps.append((name, func))
+            return func
+
+        return decorator
+
+    def mark(self, name):
+
+        """
+            Registra o tempo decorrido desde a criação do objeto (ex.: fim dos imports).
+        """
+
+        self.timings[name] = round(time.perf_counter() - self.origin, 4)
+
+    def start(self):
+
+        """
+            Inicia a thread de inicialização no processo atual, se ainda não iniciada.
+        """
+
+        if self._ready.is_set() or self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+        threading.Thread(target=self._run, name="startup", daemon=True).start()
+
+    def run(self):
+
+        """
+            Executa as etapas na thread atual, aguardando o fim (ex.: no mestre do
+            gunicorn, antes do fork dos workers). Retorna se a inicialização terminou.
+        """
+
+        with self._lock:
+            if self._ready.is_set() or self._pid == os.getpid():
+                return self.ready()
+            self._pid = os.getpid()
+
+        self._run()
+        return self.ready()
+
+    def _run(self):
+        inicio_total = time.perf_counter()
+
+        for name, func in self.steps:
+            inicio = time.perf_counter()
+            try:
+                self.results[name] = func()
+            except Exception as error:
+                self.error = f"{name}: {error}"
+                logger.exception("Falha na etapa de inicialização %s", name)
+                return
+            self.timings[name] = round(time.perf_counter() - inicio, 4)
+
+        self.timings["total"] = round(time.perf_counter() - inicio_total, 4)
+        self._ready.set()
+        logger.info("Inicialização concluída (s): %s", self.timings)
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+
+        """
+            Estado da inicialização, no formato retornado pelo endpoint /readyz.
+        """
+
+        return {
+            "ready":   self.ready(),
+            "error":   self.error,
+            "pending": [name for name, _ in self.steps if name not in self.timings],
+            "timings": dict(self.timings),
+        }
+
+
+# Instância única do processo
+startup = Startup()
@@ -0,0 +1,438 @@
+#######################################################################################
+# -= INGESTÃO DOS DADOS POR POSTO =-
+#
+# A série histórica da ANP também é publicada por posto revendedor: um arquivo por
+# semestre e produto (ou com todos os produtos), com uma linha por coleta de preço,
+# somando dezenas de milhões de linhas. Os arquivos não cabem de uma vez em memória,
+# então são lidos em blocos de linhas (read_csv com chunksize), cada bloco reduzido a
+# somas e contagens por produto, estado e dia de coleta, e as reduções parciais
+# acumuladas até formar a média semanal de cada estado, no mesmo esquema do CSV
+# semanal (DATA, ANO, REGIÃO, ESTADO e VALOR REVENDA) usado pelos callbacks.
+#
+# Os arquivos são divididos em faixas de bytes (iniciadas sempre no começo de uma
+# linha) e as faixas distribuídas entre os núcleos, de modo que mesmo um único arquivo
+# grande é lido em paralelo. A memória de cada processo é limitada pelo tamanho do
+# bloco, e o processo principal mantém apenas o acumulado, que tem uma linha por
+# produto, estado e semana. Arquivos comprimidos (.zip, .gz, ...) não podem ser
+# divididos e são lidos inteiros por um único processo.
+#
+# O resultado é gravado no snapshot, como uma nova geração da partição de cada produto
+# encontrado (ou, com --append, apenas as semanas posteriores às já gravadas), e o
+# painel em execução passa a usá-lo na próxima verificação de versão.
+#
+#     python -m gas_prices.stations dados/ca-2023-01.csv dados/ca-2023-02.csv
+#     python -m gas_prices.stations dados/*.csv --workers 8 --chunk-rows 500000
+
+import argparse
+import codecs
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import unicodedata
+
+import pandas as pd
+
+from gas_prices import config, snapshot
+from gas_prices.data import COLUMNS, compact_frame, snapshot_lock
+
+logger = logging.getLogger(__name__)
+
+# Colunas lidas dos arquivos por posto (cabeçalho sem acentos e em minúsculas) e o
+# nome usado no processamento
+SOURCE_COLUMNS = {
+    "estado - sigla": "UF",
+    "produto":        "PRODUTO",
+    "data da coleta": "DATA",
+    "valor de venda": "PRECO",
+}
+
+# Estado e região de cada sigla, como aparecem no CSV semanal
+STATES = {
+    "AC": ("ACRE", "NORTE"),
+    "AL": ("ALAGOAS", "NORDESTE"),
+    "AM": ("AMAZONAS", "NORTE"),
+    "AP": ("AMAPA", "NORTE"),
+    "BA": ("BAHIA", "NORDESTE"),
+    "CE": ("CEARA", "NORDESTE"),
+    "DF": ("DISTRITO FEDERAL", "CENTRO OESTE"),
+    "ES": ("ESPIRITO SANTO", "SUDESTE"),
+    "GO": ("GOIAS", "CENTRO OESTE"),
+    "MA": ("MARANHAO", "NORDESTE"),
+    "MG": ("MINAS GERAIS", "SUDESTE"),
+    "MS": ("MATO GROSSO DO SUL", "CENTRO OESTE"),
+    "MT": ("MATO GROSSO", "CENTRO OESTE"),
+    "PA": ("PARA", "NORTE"),
+    "PB": ("PARAIBA", "NORDESTE"),
+    "PE": ("PERNAMBUCO", "NORDESTE"),
+    "PI": ("PIAUI", "NORDESTE"),
+    "PR": ("PARANA", "SUL"),
+    "RJ": ("RIO DE JANEIRO", "SUDESTE"),
+    "RN": ("RIO GRANDE DO NORTE", "NORDESTE"),
+    "RO": ("RONDONIA", "NORTE"),
+    "RR": ("RORAIMA", "NORTE"),
+    "RS": ("RIO GRANDE DO SUL", "SUL"),
+    "SC": ("SANTA CATARINA", "SUL"),
+    "SE": ("SERGIPE", "NORDESTE"),
+    "SP": ("SAO PAULO", "SUDESTE"),
+    "TO": ("TOCANTINS", "NORTE"),
+}
+
+# Produtos dos arquivos por posto com o nome usado no CSV semanal; os demais mantêm o
+# nome original
+PRODUCTS = {
+    "GASOLINA":   "GASOLINA COMUM",
+    "ETANOL":     "ETANOL HIDRATADO",
+    "DIESEL":     "OLEO DIESEL",
+    "DIESEL S10": "OLEO DIESEL S10",
+}
+
+# Linhas por bloco lido de cada faixa
+CHUNK_ROWS = 200_000
+
+
+def plain_name(column):
+    ascii_name = unicodedata.normalize("NFKD", column).encode("ascii", "ignore").decode()
+    return " ".join(ascii_name.strip().strip('"').lower().split())
+
+
+def detect_encoding(path):
+
+    """
+        Codificação do arquivo: os arquivos mais antigos da ANP são latin-1 e os mais
+        recentes UTF-8, às vezes com BOM.
+    """
+
+    with open(path, "rb") as file:
+        amostra = file.read(1 << 16)
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def compressed(path):
+    return os.path.splitext(path)[1].lower() in (".zip", ".gz", ".bz2", ".xz", ".zst")
+
+
+def splits(path, parts):
+
+    """
+        Divide o arquivo em até `parts` faixas de bytes [início, fim), cada uma
+        iniciada no começo de uma linha; a primeira começa após o cabeçalho.
+    """
+
+    tamanho = os.path.getsize(path)
+    with open(path, "rb") as file:
+        file.readline()
+        limites = [file.tell()]
+        for parte in range(1, parts):
+            file.seek(max(tamanho * parte // parts, limites[-1]))
+            file.readline()
+            limites.append(min(file.tell(), tamanho))
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+
+class ByteRange(io.RawIOBase):
+
+    """
+        Leitura restrita à faixa [start, end) de um arquivo binário.
+    """
+
+    def __init__(self, file, start, end):
+        self.file      = file
+        self.remaining = end - start
+        file.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        tamanho = min(len(buffer), self.remaining)
+        if tamanho <= 0:
+            return 0
+        lidos = self.file.readinto(memoryview(buffer)[:tamanho])
+        self.remaining -= lidos
+        return lidos
+
+
+def header(path, encoding):
+    return pd.read_csv(path, sep=";", nrows=0, encoding=encoding).columns.tolist()
+
+
+def reduce_chunk(chunk):
+
+    """
+        Somas e contagens dos preços de um bloco por produto, sigla do estado e dia de
+        coleta. As datas, repetidas em milhares de linhas, são convertidas apenas
+        depois, sobre o resultado reduzido.
+    """
+
+    preco = chunk["PRECO"]
+    if preco.dtype == object:
+        preco = pd.to_numeric(preco.str.replace(",", ".", regex=False), errors="coerce")
+
+    chaves = [chunk["PRODUTO"], chunk["UF"], chunk["DATA"]]
+    return preco.groupby(chaves, observed=True, sort=False).agg(["sum", "count"])
+
+
+def combine(acumulado, parcial):
+
+    """
+        Soma a redução parcial ao acumulado (ambos indexados pelas mesmas chaves).
+    """
+
+    if acumulado is None:
+        return parcial
+    return pd.concat([acumulado, parcial]).groupby(level=list(range(parcial.index.nlevels)), observed=True, sort=False).sum()
+
+
+def weekly(reducao):
+
+    """
+        Converte a redução por dia de coleta na redução por semana de pesquisa
+        (domingo a sábado, como no CSV semanal).
+    """
+
+    reducao = reducao[reducao["count"] > 0].reset_index()
+    reducao.columns = ["PRODUTO", "UF", "DATA", "sum", "count"]
+
+    dias   = pd.to_datetime(reducao["DATA"].astype(str).str.strip(), format="%d/%m/%Y", errors="coerce")
+    semana = dias - pd.to_timedelta((dias.dt.dayofweek + 1) % 7, unit="D")
+
+    # Semanas como inteiros (nanossegundos desde 1970): o datetime64 recebido por pickle
+    # dos processos de leitura traz no dtype metadados que o np.save do snapshot recusa
+    validas = semana.notna().to_numpy()
+    frame   = pd.DataFrame({
+        "PRODUTO": reducao["PRODUTO"].astype(str).str.strip().str.upper(),
+        "UF":      reducao["UF"].astype(str).str.strip().str.upper(),
+        "SEMANA":  semana.to_numpy().view("int64"),
+        "sum":     reducao["sum"],
+        "count":   reducao["count"],
+    })[validas]
+    return frame.groupby(["PRODUTO", "UF", "SEMANA"], sort=False)[["sum", "count"]].sum()
+
+
+def read_range(path, start, end, encoding, chunk_rows=CHUNK_ROWS):
+
+    """
+        Lê uma faixa de um arquivo bloco a bloco e devolve a sua redução semanal e a
+        quantidade de linhas lidas. Ponto de entrada dos processos do pool.
+            - start, end: faixa de bytes (None lê o arquivo inteiro).
+    """
+
+    nomes   = header(path, encoding)
+    colunas = {nome: SOURCE_COLUMNS[plain_name(nome)] for nome in nomes if plain_name(nome) in SOURCE_COLUMNS}
+    if len(colunas) < len(SOURCE_COLUMNS):
+        faltando = set(SOURCE_COLUMNS.values()) - set(colunas.values())
+        raise ValueError(f"{path}: colunas ausentes no cabeçalho: {', '.join(sorted(faltando))}")
+
+    opcoes = {
+        "sep":       ";",
+        "decimal":   ",",
+        "usecols":   list(colunas),
+        "dtype":     {nome: "category" for nome, coluna in colunas.items() if coluna != "PRECO"},
+        "chunksize": chunk_rows,
+        "encoding":  encoding,
+    }
+
+    acumulado, linhas = None, 0
+    with open(path, "rb") as file:
+        if start is None:
+            fonte = path
+        else:
+            fonte = io.BufferedReader(ByteRange(file, start, end), buffer_size=1 << 20)
+            opcoes.update({"header": None, "names": nomes})
+
+        for chunk in pd.read_csv(fonte, **opcoes):
+            chunk     = chunk.rename(columns=colunas)
+            linhas   += len(chunk)
+            acumulado = combine(acumulado, reduce_chunk(chunk))
+
+    if acumulado is None:
+        return None, linhas
+    return weekly(acumulado), linhas
+
+
+def tasks(paths, workers, encoding=None):
+
+    """
+        Faixas a ler: (arquivo, início, fim, codificação), com cada arquivo dividido
+        proporcionalmente ao seu tamanho, de modo que haja ao menos algumas faixas por
+        processo.
+    """
+
+    descomprimidos = [path for path in paths if not compressed(path)]
+    total  = sum(os.path.getsize(path) for path in descomprimidos) or 1
+    faixas = []
+    for path in paths:
+        codificacao = encoding or ("latin-1" if compressed(path) else detect_encoding(path))
+        if compressed(path):
+            faixas.append((path, None, None, codificacao))
+            continue
+        partes = max(1, round(4 * workers * os.path.getsize(path) / total))
+        faixas.extend((path, inicio, fim, codificacao) for inicio, fim in splits(path, partes))
+    return faixas
+
+
+def frames(reducao):
+
+    """
+        DataFrames de cada produto no esquema do pré-processamento (ver
+        gas_prices.data.prepare), com a média semanal de cada estado.
+    """
+
+    reducao = reducao.reset_index()
+
+    desconhecidas = sorted(set(reducao["UF"]) - set(STATES))
+    if desconhecidas:
+        logger.warning("Siglas de estado desconhecidas ignoradas: %s", ", ".join(desconhecidas))
+        reducao = reducao[reducao["UF"].isin(STATES)]
+
+    resultado = {}
+    for produto, linhas in reducao.groupby("PRODUTO", sort=True):
+        # DATA: dia central da semana de pesquisa, como no CSV semanal
+        data  = pd.Series(linhas["SEMANA"].to_numpy().astype("datetime64[ns]"), index=linhas.index) + pd.Timedelta(days=3)
+        frame = pd.DataFrame({
+            "DATA":                 data,
+            "ANO":                  data.dt.year.astype("int64"),
+            "REGIÃO":               linhas["UF"].map(lambda uf: STATES[uf][1]),
+            "ESTADO":               linhas["UF"].map(lambda uf: STATES[uf][0]),
+            "VALOR REVENDA (R$/L)": (linhas["sum"] / linhas["count"]).round(3),
+        }, columns=COLUMNS)
+        frame = frame.sort_values(by=["DATA", "ESTADO"], kind="mergesort").reset_index(drop=True)
+        resultado[PRODUCTS.get(produto, produto)] = frame
+    return resultado
+
+
+def peak_rss():
+
+    """
+        Pico de memória residente (bytes) do processo principal e o maior entre os
+        processos filhos já encerrados.
+    """
+
+    escala = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * escala)
+
+
+def aggregate(paths, workers=None, chunk_rows=CHUNK_ROWS, encoding=None, progress=None):
+
+    """
+        Lê os arquivos por posto em paralelo e devolve (frames por produto, linhas
+        lidas).
+            - paths: arquivos CSV da ANP (separados por ";", decimais com ",").
+            - workers: processos de leitura (padrão: um por núcleo).
+            - chunk_rows: linhas por bloco, o que limita a memória de cada processo.
+            - encoding: codificação dos arquivos (padrão: detectada por arquivo).
+            - progress: função chamada com (faixas concluídas, total, linhas lidas).
+    """
+
+    workers = max(workers or os.cpu_count() or 1, 1)
+    faixas  = tasks(paths, workers, encoding)
+
+    acumulado, linhas = None, 0
+
+    def juntar(parcial, lidas, concluidas):
+        nonlocal acumulado, linhas
+        linhas += lidas
+        if parcial is not None:
+            acumulado = combine(acumulado, parcial)
+        if progress:
+            progress(concluidas, len(faixas), linhas)
+
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+            futuros = [pool.submit(read_range, *faixa, chunk_rows) for faixa in faixas]
+            for concluidas, futuro in enumerate(concurrent.futures.as_completed(futuros), 1):
+                juntar(*futuro.result(), concluidas)
+    else:
+        for concluidas, faixa in enumerate(faixas, 1):
+            juntar(*read_range(*faixa, chunk_rows), concluidas)
+
+    if acumulado is None:
+        return {}, linhas
+    return frames(acumulado), linhas
+
+
+def write(resultados, source, path=config.SNAPSHOT_DIR, compact=config.COMPACT, append=False):
+
+    """
+        Grava os produtos agregados no snapshot.
+            - resultados: {produto: DataFrame} devolvido por aggregate.
+            - source: origem registrada no cabeçalho das partições.
+            - append: anexa apenas as semanas posteriores às já gravadas (ver
+              gas_prices.ingest), em vez de substituir as partições.
+        Retorna {produto: (linhas gravadas, anos)}.
+    """
+
+    if append:
+        from gas_prices.ingest import publish
+
+        return publish(resultados, source, path, compact)
+
+    gravados = {}
+    with snapshot_lock(path):
+        for produto, frame in resultados.items():
+            gravado = compact_frame(frame) if compact else frame
+            snapshot.write(gravado, snapshot.partition_path(path, produto), source=source, compact=compact, product=produto)
+            gravados[produto] = (len(frame), sorted(frame["ANO"].unique().tolist()))
+
+        catalogo = snapshot.read_catalogue(path) if snapshot.exists_catalogue(path) else []
+        novos    = [produto for produto in resultados if produto not in catalogo]
+        if novos:
+            snapshot.write_catalogue(path, sorted(catalogo + novos))
+    return gravados
+
+
+def main(argv=None):
+
+    """
+        Linha de comando da ingestão dos arquivos por posto.
+    """
+
+    parser = argparse.ArgumentParser(description="Agrega os arquivos de preços por posto da ANP no snapshot colunar.")
+    parser.add_argument("paths", nargs="+", help="arquivos CSV por posto (separados por ';')")
+    parser.add_argument("--snapshot", default=config.SNAPSHOT_DIR, help="diretório do snapshot")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos de leitura")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="linhas por bloco lido")
+    parser.add_argument("--encoding", help="codificação dos arquivos (padrão: detectada)")
+    parser.add_argument("--append", action="store_true", help="anexa apenas as semanas novas ao snapshot")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+
+    def progresso(concluidas, total, linhas):
+        tempo = time.perf_counter() - inicio
+        print(f"\r{concluidas}/{total} faixas  {linhas:,} linhas  {linhas / max(tempo, 1e-9):,.0f} linhas/s", end="", flush=True)
+
+    resultados, linhas = aggregate(args.paths, args.workers, args.chunk_rows, args.encoding, progresso)
+    leitura = time.perf_counter() - inicio
+    print()
+
+    gravados = write(resultados, ", ".join(args.paths), args.snapshot, append=args.append)
+    tempo    = time.perf_counter() - inicio
+
+    for produto, (quantidade, anos) in sorted(gravados.items()):
+        print(f"{produto:<24}{quantidade:>8} linhas gravadas  anos: {f'{anos[0]}-{anos[-1]}' if anos else '-'}")
+
+    megabytes = sum(os.path.getsize(path) for path in args.paths) / 1024 / 1024
+    principal, filhos = peak_rss()
+    print(f"{linhas:,} linhas ({megabytes:,.1f} MB) lidas em {leitura:.1f}s: {linhas / max(leitura, 1e-9):,.0f} linhas/s, "
+          f"{megabytes / max(leitura, 1e-9):,.1f} MB/s; total {tempo:.1f}s")
+    print(f"Pico de memória: {principal / 1024 / 1024:,.0f} MB no processo principal, "
+          f"{filhos / 1024 / 1024:,.0f} MB no maior processo de leitura")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#######################################################################################
+# -= CONFIGURAÇÃO DO GUNICORN =-
+#
+# O app é importado uma única vez no processo mestre (preload_app) e, antes da criação
+# dos workers, o mestre faz também os imports pesados (pandas, plotly), a carga dos
+# dados e o cálculo dos agregados (cubo, matrizes mensal e semanal). Os workers são
+# criados por fork e herdam tudo isso por copy-on-write: o DataFrame de cada produto é
+# um memory-map somente leitura do snapshot (um bloco por coluna, sem cópia; ver
+# gas_prices.snapshot) e os arrays dos agregados são páginas do mestre que nenhum
+# worker altera. Enquanto o mestre carrega os dados, as conexões aguardam na fila do
+# socket, já aberto; sem preload_app, cada worker faz a sua carga em segundo plano e
+# responde ao /healthz desde o início (ver gas_prices.startup).
+#
+# O que resta privado de cada worker não depende do tamanho do dataset: as páginas
+# de objetos Python herdados que ele toca (a contagem de referências escreve nelas),
+# os caches de figuras e de resultados intermediários e as versões recarregadas a
+# quente após uma ingestão. Medido com o benchmarks/loadtest.py em um produto do
+# tamanho de um da ANP (24 mil linhas): cerca de 3 MB privados por worker ocioso e,
+# sob carga, cerca de 30 MB de PSS por worker a mais (75 MB com 1 worker, 113 MB com
+# 2 e 170 MB com 4), contra 80 MB quando cada worker carregava os próprios dados.
+#
+#     gunicorn -c gunicorn.conf.py app:server
+
+import gc
+import logging
+import os
+
+bind        = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers     = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = True
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def memory(pid="self"):
+
+    """
+        Memória do processo em KB (Linux): residente total, proporcional (PSS, que
+        divide as páginas compartilhadas entre os processos) e privada.
+    """
+
+    campos = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as file:
+            for linha in file:
+                partes = linha.split()
+                if len(partes) == 3 and partes[2] == "kB":
+                    campos[partes[0].rstrip(":")] = int(partes[1])
+    except OSError:
+        return {}
+
+    return {
+        "rss":     campos.get("Rss", 0),
+        "pss":     campos.get("Pss", 0),
+        "private": campos.get("Private_Clean", 0) + campos.get("Private_Dirty", 0),
+    }
+
+
+def when_ready(server):
+
+    # Mestre, antes do fork dos workers: com o app já importado (preload_app), os
+    # imports pesados, a carga dos dados e os agregados são feitos aqui, sem nenhuma
+    # outra thread. O gc.freeze tira os objetos herdados do coletor de lixo, que do
+    # contrário tocaria nas páginas de cada um e desfaria o compartilhamento
+    if not server.cfg.preload_app:
+        return
+
+    from gas_prices.startup import startup
+    if startup.run():
+        gc.freeze()
+    logger.info("Dados carregados no mestre, memória (KB): %s", memory())
+
+
+def post_worker_init(worker):
+
+    # Pool de processos dos jobs (GAS_PRICES_JOBS), criado antes de qualquer thread do
+    # worker: o fork de um processo com várias threads pode travar os filhos
+    from gas_prices.jobs import runner
+    runner.start()
+
+    # Sem preload_app (ou se a carga no mestre falhou), a carga roda em segundo plano no
+    # worker, que já atende o /healthz enquanto ela acontece; com os dados herdados do
+    # mestre a chamada não faz nada
+    from gas_prices.startup import startup
+    startup.start()
+
+    logger.info("Worker %s iniciado, memória (KB): %s", worker.pid, memory())
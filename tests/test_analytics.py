@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from gas_prices.analytics import PriceAnalytics
+
+
+def frame(semanas):
+    datas = pd.to_datetime("2019-01-02") + pd.to_timedelta(np.repeat(semanas, 2) * 7, unit="D")
+    return pd.DataFrame({
+        "DATA":                 datas,
+        "ANO":                  datas.year,
+        "REGIÃO":               ["SUL", "SUDESTE"] * len(semanas),
+        "ESTADO":               ["PARANA", "SAO PAULO"] * len(semanas),
+        "VALOR REVENDA (R$/L)": 4 + np.sin(np.arange(2 * len(semanas)) / 5),
+    })
+
+
+def assert_same(incremental, completo):
+    assert incremental.weeks.equals(completo.weeks)
+    assert incremental.labels.equals(completo.labels)
+    for nome, valores in completo.metrics.items():
+        np.testing.assert_allclose(incremental.metrics[nome], valores, equal_nan=True, err_msg=nome)
+
+
+def test_extend_matches_rebuild():
+    dados = frame(np.arange(120))
+    anos  = dados["ANO"] >= dados["ANO"].max()
+    assert_same(PriceAnalytics(dados[~anos]).extend(PriceAnalytics(dados[anos])), PriceAnalytics(dados))
+
+
+def test_extend_after_skipped_weeks():
+    # Semanas sem pesquisa entre o fim do dataset anterior e o início do ano novo
+    dados = frame(np.concatenate([np.arange(100), np.arange(105, 130)]))
+    anos  = dados["DATA"] >= pd.Timestamp("2021-01-01")
+    assert_same(PriceAnalytics(dados[~anos]).extend(PriceAnalytics(dados[anos])), PriceAnalytics(dados))
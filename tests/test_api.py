@@ -0,0 +1,93 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+from gas_prices import api as api_module
+from gas_prices.api import api
+from gas_prices.data import prepare
+from gas_prices.registry import DatasetRegistry
+
+GASOLINA = "GASOLINA COMUM"
+ETANOL   = "ETANOL HIDRATADO"
+
+
+def source(produto, semanas=np.arange(60)):
+    inicio = pd.to_datetime("2019-01-06") + pd.to_timedelta(np.repeat(semanas, 2) * 7, unit="D")
+    return pd.DataFrame({
+        "DATA INICIAL":        inicio.strftime("%Y-%m-%d"),
+        "DATA FINAL":          (inicio + pd.Timedelta(days=6)).strftime("%Y-%m-%d"),
+        "REGIÃO":              ["SUDESTE", "NORDESTE"] * len(semanas),
+        "ESTADO":              ["SAO PAULO", "BAHIA"] * len(semanas),
+        "PRODUTO":             produto,
+        "PREÇO MÉDIO REVENDA": 4 + np.repeat(semanas, 2) / 100,
+    })
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = DatasetRegistry(loader=lambda produto: prepare(source(produto), product=produto))
+    monkeypatch.setattr(api_module, "registry", registry)
+    monkeypatch.setattr(api_module, "catalogue", lambda: [ETANOL, GASOLINA])
+    return registry
+
+
+@pytest.fixture
+def client(registry):
+    server = Flask(__name__)
+    server.register_blueprint(api, url_prefix="/api/v1")
+    return server.test_client()
+
+
+def test_etag_answers_not_modified_until_the_version_changes(client, registry):
+    resposta = client.get("/api/v1/state-means?start=2019&end=2019")
+    assert resposta.status_code == 200
+    assert resposta.json["version"] == registry.current(GASOLINA)
+    assert set(resposta.json["columns"]["ESTADO"]) == {"SAO PAULO", "BAHIA"}
+
+    etag = resposta.headers["ETag"]
+    repetida = client.get("/api/v1/state-means?start=2019&end=2019", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+    # Uma nova versão do dataset muda o ETag
+    registry.publish(prepare(source(GASOLINA, np.arange(70))), GASOLINA)
+    nova = client.get("/api/v1/state-means?start=2019&end=2019", headers={"If-None-Match": etag})
+    assert nova.status_code == 200
+    assert nova.headers["ETag"] != etag
+
+
+def test_npz_format(client):
+    resposta = client.get("/api/v1/state-monthly?states=BAHIA&format=npz")
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "application/x-npz"
+
+    colunas = np.load(io.BytesIO(resposta.data), allow_pickle=False)
+    assert "BAHIA" in colunas.files and "SAO PAULO" not in colunas.files
+
+
+def test_unknown_product_state_and_version_are_not_found(client, registry):
+    assert client.get("/api/v1/maxmin?product=QUEROSENE").status_code == 404
+    assert client.get("/api/v1/state-monthly?states=ACRE").status_code == 404
+
+    resposta = client.get("/api/v1/maxmin?version=inexistente")
+    assert resposta.status_code == 404
+    assert registry.current(GASOLINA) in resposta.json["error"]
+
+
+def test_version_of_another_product_conflicts(client, registry):
+    etanol = registry.current(ETANOL)
+
+    resposta = client.get(f"/api/v1/maxmin?product={GASOLINA}&version={etanol}")
+    assert resposta.status_code == 409
+
+    fixada = client.get(f"/api/v1/maxmin?product={ETANOL}&version={etanol}")
+    assert fixada.status_code == 200
+    assert fixada.cache_control.immutable
+
+
+def test_invalid_parameters(client):
+    assert client.get("/api/v1/maxmin?start=dois-mil").status_code == 400
+    assert client.get("/api/v1/maxmin?format=xml").status_code == 400
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gas_prices import cache
+from gas_prices.cache import DiskBackend, FigureCache
+from gas_prices.data import prepare
+from gas_prices.registry import DatasetRegistry
+
+
+def source(semanas, acrescimo=0.0):
+    inicio = pd.to_datetime("2019-01-06") + pd.to_timedelta(np.repeat(semanas, 2) * 7, unit="D")
+    return pd.DataFrame({
+        "DATA INICIAL":        inicio.strftime("%Y-%m-%d"),
+        "DATA FINAL":          (inicio + pd.Timedelta(days=6)).strftime("%Y-%m-%d"),
+        "REGIÃO":              ["SUDESTE", "NORDESTE"] * len(semanas),
+        "ESTADO":              ["SAO PAULO", "BAHIA"] * len(semanas),
+        "PRODUTO":             "GASOLINA COMUM",
+        "PREÇO MÉDIO REVENDA": 4 + np.repeat(semanas, 2) / 100 + acrescimo,
+    })
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = DatasetRegistry()
+    monkeypatch.setattr(cache, "registry", registry)
+    return registry
+
+
+def test_evicts_least_recently_used_by_bytes(registry):
+    figure_cache = FigureCache(300)
+    chamadas = []
+
+    @figure_cache.memoize("grafico")
+    def grafico(valor):
+        chamadas.append(valor)
+        return "x" * 100
+
+    grafico(1)
+    grafico(2)
+    grafico(1)
+    grafico(3)
+
+    # A entrada 2 é a usada há mais tempo e sai para caber a 3
+    assert figure_cache.stats()["evictions"] == 1
+    assert figure_cache.stats()["bytes"] <= 300
+    grafico(1)
+    grafico(2)
+    assert chamadas == [1, 2, 3, 2]
+
+
+def test_disk_backend_without_memory_cache(tmp_path, registry):
+    backend = DiskBackend(str(tmp_path), 1024 * 1024)
+    chamadas = []
+
+    def grafico(valor):
+        chamadas.append(valor)
+        return {"valor": valor}
+
+    # Dois processos com GAS_PRICES_CACHE_MB=0 compartilham apenas o diretório
+    primeiro = FigureCache(0, backend=backend).memoize("grafico")(grafico)
+    segundo  = FigureCache(0, backend=backend).memoize("grafico")(grafico)
+
+    assert primeiro(1) == {"valor": 1}
+    assert segundo(1) == {"valor": 1}
+    assert chamadas == [1]
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+
+def test_stale_version_is_keyed_by_the_served_version(registry):
+    antiga = registry.publish(prepare(source(np.arange(8))))
+    registry.publish(prepare(source(np.arange(8), acrescimo=0.1)))
+    atual = registry.publish(prepare(source(np.arange(8), acrescimo=0.2)))
+
+    # Apenas a versão corrente e a anterior ficam no registro
+    assert registry.dataset(registry.key(antiga)).version == atual
+
+    figure_cache = FigureCache(1024 * 1024)
+    versoes = []
+
+    @figure_cache.memoize("grafico")
+    def grafico(key):
+        versoes.append(key["version"])
+        return key["version"]
+
+    assert grafico(registry.key(antiga)) == atual
+    assert figure_cache.contains("grafico", registry.key(atual))
+
+    # Após uma nova publicação, a chave antiga não continua presa à versão de antes
+    nova = registry.publish(prepare(source(np.arange(8), acrescimo=0.3)))
+    assert grafico(registry.key(antiga)) == nova
+    assert versoes == [atual, nova]
@@ -0,0 +1,31 @@
+import numpy as np
+
+from gas_prices.downsample import budget, minmax, snap_relayout, snap_viewport
+
+
+def test_budget_never_exceeds_max_points():
+    for traces in [1, 3, 27, 32, 40, 400, 4000]:
+        pontos = budget(traces, 1920, 4000)
+        assert pontos >= 1
+        assert pontos * traces <= 4000, traces
+
+    # O piso vale para a largura, não para a parte de cada série
+    assert budget(2, 50, 4000) == 100
+
+
+def test_minmax_respects_points():
+    y = np.sin(np.arange(5000) / 37)
+    for points in [1, 2, 3, 4, 10, 133, 1000]:
+        assert len(np.arange(len(y))[minmax(y, points)]) <= points
+    assert minmax(y, 5000) == slice(None)
+
+
+def test_snapped_view_is_stable_and_covers_the_range():
+    a = snap_relayout({"xaxis.range[0]": "2009-01-01 03:12:00", "xaxis.range[1]": "2010-06-30 18:00:00"})
+    b = snap_relayout({"xaxis.range[0]": "2009-01-02 10:00:00", "xaxis.range[1]": "2010-07-01"})
+    assert a == b
+    inicio, fim = a["xaxis.range"]
+    assert inicio <= "2009-01-01" and fim >= "2010-07-01"
+
+    assert snap_relayout({"xaxis.autorange": True}) is None
+    assert snap_viewport({"width": 1287}) == snap_viewport({"width": 1234}) == {"width": 1200}
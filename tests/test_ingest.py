@@ -0,0 +1,110 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from gas_prices import snapshot
+from gas_prices.data import prepare
+from gas_prices.ingest import PRICE, append, publish
+
+
+def source(semanas, estados=("SAO PAULO", "BAHIA"), acrescimo=0.0):
+    inicio = pd.to_datetime("2019-01-06") + pd.to_timedelta(np.repeat(semanas, len(estados)) * 7, unit="D")
+    return pd.DataFrame({
+        "DATA INICIAL":        inicio.strftime("%Y-%m-%d"),
+        "DATA FINAL":          (inicio + pd.Timedelta(days=6)).strftime("%Y-%m-%d"),
+        "REGIÃO":              [{"SAO PAULO": "SUDESTE", "BAHIA": "NORDESTE"}.get(x, "SUL") for x in estados] * len(semanas),
+        "ESTADO":              list(estados) * len(semanas),
+        "PRODUTO":             "GASOLINA COMUM",
+        "PREÇO MÉDIO REVENDA": 4 + np.repeat(semanas, len(estados)) / 100 + acrescimo,
+    })
+
+
+def test_append_includes_late_rows_and_rejects_duplicates(caplog):
+    atual = prepare(source(np.arange(10)))
+
+    # A última semana se repete, com um estado que faltava nela, e chega uma semana nova
+    novas = prepare(pd.concat([source([9], estados=("SAO PAULO", "BAHIA", "PARANA")), source([10])]), compact=False)
+
+    with caplog.at_level(logging.WARNING, logger="gas_prices.ingest"):
+        frame, alteradas, inicio = append(atual, novas)
+
+    assert len(alteradas) == 3
+    assert len(frame) == len(atual) + 3
+    assert frame["DATA"].is_monotonic_increasing
+    assert "PARANA" in set(frame["ESTADO"])
+    assert "2 já gravadas" in caplog.text
+
+    # As linhas até a última semana já gravada (inclusive) continuam idênticas
+    assert inicio == len(atual)
+    pd.testing.assert_frame_equal(frame.iloc[:inicio].astype({"ESTADO": object, "REGIÃO": object}),
+                                  atual.astype({"ESTADO": object, "REGIÃO": object}))
+
+
+def test_append_replaces_corrected_rows():
+    atual = prepare(source(np.arange(10)))
+    novas = prepare(source([4], estados=("BAHIA",), acrescimo=0.5), compact=False)
+
+    frame, alteradas, inicio = append(atual, novas)
+
+    assert len(alteradas) == 1 and len(frame) == len(atual)
+    assert inicio == 9
+    corrigida = frame[(frame["DATA"] == novas["DATA"].iat[0]) & (frame["ESTADO"] == "BAHIA")]
+    np.testing.assert_allclose(corrigida[PRICE], novas[PRICE], rtol=1e-6)
+
+
+def test_publish_records_unchanged_prefix(tmp_path):
+    publish({"GASOLINA COMUM": prepare(source(np.arange(10)), compact=False)}, "base.csv", str(tmp_path))
+    particao = snapshot.partition_path(str(tmp_path), "GASOLINA COMUM")
+    anterior = snapshot.generation(particao)
+
+    resultados = publish({"GASOLINA COMUM": prepare(source(np.arange(8, 12)), compact=False)}, "novas.csv", str(tmp_path))
+
+    assert resultados["GASOLINA COMUM"] == (4, [2019])
+    meta = snapshot.read_meta(particao)
+    assert meta["base"] == {"generation": anterior, "rows": 20}
+    assert meta["rows"] == 24
+
+    # Sem linhas novas, nenhuma geração é publicada
+    assert publish({"GASOLINA COMUM": prepare(source([11]), compact=False)}, "novas.csv", str(tmp_path))["GASOLINA COMUM"] == (0, [])
+    assert snapshot.read_meta(particao)["rows"] == 24
+
+
+def test_publish_keeps_only_recent_generations(tmp_path):
+    particao = snapshot.partition_path(str(tmp_path), "GASOLINA COMUM")
+    for semana in range(4):
+        publish({"GASOLINA COMUM": prepare(source([semana]), compact=False)}, "novas.csv", str(tmp_path))
+
+    assert snapshot.generation(particao) == "g000004"
+    assert sorted(entry for entry in os.listdir(particao) if entry.startswith("g")) == ["g000003", "g000004"]
+    assert len(snapshot.load(particao)) == 8
+
+
+def test_registry_swaps_to_the_published_generation(tmp_path):
+    from gas_prices.cube import AggregateCube
+    from gas_prices.registry import DatasetRegistry
+
+    publish({"GASOLINA COMUM": prepare(source(np.arange(50)), compact=False)}, "base.csv", str(tmp_path))
+    particao = snapshot.partition_path(str(tmp_path), "GASOLINA COMUM")
+    registry = DatasetRegistry(loader=lambda produto: snapshot.load(particao), probe=lambda produto: snapshot.generation(particao))
+
+    anterior = registry.key()
+    assert registry.refresh() == []
+
+    # Semanas novas, atravessando o ano
+    publish({"GASOLINA COMUM": prepare(source(np.arange(48, 56)), compact=False)}, "novas.csv", str(tmp_path))
+    assert registry.refresh() == ["GASOLINA COMUM"]
+
+    atual = registry.dataset(registry.key())
+    assert atual.generation == "g000002"
+    assert atual.version != anterior["version"]
+    assert len(atual.frame) == 112
+
+    # A versão anterior continua disponível para as requisições em andamento
+    assert len(registry.frame(anterior)) == 100
+
+    # O cubo atualizado apenas nos anos afetados é igual ao recalculado por completo
+    completo = AggregateCube(atual.frame)
+    ordem = lambda df: df.astype({"ESTADO": str}).sort_values(["ANO", "ESTADO"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(ordem(atual.cube.state_year), ordem(completo.state_year))
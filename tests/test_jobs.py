@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from gas_prices import jobs
+from gas_prices.jobs import FINISHED, JobRunner, progress
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+
+    # Os processos do pool executam as tarefas da instância do módulo
+    runner = JobRunner(str(tmp_path), 1, 1024 * 1024)
+    monkeypatch.setattr(jobs, "runner", runner)
+
+    @runner.task("lenta")
+    def lenta(segundos):
+        fim = time.monotonic() + segundos
+        while time.monotonic() < fim:
+            progress(0.5)
+            time.sleep(0.01)
+        return segundos
+
+    runner.start()
+    return runner
+
+
+def wait(runner, job, timeout=10):
+    limite = time.monotonic() + timeout
+    while runner.status(job)["state"] not in FINISHED:
+        assert time.monotonic() < limite, runner.status(job)
+        time.sleep(0.02)
+    return runner.status(job)["state"]
+
+
+def test_cancel_does_not_affect_other_sessions(runner):
+    a = runner.submit("lenta", 0.3, scope="A")
+    b = runner.submit("lenta", 0.3, scope="B")
+    assert a != b
+
+    runner.cancel(a)
+    assert wait(runner, a) == "cancelled"
+    assert wait(runner, b) == "done"
+    assert runner.result(b) == 0.3
+
+
+def test_runs_inline_without_pool(tmp_path, monkeypatch):
+    runner = JobRunner(str(tmp_path), 0, 1024 * 1024)
+    monkeypatch.setattr(jobs, "runner", runner)
+    runner.task("soma")(lambda a, b: a + b)
+
+    job = runner.submit("soma", 1, 2)
+    assert runner.status(job)["state"] == "done"
+    assert runner.result(job) == 3
+
+
+def test_resubmit_after_cancel(runner):
+    job = runner.submit("lenta", 0.2, scope="A")
+    runner.cancel(job)
+    assert wait(runner, job) == "cancelled"
+
+    assert runner.submit("lenta", 0.2, scope="A") == job
+    assert wait(runner, job) == "done"
+
+    # Entradas repetidas reaproveitam o resultado gravado
+    assert runner.submit("lenta", 0.2, scope="A") == job
+    assert runner.status(job)["state"] == "done"
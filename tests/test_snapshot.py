@@ -0,0 +1,61 @@
+import mmap
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gas_prices import snapshot
+from gas_prices.data import prepare
+
+
+def source(semanas, estados=("SAO PAULO", "BAHIA")):
+    inicio = pd.to_datetime("2019-01-06") + pd.to_timedelta(np.repeat(semanas, len(estados)) * 7, unit="D")
+    linhas = len(inicio)
+    return pd.DataFrame({
+        "DATA INICIAL":        inicio.strftime("%Y-%m-%d"),
+        "DATA FINAL":          (inicio + pd.Timedelta(days=6)).strftime("%Y-%m-%d"),
+        "REGIÃO":              [{"SAO PAULO": "SUDESTE", "BAHIA": "NORDESTE"}.get(x, "SUL") for x in estados] * (linhas // len(estados)),
+        "ESTADO":              list(estados) * (linhas // len(estados)),
+        "PRODUTO":             "GASOLINA COMUM",
+        "PREÇO MÉDIO REVENDA": np.round(4 + np.arange(linhas) / 1000, 3),
+    })
+
+
+def mapped(array):
+
+    # Um array mapeado em memória tem um mmap.mmap no fim da cadeia de bases
+    while isinstance(array, np.ndarray):
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+
+def test_load_keeps_columns_memory_mapped(tmp_path):
+    snapshot.write(prepare(source(np.arange(60))), str(tmp_path), compact=True)
+    frame = snapshot.load(str(tmp_path))
+
+    # frame_from_columns usa os internos do pandas fixado em requirements.txt; uma
+    # versão que passe a copiar as colunas quebra este teste
+    for nome, valores in frame.items():
+        array = valores.array.codes if isinstance(valores.dtype, pd.CategoricalDtype) else valores.to_numpy()
+        assert mapped(array), nome
+
+
+def test_round_trip_preserves_frame(tmp_path):
+    for compact in (True, False):
+        pasta = tmp_path / str(compact)
+        frame = prepare(source(np.arange(30)), compact=compact)
+
+        meta = snapshot.write(frame, str(pasta), compact=compact, product="GASOLINA COMUM")
+        carregado = snapshot.load(str(pasta), compact=compact)
+
+        assert meta["rows"] == len(frame)
+        assert carregado.attrs["snapshot"] == {"generation": "g000001", "base": None}
+        pd.testing.assert_frame_equal(carregado, frame)
+
+
+def test_stale_schema_is_rejected(tmp_path, monkeypatch):
+    snapshot.write(prepare(source(np.arange(5))), str(tmp_path), compact=True)
+
+    monkeypatch.setattr(snapshot, "SCHEMA_VERSION", snapshot.SCHEMA_VERSION + 1)
+    with pytest.raises(snapshot.StaleSnapshotError):
+        snapshot.load(str(tmp_path))